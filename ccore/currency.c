@@ -5,6 +5,7 @@
 #include <stdio.h>
 #include <string.h>
 #include <stdbool.h>
+#include <stdint.h>
 #include <sqlite3.h>
 #include <time.h>
 #include "currency.h"
@@ -12,9 +13,13 @@
 #define CURRENCY_REGISTRY_BLOCK 100
 #define DATE_LEN 8
 #define MAX_SQL_LEN 512
-#define SQL_RES_LEN 512
+#define RATES_BLOCK 256
+#define FNV_OFFSET_BASIS 14695981039346656037ULL
+#define FNV_PRIME 1099511628211ULL
 
 static sqlite3 *g_db = NULL;
+// Prepared once and reused for every rates table load.
+static sqlite3_stmt *g_select_rates_stmt = NULL;
 // Currencies are allocated in block. Whether a "slot" is registered is
 // determined by whether its code starts with '\0'
 static Currency *g_currencies = NULL;
@@ -29,97 +34,152 @@ date2str(char *s, const struct tm *date)
     return strftime(s, DATE_LEN + 1, "%Y%m%d", date);
 }
 
-static bool
-str2date(const char *s, struct tm *date)
+static int
+date2int(const struct tm *date)
 {
-    return strptime(s, "%Y%m%d", date) != NULL;
+    return (date->tm_year + 1900) * 10000 + (date->tm_mon + 1) * 100 + date->tm_mday;
 }
 
-static bool
-sqlite_getsingle_double(const char *sql, double *result)
+static void
+int2date(int i, struct tm *date)
 {
-    sqlite3_stmt *stmt;
-    int rc;
+    date->tm_year = i / 10000 - 1900;
+    date->tm_mon = (i / 100) % 100 - 1;
+    date->tm_mday = i % 100;
+}
 
-    rc = sqlite3_prepare_v2(g_db, sql, -1, &stmt, NULL);
-    if (rc != SQLITE_OK) {
-        return false;
-    }
-    rc = sqlite3_step(stmt);
-    if (rc != SQLITE_ROW) {
-        sqlite3_finalize(stmt);
-        return false;
+static void
+invalidate_rates(Currency *currency)
+{
+    free(currency->rate_dates);
+    free(currency->rates);
+    currency->rate_dates = NULL;
+    currency->rates = NULL;
+    currency->rates_count = 0;
+    currency->rates_loaded = false;
+}
+
+static void
+invalidate_all_rates(void)
+{
+    for (unsigned int i=0; i<g_currencies_count; i++) {
+        invalidate_rates(&g_currencies[i]);
     }
-    if (sqlite3_column_type(stmt, 0) != SQLITE_FLOAT) {
-        sqlite3_finalize(stmt);
-        return false;
+}
+
+static void
+finalize_statements(void)
+{
+    if (g_select_rates_stmt != NULL) {
+        sqlite3_finalize(g_select_rates_stmt);
+        g_select_rates_stmt = NULL;
     }
-    *result = sqlite3_column_double(stmt, 0);
-    sqlite3_finalize(stmt);
-    return true;
 }
 
 static bool
-sqlite_getsingle_text(const char *sql, char *result)
+load_rates(Currency *currency)
 {
+    /* Loads all rates for `currency`, sorted by date, in memory.
+     */
     sqlite3_stmt *stmt;
+    unsigned int capacity = 0;
     int rc;
     const unsigned char *buf;
+    void *p;
 
-    rc = sqlite3_prepare_v2(g_db, sql, -1, &stmt, NULL);
-    if (rc != SQLITE_OK) {
-        return false;
+    if (currency->rates_loaded) {
+        return true;
     }
-    rc = sqlite3_step(stmt);
-    if (rc != SQLITE_ROW) {
-        sqlite3_finalize(stmt);
+    if (g_db == NULL) {
         return false;
     }
-    buf = sqlite3_column_text(stmt, 0);
-    if (buf == NULL) {
-        sqlite3_finalize(stmt);
-        return false;
+    if (g_select_rates_stmt == NULL) {
+        rc = sqlite3_prepare_v2(
+            g_db,
+            "select date, rate from rates where currency = ? order by date",
+            -1, &g_select_rates_stmt, NULL);
+        if (rc != SQLITE_OK) {
+            g_select_rates_stmt = NULL;
+            return false;
+        }
+    }
+    stmt = g_select_rates_stmt;
+    sqlite3_reset(stmt);
+    sqlite3_bind_text(stmt, 1, currency->code, -1, SQLITE_STATIC);
+    invalidate_rates(currency);
+    while (sqlite3_step(stmt) == SQLITE_ROW) {
+        if (sqlite3_column_type(stmt, 1) != SQLITE_FLOAT) {
+            continue;
+        }
+        buf = sqlite3_column_text(stmt, 0);
+        if (buf == NULL) {
+            continue;
+        }
+        if (currency->rates_count == capacity) {
+            capacity += RATES_BLOCK;
+            p = realloc(currency->rate_dates, capacity * sizeof(int));
+            if (p == NULL) {
+                sqlite3_reset(stmt);
+                invalidate_rates(currency);
+                return false;
+            }
+            currency->rate_dates = p;
+            p = realloc(currency->rates, capacity * sizeof(double));
+            if (p == NULL) {
+                sqlite3_reset(stmt);
+                invalidate_rates(currency);
+                return false;
+            }
+            currency->rates = p;
+        }
+        currency->rate_dates[currency->rates_count] = atoi((const char *)buf);
+        currency->rates[currency->rates_count] = sqlite3_column_double(stmt, 1);
+        currency->rates_count++;
     }
-    strncpy(result, (const char *)buf, SQL_RES_LEN);
-    sqlite3_finalize(stmt);
+    sqlite3_reset(stmt);
+    currency->rates_loaded = true;
     return true;
 }
 
 static CurrencyResult
 seek_value_in_CAD(struct tm *date, Currency *currency, double *result)
 {
-    char strdate[DATE_LEN + 1];
-    char sql[MAX_SQL_LEN + 1];
-    char *sqlfmt = "select rate from rates "
-        "where date %s '%s' and currency = '%s' "
-        "order by date %s limit 1";
-    double rate;
+    /* Returns the rate for the closest date that is <= `date`. If there's
+     * none, returns the rate of the first date we have.
+     */
+    time_t t;
+    int key;
+    unsigned int lo, hi, mid;
 
     if (strncmp(currency->code, "CAD", CURRENCY_CODE_MAXLEN) == 0) {
         *result = 1;
         return CURRENCY_OK;
     }
-    if (mktime(date) < currency->start_date) {
+    t = mktime(date);
+    if (t < currency->start_date) {
         *result = currency->start_rate;
         return CURRENCY_OK;
     }
-    if (currency->stop_date > 0 && mktime(date) > currency->stop_date) {
+    if (currency->stop_date > 0 && t > currency->stop_date) {
         *result = currency->latest_rate;
         return CURRENCY_OK;
     }
-    date2str(strdate, date);
-    snprintf(
-        sql, MAX_SQL_LEN, sqlfmt,
-        "<=", strdate, currency->code, "desc");
-    if (!sqlite_getsingle_double(sql, &rate)) {
-        snprintf(
-            sql, MAX_SQL_LEN, sqlfmt,
-            ">=", strdate, currency->code, "");
-        if (!sqlite_getsingle_double(sql, &rate)) {
-            return CURRENCY_NORESULT;
+    if (!load_rates(currency) || currency->rates_count == 0) {
+        return CURRENCY_NORESULT;
+    }
+    key = date2int(date);
+    // Find the first index with a date > key
+    lo = 0;
+    hi = currency->rates_count;
+    while (lo < hi) {
+        mid = lo + (hi - lo) / 2;
+        if (currency->rate_dates[mid] <= key) {
+            lo = mid + 1;
+        } else {
+            hi = mid;
         }
     }
-    *result = rate;
+    *result = lo > 0 ? currency->rates[lo - 1] : currency->rates[0];
     return CURRENCY_OK;
 }
 
@@ -137,9 +197,11 @@ currency_global_init(char *dbpath)
     }
     if (g_db != NULL) {
         // We already have an opened DB. close it first.
+        finalize_statements();
         sqlite3_close(g_db);
         g_db = NULL;
     }
+    invalidate_all_rates();
     res = sqlite3_open(dbpath, &g_db);
     if (res) {
         sqlite3_close(g_db);
@@ -167,6 +229,7 @@ currency_global_reset_currencies(void)
         // Don't allocate a new list, we're probably in a test context and we
         // want to keep our 3 main currency instances. Flush the rest of the
         // list
+        invalidate_all_rates();
         for (unsigned int i=3; i<g_currencies_count; i++) {
             g_currencies[i].code[0] = '\0';
         }
@@ -207,11 +270,14 @@ void
 currency_global_deinit(void)
 {
     if (g_db != NULL) {
+        finalize_statements();
         sqlite3_close(g_db);
         g_db = NULL;
     }
     if (g_currencies != NULL) {
+        invalidate_all_rates();
         free(g_currencies);
+        g_currencies = NULL;
     }
 }
 
@@ -252,6 +318,10 @@ currency_register(
     cur->start_rate = start_rate;
     cur->stop_date = stop_date;
     cur->latest_rate = latest_rate;
+    cur->rates_loaded = false;
+    cur->rates_count = 0;
+    cur->rate_dates = NULL;
+    cur->rates = NULL;
     g_currencies_count++;
     return cur;
 }
@@ -315,33 +385,47 @@ currency_set_CAD_value(struct tm *date, Currency *currency, double value)
         strdate, currency->code, value);
     sqlite3_exec(g_db, sql, NULL, NULL, NULL);
     sqlite3_exec(g_db, "commit", NULL, NULL, NULL);
+    invalidate_rates(currency);
 }
 
 bool
 currency_daterange(Currency *currency, struct tm *start, struct tm *stop)
 {
-    char sql[MAX_SQL_LEN + 1];
-    char buf[SQL_RES_LEN + 1] = {0};
-
-    snprintf(
-        sql, MAX_SQL_LEN,
-        "select min(date) from rates where currency = '%s'",
-        currency->code);
-    if (!sqlite_getsingle_text(sql, buf)) {
+    if (!load_rates(currency) || currency->rates_count == 0) {
         return false;
     }
-    if (!str2date(buf, start)) {
-        return false;
+    int2date(currency->rate_dates[0], start);
+    int2date(currency->rate_dates[currency->rates_count - 1], stop);
+    return true;
+}
+
+static uint64_t
+fnv1a(uint64_t hash, const void *data, size_t len)
+{
+    const unsigned char *p = data;
+    for (size_t i = 0; i < len; i++) {
+        hash ^= p[i];
+        hash *= FNV_PRIME;
     }
-    snprintf(
-        sql, MAX_SQL_LEN,
-        "select max(date) from rates where currency = '%s'",
-        currency->code);
-    if (!sqlite_getsingle_text(sql, buf)) {
+    return hash;
+}
+
+bool
+currency_rates_checksum(Currency *currency, uint64_t *result)
+{
+    /* Computes a checksum of all rates we have for `currency` in `result`.
+     *
+     * Unlike the date range, it changes when a rate is overwritten.
+     */
+    uint64_t hash = FNV_OFFSET_BASIS;
+
+    if (!load_rates(currency)) {
         return false;
     }
-    if (!str2date(buf, stop)) {
-        return false;
+    for (unsigned int i = 0; i < currency->rates_count; i++) {
+        hash = fnv1a(hash, &currency->rate_dates[i], sizeof(int));
+        hash = fnv1a(hash, &currency->rates[i], sizeof(double));
     }
+    *result = hash;
     return true;
 }
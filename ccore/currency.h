@@ -1,4 +1,5 @@
 #include <stdbool.h>
+#include <stdint.h>
 #include <time.h>
 
 #define CURRENCY_CODE_MAXLEN 4
@@ -11,6 +12,12 @@ typedef struct {
     double start_rate;
     time_t stop_date;
     double latest_rate;
+    // In-memory copy of the rates we have in the DB for this currency, sorted by
+    // date. Loaded on first use and invalidated when rates are set.
+    bool rates_loaded;
+    unsigned int rates_count;
+    int *rate_dates; // YYYYMMDD
+    double *rates;
 } Currency;
 
 typedef enum {
@@ -48,3 +55,6 @@ currency_set_CAD_value(struct tm *date, Currency *currency, double value);
 
 bool
 currency_daterange(Currency *currency, struct tm *start, struct tm *stop);
+
+bool
+currency_rates_checksum(Currency *currency, uint64_t *result);
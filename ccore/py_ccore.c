@@ -2,6 +2,7 @@
 #include <datetime.h>
 #include <math.h>
 #include <stdbool.h>
+#include <string.h>
 #include "amount.h"
 
 /* Types */
@@ -30,6 +31,28 @@ pydate2tm(PyObject *pydate, struct tm *dest)
     return true;
 }
 
+static void
+ordinal2tm(long ordinal, struct tm *dest)
+{
+    /* Sets dest's y/m/d from a proleptic gregorian ordinal, as returned by
+     * date.toordinal().
+     */
+    // See http://howardhinnant.github.io/date_algorithms.html#civil_from_days
+    long z = ordinal - 719163 + 719468; // days since 0000-03-01
+    long era = (z >= 0 ? z : z - 146096) / 146097;
+    long doe = z - era * 146097;
+    long yoe = (doe - doe/1460 + doe/36524 - doe/146096) / 365;
+    long doy = doe - (365*yoe + yoe/4 - yoe/100);
+    long mp = (5*doy + 2) / 153;
+    long d = doy - (153*mp + 2) / 5 + 1;
+    long m = mp < 10 ? mp + 3 : mp - 9;
+    long y = yoe + era * 400 + (m <= 2);
+
+    dest->tm_year = y - 1900;
+    dest->tm_mon = m - 1;
+    dest->tm_mday = d;
+}
+
 static PyObject*
 tm2pydate(struct tm *date)
 {
@@ -302,6 +325,26 @@ py_currency_daterange(PyObject *self, PyObject *args)
     return res;
 }
 
+static PyObject*
+py_currency_rates_checksum(PyObject *self, PyObject *args)
+{
+    char *code;
+    Currency *c;
+    uint64_t result;
+
+    if (!PyArg_ParseTuple(args, "s", &code)) {
+        return NULL;
+    }
+
+    c = currency_get(code);
+    if (c == NULL || !currency_rates_checksum(c, &result)) {
+        // Invalid currency or no rates table, return None
+        Py_INCREF(Py_None);
+        return Py_None;
+    }
+    return PyLong_FromUnsignedLongLong(result);
+}
+
 static PyObject *
 py_currency_exponent(PyObject *self, PyObject *args)
 {
@@ -839,6 +882,101 @@ py_amount_convert(PyObject *self, PyObject *args)
     return create_amount(res, currency);
 }
 
+static PyObject*
+py_amount_convert_many(PyObject *self, PyObject *args)
+{
+    /* Same as amount_convert(), but for a whole sequence of amounts at once.
+     *
+     * `amounts` is a sequence of amounts and `dates` is a sequence of the same
+     * length containing either dates or date ordinals. Returns a list of
+     * converted amounts.
+     */
+    PyObject *pyamounts, *pydates, *amounts_seq, *dates_seq, *res;
+    PyObject *pyamount, *pydate, *converted;
+    char *code;
+    Currency *currency;
+    Currency *prev_currency = NULL;
+    struct tm date = {0};
+    int prev_dateval = -1;
+    int dateval;
+    Amount *amount;
+    double rate = 1;
+    Py_ssize_t len;
+
+    if (!PyArg_ParseTuple(args, "OsO", &pyamounts, &code, &pydates)) {
+        return NULL;
+    }
+    currency = getcur(code);
+    if (currency == NULL) {
+        return NULL;
+    }
+    amounts_seq = PySequence_Fast(pyamounts, "amounts must be a sequence");
+    if (amounts_seq == NULL) {
+        return NULL;
+    }
+    dates_seq = PySequence_Fast(pydates, "dates must be a sequence");
+    if (dates_seq == NULL) {
+        Py_DECREF(amounts_seq);
+        return NULL;
+    }
+    len = PySequence_Fast_GET_SIZE(amounts_seq);
+    if (PySequence_Fast_GET_SIZE(dates_seq) != len) {
+        PyErr_SetString(PyExc_ValueError, "amounts and dates must have the same length");
+        goto error;
+    }
+    res = PyList_New(len);
+    if (res == NULL) {
+        goto error;
+    }
+    for (Py_ssize_t i=0; i<len; i++) {
+        pyamount = PySequence_Fast_GET_ITEM(amounts_seq, i);
+        if (!check_amount(pyamount)) {
+            PyErr_SetString(PyExc_TypeError, "amounts must only contain amounts or zeroes");
+            Py_DECREF(res);
+            goto error;
+        }
+        amount = get_amount(pyamount);
+        if (!amount->val || amount->currency == currency) {
+            Py_INCREF(pyamount);
+            PyList_SET_ITEM(res, i, pyamount);
+            continue;
+        }
+        pydate = PySequence_Fast_GET_ITEM(dates_seq, i);
+        // currency_getrate() normalizes the date through mktime(). Start fresh.
+        memset(&date, 0, sizeof(date));
+        if (PyLong_Check(pydate)) {
+            ordinal2tm(PyLong_AsLong(pydate), &date);
+        } else if (!pydate2tm(pydate, &date)) {
+            Py_DECREF(res);
+            goto error;
+        }
+        // Amounts to convert often come in batches of the same date and
+        // currency. No need to fetch the same rate again.
+        dateval = (date.tm_year * 12 + date.tm_mon) * 31 + date.tm_mday;
+        if (amount->currency != prev_currency || dateval != prev_dateval) {
+            if (currency_getrate(&date, amount->currency, currency, &rate) != CURRENCY_OK) {
+                PyErr_SetString(PyExc_ValueError, "problems getting a rate");
+                Py_DECREF(res);
+                goto error;
+            }
+            prev_currency = amount->currency;
+            prev_dateval = dateval;
+        }
+        converted = create_amount(
+            amount_slide(amount->val * rate, amount->currency->exponent, currency->exponent),
+            currency);
+        PyList_SET_ITEM(res, i, converted);
+    }
+    Py_DECREF(amounts_seq);
+    Py_DECREF(dates_seq);
+    return res;
+
+error:
+    Py_DECREF(amounts_seq);
+    Py_DECREF(dates_seq);
+    return NULL;
+}
+
 /* We need both __copy__ and __deepcopy__ methods for amounts to behave
  * correctly in undo_test. */
 static PyMethodDef PyAmount_methods[] = {
@@ -883,12 +1021,14 @@ static PyMethodDef module_methods[] = {
     {"amount_format", (PyCFunction)py_amount_format, METH_VARARGS | METH_KEYWORDS},
     {"amount_parse", (PyCFunction)py_amount_parse, METH_VARARGS | METH_KEYWORDS},
     {"amount_convert", (PyCFunction)py_amount_convert, METH_VARARGS},
+    {"amount_convert_many", (PyCFunction)py_amount_convert_many, METH_VARARGS},
     {"currency_global_init", py_currency_global_init, METH_VARARGS},
     {"currency_global_reset_currencies", py_currency_global_reset_currencies, METH_NOARGS},
     {"currency_register", py_currency_register, METH_VARARGS},
     {"currency_getrate", py_currency_getrate, METH_VARARGS},
     {"currency_set_CAD_value", py_currency_set_CAD_value, METH_VARARGS},
     {"currency_daterange", py_currency_daterange, METH_VARARGS},
+    {"currency_rates_checksum", py_currency_rates_checksum, METH_VARARGS},
     {"currency_exponent", py_currency_exponent, METH_VARARGS},
     {NULL}  /* Sentinel */
 };
@@ -5,21 +5,23 @@
 # http://www.gnu.org/licenses/gpl-3.0.html
 
 import datetime
+import hashlib
 import time
 import uuid
 import logging
 import os
 import os.path as op
 from functools import wraps
+from itertools import chain
 
 from hscommon.notify import Repeater
-from hscommon.util import nonone, allsame, dedupe, extract, first
+from hscommon.util import nonone, allsame, dedupe, extract, first, flatten
 from hscommon.trans import tr
 from hscommon.gui.base import GUIObject
 
 from .const import NOEDIT, DATE_FORMAT_FOR_PREFERENCES
 from .exception import FileFormatError, OperationAborted
-from .loader import native
+from .loader import native, snapshot
 from .model.account import Account, Group, AccountList, GroupList, AccountType
 from .model.amount import parse_amount, format_amount
 from .model.currency import Currencies
@@ -33,6 +35,7 @@ from .model.recurrence import Spawn
 from .model.transaction_list import TransactionList
 from .model.undo import Undoer, Action
 from .saver.native import save as save_native
+from .saver.snapshot import save as save_snapshot, save_cooked
 
 SELECTED_DATE_RANGE_PREFERENCE = 'SelectedDateRange'
 SELECTED_DATE_RANGE_START_PREFERENCE = 'SelectedDateRangeStart'
@@ -121,7 +124,15 @@ class BaseDocument:
         for txn in transactions:
             self.transactions.add(txn)
         min_date = min(t.date for t in transactions)
-        self._cook(from_date=min_date)
+        self._cook(from_date=min_date, accounts=self._affected_accounts(transactions))
+
+    def _affected_accounts(self, transactions):
+        # Returns the accounts for which entries have to be re-cooked when `transactions` change.
+        # The oven takes care of accounts affected by re-spawned schedules by itself.
+        result = set()
+        for txn in transactions:
+            result |= txn.affected_accounts()
+        return result
 
     def _change_transaction(
             self, transaction, date=NOEDIT, description=NOEDIT, payee=NOEDIT,
@@ -149,7 +160,7 @@ class BaseDocument:
                 self.transactions.add(transaction)
             elif date_changed:
                 self.transactions.move_last(transaction)
-        self.transactions.clear_cache()
+            self.transactions.reindex(transaction)
 
     def _clean_empty_categories(self, from_account=None):
         for account in list(self.accounts.auto_created):
@@ -163,9 +174,9 @@ class BaseDocument:
         self.transactions.clear()
         self._cook()
 
-    def _cook(self, from_date=None):
+    def _cook(self, from_date=None, accounts=None):
         # Without date ranges and spawns, it's OK to pass `None` as an `until_date`.
-        self.oven.cook(from_date=from_date, until_date=None)
+        self.oven.cook(from_date=from_date, until_date=None, accounts=accounts)
 
     # --- Public
     def change_transaction(self, original, new, global_scope=False):
@@ -193,13 +204,15 @@ class BaseDocument:
         for split in new.splits:
             if split.account is not None:
                 split.account = self.accounts.find(split.account.name, split.account.type)
+        affected = self._affected_accounts([original])
         original.set_splits(new.splits, preserve_instances=True)
         min_date = min(original.date, new.date)
         self._change_transaction(
             original, date=new.date, description=new.description,
             payee=new.payee, checkno=new.checkno, notes=new.notes, global_scope=global_scope
         )
-        self._cook(from_date=min_date)
+        affected |= self._affected_accounts([original])
+        self._cook(from_date=min_date, accounts=affected)
         self._clean_empty_categories()
 
     def change_transactions(
@@ -237,13 +250,15 @@ class BaseDocument:
             Currencies.get_rates_db().ensure_rates(date, currencies_to_ensure)
 
         min_date = date if date is not NOEDIT else datetime.date.max
+        affected = self._affected_accounts(transactions)
         for transaction in transactions:
             min_date = min(min_date, transaction.date)
             self._change_transaction(
                 transaction, date=date, description=description, payee=payee, checkno=checkno,
                 from_=from_, to=to, amount=amount, currency=currency, global_scope=global_scope
             )
-        self._cook(from_date=min_date)
+        affected |= self._affected_accounts(transactions)
+        self._cook(from_date=min_date, accounts=affected)
         self._clean_empty_categories()
 
     def delete_transactions(self, transactions, from_account=None, global_scope=False):
@@ -263,6 +278,7 @@ class BaseDocument:
         :param from_account: the :class:`.Account` from which the operation takes place, if any.
         :param bool global_scope: Whether this changes affect the whole recurrence (if applicable)
         """
+        affected = self._affected_accounts(transactions)
         for txn in transactions:
             if isinstance(txn, Spawn):
                 if global_scope:
@@ -272,7 +288,7 @@ class BaseDocument:
             else:
                 self.transactions.remove(txn)
         min_date = min(t.date for t in transactions)
-        self._cook(from_date=min_date)
+        self._cook(from_date=min_date, accounts=affected)
         self._clean_empty_categories(from_account=from_account)
 
     def duplicate_transactions(self, transactions):
@@ -301,9 +317,14 @@ class BaseDocument:
         :param transactions: a collection of :class:`.Transaction` to move.
         :param to_transaction: target :class:`.Transaction` to move to.
         """
+        # Moving transactions changes the position of all transactions at their date.
+        dates = {t.date for t in transactions}
+        affected = set()
+        for date in dates:
+            affected |= self._affected_accounts(self.transactions.transactions_at_date(date))
         for transaction in transactions:
             self.transactions.move_before(transaction, to_transaction)
-        self._cook()
+        self._cook(from_date=min(dates), accounts=affected)
 
     def change_entry(
             self, entry, date=NOEDIT, reconciliation_date=NOEDIT, description=NOEDIT, payee=NOEDIT,
@@ -332,6 +353,7 @@ class BaseDocument:
             Currencies.get_rates_db().ensure_rates(date, [amount.currency_code, entry.account.currency])
         candidate_dates = [entry.date, date, reconciliation_date, entry.reconciliation_date]
         min_date = min(d for d in candidate_dates if d is not NOEDIT and d is not None)
+        affected = self._affected_accounts([entry.transaction])
         if reconciliation_date is not NOEDIT:
             entry.split.reconciliation_date = reconciliation_date
         if (amount is not NOEDIT) and (len(entry.splits) == 1):
@@ -344,7 +366,8 @@ class BaseDocument:
             entry.transaction, date=date, description=description,
             payee=payee, checkno=checkno, global_scope=global_scope
         )
-        self._cook(from_date=min_date)
+        affected |= self._affected_accounts([entry.transaction])
+        self._cook(from_date=min_date, accounts=affected)
         self._clean_empty_categories()
 
     def delete_entries(self, entries):
@@ -423,6 +446,10 @@ class Document(BaseDocument, Repeater, GUIObject):
         self.groups = GroupList()
         self._undoer = Undoer(self.accounts, self.groups, self.transactions, self.schedules, self.budgets)
         self._date_range = YearRange(datetime.date.today())
+        # (target, date_range, currency, excluded accounts, today): budgeted_amount_for_target()
+        # result. Only valid for the cooked transactions in _budget_cache_source.
+        self._budget_cache = {}
+        self._budget_cache_source = None
         self._filter_string = ''
         self._filter_type = None
         self._document_id = None
@@ -470,8 +497,8 @@ class Document(BaseDocument, Repeater, GUIObject):
         self._dirty_flag = False
         BaseDocument._clear(self)
 
-    def _cook(self, from_date=None):
-        self.oven.cook(from_date=from_date, until_date=self.date_range.end)
+    def _cook(self, from_date=None, accounts=None):
+        self.oven.cook(from_date=from_date, until_date=self.date_range.end, accounts=accounts)
 
     def _get_action_from_changed_transactions(self, transactions, global_scope=False):
         if len(transactions) == 1 and not isinstance(transactions[0], Spawn) \
@@ -528,6 +555,65 @@ class Document(BaseDocument, Repeater, GUIObject):
         elif isinstance(self.date_range, YearToDateRange):
             self.select_year_to_date_range()
 
+    def _used_currencies(self):
+        result = {a.currency for a in self.accounts}
+        txns = chain(self.transactions, (s.ref for s in self.schedules))
+        amounts = chain((s.amount for t in txns for s in t.splits), (b.amount for b in self.budgets))
+        result |= {a.currency_code for a in amounts if a}
+        return result
+
+    def _snapshot_path(self, filename):
+        # Snapshots are cache files. They're named after the path of the document they're a
+        # snapshot of. Without a cache path, we don't use snapshots at all.
+        if not self.app.cache_path:
+            return None
+        key = hashlib.sha1(op.abspath(filename).encode('utf-8')).hexdigest()
+        return op.join(self.app.cache_path, 'snapshots', key)
+
+    def _load_snapshot(self, filename, source_hash):
+        # Returns a loaded snapshot.Loader if we have a fresh snapshot of ``filename``, None if we
+        # don't.
+        snapshot_path = self._snapshot_path(filename)
+        if snapshot_path is None or not op.exists(snapshot_path):
+            return None
+        loader = snapshot.Loader(self.default_currency, source_hash)
+        try:
+            loader.parse(snapshot_path)
+            loader.load()
+        except FileFormatError:
+            return None
+        return loader
+
+    def _load_cooked_balances(self, filename, cooked_key):
+        snapshot_path = self._snapshot_path(filename)
+        try:
+            return snapshot.load_cooked(snapshot_path + '.cooked', cooked_key, list(self.accounts))
+        except FileFormatError:
+            return None
+
+    def _save_cooked_balances(self, filename, cooked_key):
+        snapshot_path = self._snapshot_path(filename)
+        try:
+            save_cooked(
+                snapshot_path + '.cooked', cooked_key, list(self.accounts), self.oven.cooked_balances()
+            )
+        except OSError:
+            logging.warning("Couldn't save cooked balances of %s", filename, exc_info=True)
+
+    def _save_snapshot(self, filename, source_hash):
+        snapshot_path = self._snapshot_path(filename)
+        if snapshot_path is None:
+            return
+        try:
+            save_snapshot(
+                snapshot_path, source_hash, self._document_id, self._properties, self.accounts,
+                self.groups, self.transactions, self.schedules, self.budgets
+            )
+        except OSError:
+            # A snapshot is only there to speed up the next load. Failing to write it shouldn't
+            # prevent anything else from happening.
+            logging.warning("Couldn't save snapshot of %s", filename, exc_info=True)
+
     def _restore_preferences(self):
         start_date = self.app.get_default(SELECTED_DATE_RANGE_START_PREFERENCE)
         if start_date:
@@ -621,7 +707,7 @@ class Document(BaseDocument, Repeater, GUIObject):
             if notes is not NOEDIT:
                 account.notes = notes
         self._undoer.record(action)
-        self._cook()
+        self._cook(accounts=accounts)
         self.transactions.clear_cache()
         self.notify('account_changed')
 
@@ -661,7 +747,7 @@ class Document(BaseDocument, Repeater, GUIObject):
                 elif budget.target is account:
                     budget.target = reassign_to
             self.accounts.remove(account)
-        self._cook()
+        self._cook(accounts=accounts | {reassign_to})
         self.notify('account_deleted')
 
     def new_account(self, type, group):
@@ -951,6 +1037,7 @@ class Document(BaseDocument, Repeater, GUIObject):
         action = Action(tr('Change reconciliation'))
         action.change_splits([e.split for e in entries])
         min_date = min(entry.date for entry in entries)
+        affected = {entry.account for entry in entries}
         splits = [entry.split for entry in entries]
         spawns, splits = extract(lambda s: isinstance(s.transaction, Spawn), splits)
         for spawn in spawns:
@@ -966,7 +1053,7 @@ class Document(BaseDocument, Repeater, GUIObject):
         else:
             for split in splits:
                 split.reconciliation_date = None
-        self._cook(from_date=min_date)
+        self._cook(from_date=min_date, accounts=affected)
         self.notify('transaction_changed')
 
     # --- Budget
@@ -987,12 +1074,26 @@ class Document(BaseDocument, Repeater, GUIObject):
         :param filter_excluded: ``bool``
         :rtype: :class:`.Amount`
         """
+        # Budget amounts only change when we cook (every cook gives us a new list of cooked
+        # transactions), when today changes or when excluded accounts change.
+        cooked = self.oven.transactions
+        if cooked is not self._budget_cache_source:
+            self._budget_cache = {}
+            self._budget_cache_source = cooked
+        currency = self.default_currency if target is None else target.currency
+        excluded = frozenset(self.excluded_accounts) if filter_excluded else None
+        cache_key = (target, date_range, currency, excluded, datetime.date.today())
+        if cache_key not in self._budget_cache:
+            self._budget_cache[cache_key] = self._budgeted_amount_for_target(
+                target, date_range, currency, filter_excluded
+            )
+        return self._budget_cache[cache_key]
+
+    def _budgeted_amount_for_target(self, target, date_range, currency, filter_excluded):
         if target is None:
             budgets = self.budgets[:]
-            currency = self.default_currency
         else:
             budgets = self.budgets.budgets_for_target(target)
-            currency = target.currency
         if filter_excluded:
             # we must remove any budget touching an excluded account.
             is_not_excluded = lambda b: (b.account not in self.excluded_accounts)\
@@ -1129,6 +1230,8 @@ class Document(BaseDocument, Repeater, GUIObject):
             txn.date = inc_month_overflow(txn.date, month_diff)
             if txn.date > TODAY:
                 self.transactions.remove(txn)
+            else:
+                self.transactions.reindex(txn)
             for split in txn.splits:
                 if split.reconciliation_date is not None:
                     split.reconciliation_date = txn.date
@@ -1160,14 +1263,24 @@ class Document(BaseDocument, Repeater, GUIObject):
 
         ``filename`` must be a path to a moneyGuru XML document.
 
+        If we have a fresh snapshot of ``filename`` in our cache path (see
+        :mod:`.loader.snapshot`), it's loaded instead of the XML document.
+
         :param filename: ``str``
         """
-        loader = native.Loader(self.default_currency)
-        try:
-            loader.parse(filename)
-        except FileFormatError:
-            raise FileFormatError(tr('"%s" is not a moneyGuru file') % filename)
-        loader.load()
+        source_hash = None
+        loader = None
+        if self.app.cache_path and op.exists(filename):
+            source_hash = snapshot.source_hash(filename)
+            loader = self._load_snapshot(filename, source_hash)
+        from_snapshot = loader is not None
+        if not from_snapshot:
+            loader = native.Loader(self.default_currency)
+            try:
+                loader.parse(filename)
+            except FileFormatError:
+                raise FileFormatError(tr('"%s" is not a moneyGuru file') % filename)
+            loader.load(cook=False) # we cook it ourselves below
         self._clear()
         self._document_id = loader.document_id
         for propname in self._properties:
@@ -1184,7 +1297,18 @@ class Document(BaseDocument, Repeater, GUIObject):
         for budget in loader.budgets:
             self.budgets.append(budget)
         self.accounts.default_currency = self.default_currency
-        self._cook()
+        if source_hash is not None:
+            # Running balances don't have to be computed if we've already cooked this same document
+            # in the same conditions.
+            cooked_key = snapshot.cooked_key(source_hash, self.date_range.end, self._used_currencies())
+            precooked = self._load_cooked_balances(filename, cooked_key)
+            self.oven.cook(until_date=self.date_range.end, precooked=precooked)
+            if not from_snapshot:
+                self._save_snapshot(filename, source_hash)
+            if precooked is None:
+                self._save_cooked_balances(filename, cooked_key)
+        else:
+            self._cook()
         self._restore_preferences_after_load()
         self.notify('document_changed')
         self._undoer.set_save_point()
@@ -1213,6 +1337,8 @@ class Document(BaseDocument, Repeater, GUIObject):
             self.transactions, self.schedules, self.budgets
         )
         if not autosave:
+            if self.app.cache_path:
+                self._save_snapshot(filename, snapshot.source_hash(filename))
             self._undoer.set_save_point()
             self._dirty_flag = False
 
@@ -1261,6 +1387,12 @@ class Document(BaseDocument, Repeater, GUIObject):
         action.added_transactions |= added_transactions
         action.change_splits(to_unreconcile)
         self._undoer.record(action)
+        # Imported entries only affect the transactions they belong to and the ones they're matched
+        # with. Matched transactions can have their date changed, so we look at them before and
+        # after the import.
+        touched = flatten([added_transactions, (ref.transaction for entry, ref in matches if ref is not None)])
+        touched_dates = [t.date for t in touched]
+        affected = self._affected_accounts(touched) | added_accounts | {target_account}
 
         for split in to_unreconcile:
             split.reconciliation_date = None
@@ -1277,10 +1409,14 @@ class Document(BaseDocument, Repeater, GUIObject):
                 ref.split.amount = entry.split.amount
                 ref.transaction.balance(strong_split=ref.split, keep_two_splits=True)
                 ref.split.reference = entry.split.reference
+                self.transactions.reindex(ref.transaction)
             else:
                 if entry.transaction not in self.transactions:
                     self.transactions.add(entry.transaction)
-        self._cook()
+        affected |= self._affected_accounts(touched)
+        touched_dates += [t.date for t in touched]
+        min_date = min(touched_dates) if touched_dates else None
+        self._cook(from_date=min_date, accounts=affected)
         self.notify('transactions_imported')
 
     def is_dirty(self):
@@ -1393,8 +1529,9 @@ class Document(BaseDocument, Repeater, GUIObject):
     def undo(self):
         """Undo the last undoable action."""
         self.stop_edition()
-        self._undoer.undo()
-        self._cook()
+        from_date, accounts = self._undoer.undo()
+        if from_date is not None:
+            self._cook(from_date=from_date, accounts=accounts)
         self.notify('performed_undo_or_redo')
 
     def can_redo(self):
@@ -1408,8 +1545,9 @@ class Document(BaseDocument, Repeater, GUIObject):
     def redo(self):
         """Redo the last redoable action."""
         self.stop_edition()
-        self._undoer.redo()
-        self._cook()
+        from_date, accounts = self._undoer.redo()
+        if from_date is not None:
+            self._cook(from_date=from_date, accounts=accounts)
         self.notify('performed_undo_or_redo')
 
     # --- Misc
@@ -1586,6 +1724,6 @@ class ImportDocument(BaseDocument):
         self.cook_flag = True
         self.oven.cook(from_date=None, until_date=None)
 
-    def _cook(self, from_date=None):
+    def _cook(self, from_date=None, accounts=None):
         pass
 
@@ -22,6 +22,17 @@ class AccountBalanceGraph(BalanceGraph):
         entry = self._account.entries.last_entry(date=date)
         return entry.normal_balance() if entry else 0
 
+    def _balance_change_dates(self, date_range):
+        if self._account is None:
+            return []
+        return self._account.entries.balance_change_dates(date_range)
+
+    def _balances_for_dates(self, dates):
+        if self._account is None:
+            return [0] * len(dates)
+        balances = self._account.entries.balances(dates)
+        return [self._account.normalize_amount(balance) for balance in balances]
+
     def _budget_for_date(self, date):
         date_range = DateRange(date.min, date)
         return self.document.budgeted_amount_for_target(
@@ -30,21 +30,40 @@ class BalanceGraph(Graph):
     def _budget_for_date(self, date):
         return 0
 
+    def _balance_change_dates(self, date_range):
+        # Returns a sorted list of dates in date_range at which the balance might be different from
+        # the day before. None means that it might change on any day.
+        return None
+
+    def _balances_for_dates(self, dates):
+        return [self._balance_for_date(date) for date in dates]
+
     # --- Override
     # Computation Notes: When the balance in the graph changes, we have to create a flat line until
     # one day prior to the change. However, when budgets are involved, the line is *not* flattened.
     # To save some calculations (in a year range, those take a lot of time if they're made every day),
     # rather than calculating the budget every day, they are only calculated when the balance without
     # budget changes. this is what the algorithm below reflects.
+    # We also don't go through every day of the range when we can avoid it. Only days where the
+    # balance might change, today and the last day of the range can create points.
     def compute_data(self):
         date_range = self.document.date_range
         TODAY = date.today()
         date2value = {}
-        last_balance = self._balance_for_date(date_range.start - ONE_DAY)
+        change_dates = self._balance_change_dates(date_range)
+        if change_dates is None:
+            date_points = list(date_range)
+        else:
+            date_points = set(change_dates)
+            date_points.add(date_range.end)
+            if TODAY in date_range:
+                date_points.add(TODAY)
+            date_points = sorted(date_points)
+        balances = self._balances_for_dates([date_range.start - ONE_DAY] + date_points)
+        last_balance = balances[0]
         if last_balance:
             date2value[date_range.start] = last_balance
-        for date_point in date_range:
-            balance = self._balance_for_date(date_point)
+        for date_point, balance in zip(date_points, balances[1:]):
             if (balance != last_balance) or (date_point == TODAY) or (date_point == date_range.end):
                 if date2value and last_balance != balance:
                     # create a "step"
@@ -52,19 +52,29 @@ class BarGraph(Graph):
     def _currency(self):
         return None
     
-    def _get_cash_flow(self, date_range):
-        return 0
+    def _get_cash_flows(self, date_ranges):
+        # Returns the cash flow for each range of date_ranges, which are sorted and don't overlap.
+        return [0] * len(date_ranges)
     
     # --- Override
     def compute_data(self):
         TODAY = date.today()
         self._data = []
-        for period in self._bar_periods():
+        periods = list(self._bar_periods())
+        # We get cash flows for all our periods at once rather than one period at a time.
+        date_ranges = []
+        for period in periods:
+            if TODAY in period:
+                date_ranges += [period.past, period.future]
+            else:
+                date_ranges.append(period)
+        cash_flows = iter(self._get_cash_flows(date_ranges))
+        for period in periods:
             if TODAY in period:
-                past_amount = float(self._get_cash_flow(period.past))
-                future_amount = float(self._get_cash_flow(period.future))
+                past_amount = float(next(cash_flows))
+                future_amount = float(next(cash_flows))
             else:
-                amount = float(self._get_cash_flow(period))
+                amount = float(next(cash_flows))
                 if TODAY > period.end: # all in the past
                     past_amount = amount
                     future_amount = 0
@@ -7,7 +7,7 @@
 from hscommon.util import nonone, dedupe
 
 from .base import DocumentGUIObject
-from ..model.completion import CompletionList
+from ..model.completion import CompletionIndex, CompletionList
 
 class CompletableEdit(DocumentGUIObject):
     def __init__(self, mainwindow):
@@ -15,6 +15,7 @@ class CompletableEdit(DocumentGUIObject):
         self.mainwindow = mainwindow
         self._attrname = ''
         self._candidates = None
+        self._completion_index = None
         self._completions = None
         self._complete_completion = ''
         self.completion = ''
@@ -36,11 +37,12 @@ class CompletableEdit(DocumentGUIObject):
         elif attrname in {'from', 'to', 'account', 'transfer'}:
             result = doc.transactions.account_names
             # `result` doesn't contain empty accounts' name, so we'll add them.
-            result += [a.name for a in doc.accounts if not a.inactive]
+            result = result + [a.name for a in doc.accounts if not a.inactive]
             if attrname == 'transfer' and self.account is not None:
                 result = [name for name in result if name != self.account.name]
             self._candidates = result
         self._candidates = dedupe([name for name in self._candidates if name.strip()])
+        self._completion_index = CompletionIndex(self._candidates, previous=self._completion_index)
 
     def _set_completion(self, completion):
         completion = nonone(completion, '')
@@ -110,6 +112,13 @@ class CompletableEdit(DocumentGUIObject):
             self._refresh_candidates()
         return self._candidates
 
+    @property
+    def completion_index(self):
+        """:class:`.CompletionIndex` of :attr:`candidates`."""
+        if self._candidates is None:
+            self._refresh_candidates()
+        return self._completion_index
+
     @property
     def text(self):
         return self._text
@@ -118,7 +127,7 @@ class CompletableEdit(DocumentGUIObject):
     def text(self, value):
         self._text = value
         if self.candidates:
-            self._completions = CompletionList(value, self._candidates)
+            self._completions = CompletionList(value, self._completion_index)
             self._set_completion(self._completions.current())
         else:
             self._completions = None
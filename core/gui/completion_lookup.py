@@ -6,7 +6,6 @@
 # which should be included with this package. The terms are also available at 
 # http://www.gnu.org/licenses/gpl-3.0.html
 
-from ..model.sort import sort_string
 from .lookup import Lookup
 
 class CompletionLookup(Lookup):
@@ -16,8 +15,7 @@ class CompletionLookup(Lookup):
     
     def _generate_lookup_names(self):
         if self._completable_edit is not None:
-            names = self._completable_edit.candidates[:]
-            return sorted(names, key=sort_string)
+            return self._completable_edit.completion_index.sorted_candidates()
         else:
             return []
     
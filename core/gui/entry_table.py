@@ -9,7 +9,7 @@
 from hscommon.trans import tr, trget
 from hscommon.util import dedupe
 from hscommon.gui.column import Column, Columns
-from .entry_table_base import EntryTableBase, PreviousBalanceRow, TotalRow
+from .entry_table_base import EntryTableBase, TotalRow
 
 trcol = trget('columns')
 
@@ -76,19 +76,15 @@ class EntryTable(EntryTableBase):
         if account is None:
             return
         self.account = account
-        rows = self._get_account_rows(account)
-        is_native = lambda row: self.document.is_amount_native(row._debit)\
-            and self.document.is_amount_native(row._credit)
-        self._all_amounts_are_native = all(is_native(row) for row in rows)
-        if not rows:
+        previous_balance_row, entries, total_row = self._get_account_rows(account)
+        self._all_amounts_are_native = all(self.document.is_amount_native(e.amount) for e in entries)
+        if total_row is None:
             # We still show a total row
-            rows.append(TotalRow(self, account, self.document.date_range.end, 0, 0))
-        if isinstance(rows[0], PreviousBalanceRow):
-            self.header = rows[0]
-            del rows[0]
-        for row in rows[:-1]:
-            self.append(row)
-        self.footer = rows[-1]
+            total_row = TotalRow(self, account, self.document.date_range.end, 0, 0)
+        self.header = previous_balance_row
+        for entry in entries:
+            self.append_lazy(entry)
+        self.footer = total_row
         balance_visible = account.is_balance_sheet_account()
         self.columns.set_column_visible('balance', balance_visible)
         self._restore_from_explicit_selection(refresh_view=False)
@@ -12,7 +12,7 @@ from operator import attrgetter
 from hscommon.util import nonone
 from hscommon.trans import tr
 
-from ..model.amount import convert_amount
+from ..model.amount import convert_amount, convert_amounts
 from ..model.date import ONE_DAY
 from ..model.entry import Entry
 from ..model.recurrence import Spawn
@@ -352,13 +352,13 @@ class EntryTableBase(TransactionTableBase):
         entry = self._new_entry()
         account = entry.account
         last_suitable_index = 0 if self.header is not None else -1
-        for index, row in enumerate(self):
-            if not isinstance(row, EntryTableRow):
+        for index in range(len(self)):
+            if not self._is_entry_at(index):
                 continue
-            if row.account is not account:
+            if self._peek(index).account is not account:
                 continue
             last_suitable_index = index
-            if row._date > entry.date:
+            if self._date_at(index) > entry.date:
                 insert_index = index
                 break
         else:
@@ -366,6 +366,17 @@ class EntryTableBase(TransactionTableBase):
         row = NewEntryTableRow(self, entry, entry.account)
         return row, insert_index
 
+    def _item_transaction(self, item):
+        return item.transaction
+
+    def _make_row(self, item):
+        return self.ENTRY_ROWCLASS(self, item, item.account)
+
+    def _sort_key_for_item(self, item, column_name):
+        if column_name == 'date':
+            return (item.date, item.transaction.position)
+        return TransactionTableBase._sort_key_for_item(self, item, column_name)
+
     def _do_delete(self):
         entries = self.selected_entries
         if entries:
@@ -384,27 +395,34 @@ class EntryTableBase(TransactionTableBase):
 
     # --- Private
     def _get_account_rows(self, account):
-        result = []
+        # Returns ``(previous_balance_row, entries, total_row)``. Rows for entries are meant to be
+        # added with append_lazy(). When there's neither a previous balance nor entries, we have
+        # no total row either.
+        previous_balance_row = None
         date_range = self.document.date_range
         if account.is_balance_sheet_account():
             prev_entry = account.entries.last_entry(date_range.start-ONE_DAY)
             if prev_entry is not None:
                 balance = prev_entry.balance_with_budget
                 rbalance = prev_entry.reconciled_balance
-                result.append(PreviousBalanceRow(self, date_range.start, balance, rbalance, account))
+                previous_balance_row = PreviousBalanceRow(self, date_range.start, balance, rbalance, account)
         total_debit = 0
         total_credit = 0
         entries = self.mainwindow.visible_entries_for_account(account)
         for entry in entries:
-            row = self.ENTRY_ROWCLASS(self, entry, account)
-            result.append(row)
-            convert = lambda a: convert_amount(a, account.currency, entry.date)
-            total_debit += convert(row._debit)
-            total_credit += convert(row._credit)
-        if result:
+            amount = convert_amount(entry.amount, account.currency, entry.date)
+            if amount > 0:
+                total_debit += amount
+            else:
+                total_credit -= amount
+        total_row = None
+        if previous_balance_row is not None or entries:
             total_row = TotalRow(self, account, date_range.end, total_debit, total_credit)
-            result.append(total_row)
-        return result
+        return previous_balance_row, entries, total_row
+
+    def _is_entry_at(self, index):
+        # Whether the row at ``index`` is an entry row, without creating it.
+        return isinstance(self._peek(index), (Entry, EntryTableRow))
 
     def _new_entry(self):
         account = self._get_current_account()
@@ -419,9 +437,9 @@ class EntryTableBase(TransactionTableBase):
         # returns (selected_count, total_count, total_debit, total_credit)
         entries = self.selected_entries
         selected = len(entries)
-        total = sum(1 for row in self if isinstance(row, EntryTableRow))
+        total = sum(1 for index in range(len(self)) if self._is_entry_at(index))
         total_currency = self._get_totals_currency()
-        amounts = [convert_amount(e.amount, total_currency, e.date) for e in entries]
+        amounts = convert_amounts([e.amount for e in entries], total_currency, [e.date for e in entries])
         total_debit = sum(a for a in amounts if a > 0)
         total_credit = abs(sum(a for a in amounts if a < 0))
         return (selected, total, total_debit, total_credit)
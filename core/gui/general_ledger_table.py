@@ -51,12 +51,15 @@ class GeneralLedgerTable(EntryTableBase):
         accounts = self.document.accounts
         sort_accounts(accounts)
         for account in accounts:
-            rows = self._get_account_rows(account)
-            if not rows:
+            previous_balance_row, entries, total_row = self._get_account_rows(account)
+            if total_row is None:
                 continue
             self.append(AccountRow(self, account))
-            for row in rows:
-                self.append(row)
+            if previous_balance_row is not None:
+                self.append(previous_balance_row)
+            for entry in entries:
+                self.append_lazy(entry)
+            self.append(total_row)
     
     def _get_current_account(self):
         row = self.selected_row
@@ -28,10 +28,9 @@ class IncomeStatement(Report):
         account = node.account
         date_range = self.document.date_range
         currency = self.document.default_currency
-        cash_flow = account.entries.normal_cash_flow(date_range)
-        cash_flow_native = account.entries.normal_cash_flow(date_range, currency)
-        last_cash_flow = account.entries.normal_cash_flow(date_range.prev())
-        last_cash_flow_native = account.entries.normal_cash_flow(date_range.prev(), currency)
+        date_ranges = [date_range, date_range.prev()]
+        cash_flow, last_cash_flow = account.entries.normal_cash_flows(date_ranges)
+        cash_flow_native, last_cash_flow_native = account.entries.normal_cash_flows(date_ranges, currency)
         remaining = self.document.budgets.normal_amount_for_account(account, date_range)
         remaining_native = self.document.budgets.normal_amount_for_account(account, date_range, currency)
         delta = cash_flow - last_cash_flow
@@ -272,12 +272,13 @@ class MainWindow(Repeater, GUIObject):
 
     def _visible_entries_for_account(self, account):
         date_range = self.document.date_range
-        entries = [e for e in account.entries if e.date in date_range]
+        entries = account.entries.entries_in_range(date_range)
         query_string = self.document.filter_string
         filter_type = self.document.filter_type
         if query_string:
             query = self.app.parse_search_query(query_string)
-            entries = [e for e in entries if e.transaction.matches(query)]
+            matching = set(self.document.transactions.search((e.transaction for e in entries), query))
+            entries = [e for e in entries if e.transaction in matching]
         if filter_type is FilterType.Unassigned:
             entries = [e for e in entries if not e.transfer]
         elif (filter_type is FilterType.Income) or (filter_type is FilterType.Expense):
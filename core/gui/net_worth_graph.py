@@ -19,6 +19,18 @@ class NetWorthGraph(BalanceGraph, SheetViewNotificationsMixin):
         balances = (a.entries.balance(date=date, currency=self._currency) for a in self._accounts)
         return sum(balances)
     
+    def _balance_change_dates(self, date_range):
+        dates = set()
+        for account in self._accounts:
+            dates.update(account.entries.balance_change_dates(date_range, self._currency))
+        return sorted(dates)
+
+    def _balances_for_dates(self, dates):
+        if not self._accounts:
+            return [0] * len(dates)
+        account_balances = (a.entries.balances(dates, self._currency) for a in self._accounts)
+        return [sum(balances) for balances in zip(*account_balances)]
+
     def _budget_for_date(self, date):
         date_range = DateRange(date.min, date)
         return self.document.budgeted_amount_for_target(None, date_range)
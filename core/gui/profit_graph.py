@@ -19,13 +19,23 @@ class ProfitGraph(BarGraph, SheetViewNotificationsMixin):
     def _currency(self):
         return self.document.default_currency
 
-    def _get_cash_flow(self, date_range):
-        self.document.oven.continue_cooking(date_range.end) # it's possible that the overflow is not cooked
+    def _get_cash_flows(self, date_ranges):
+        if not date_ranges:
+            return []
+        # it's possible that the overflow is not cooked
+        self.document.oven.continue_cooking(date_ranges[-1].end)
         accounts = {a for a in self.document.accounts if a.is_income_statement_account()}
         accounts = accounts - self.document.excluded_accounts
-        cash_flow = -sum(a.entries.cash_flow(date_range, currency=self.document.default_currency) for a in accounts)
-        budgeted_amount = self.document.budgeted_amount_for_target(None, date_range)
-        return cash_flow + budgeted_amount
+        currency = self.document.default_currency
+        if accounts:
+            account_cash_flows = (a.entries.cash_flows(date_ranges, currency=currency) for a in accounts)
+            cash_flows = [-sum(cash_flows) for cash_flows in zip(*account_cash_flows)]
+        else:
+            cash_flows = [0] * len(date_ranges)
+        return [
+            cash_flow + self.document.budgeted_amount_for_target(None, date_range)
+            for date_range, cash_flow in zip(date_ranges, cash_flows)
+        ]
 
     def _is_reverted(self):
         return True
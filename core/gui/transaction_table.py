@@ -11,7 +11,7 @@ from operator import attrgetter
 
 from hscommon.trans import trget, tr
 from hscommon.gui.column import Column
-from ..model.amount import convert_amount
+from ..model.amount import convert_amounts
 from ..model.recurrence import Spawn
 from ..model.transaction import Transaction
 from .table import Row, RowWithDateMixIn, rowattr
@@ -38,13 +38,13 @@ class TransactionTable(TransactionTableBase):
         transactions = self.mainwindow.selected_transactions
         date = transactions[0].date if transactions else datetime.date.today()
         transaction = Transaction(date, amount=0)
-        rows = self[:-1] # ignore total row
-        for index, row in enumerate(rows):
-            if row._date > transaction.date:
+        row_count = len(self) - 1 # ignore total row
+        for index in range(row_count):
+            if self._date_at(index) > transaction.date:
                 insert_index = index
                 break
         else:
-            insert_index = len(rows)
+            insert_index = row_count
         row = TransactionTableRow(self, transaction)
         return row, insert_index
 
@@ -55,16 +55,30 @@ class TransactionTable(TransactionTableBase):
 
     def _fill(self):
         self._all_amounts_are_native = True
-        total_amount = 0
-        for transaction in self.parent_view.visible_transactions:
-            self.append(TransactionTableRow(self, transaction))
-            convert = lambda a: convert_amount(a, self.document.default_currency, transaction.date)
-            total_amount += convert(transaction.amount)
-            if not self.document.is_amount_native(transaction.amount):
+        transactions = self.parent_view.visible_transactions
+        amounts = []
+        for transaction in transactions:
+            self.append_lazy(transaction)
+            amount = transaction.amount
+            amounts.append(amount)
+            if not self.document.is_amount_native(amount):
                 self._all_amounts_are_native = False
+        dates = [t.date for t in transactions]
+        total_amount = sum(convert_amounts(amounts, self.document.default_currency, dates))
         self.footer = TotalRow(self, self.document.date_range.end, total_amount)
         self._restore_from_explicit_selection(refresh_view=False)
 
+    def _item_transaction(self, item):
+        return item
+
+    def _make_row(self, item):
+        return TransactionTableRow(self, item)
+
+    def _sort_key_for_item(self, item, column_name):
+        if column_name == 'date':
+            return (item.date, item.position)
+        return TransactionTableBase._sort_key_for_item(self, item, column_name)
+
     # --- Private
     def _show_account(self, row_index=None, use_to_column=False):
         # if `use_to_column` is True, use the To column, else, use the From column
@@ -8,6 +8,8 @@
 
 import datetime
 
+from hscommon.gui.table import Row
+
 from .base import ViewChild, MESSAGES_DOCUMENT_CHANGED
 from .table import GUITable, TableWithAmountMixin
 from .completable_edit import CompletableEdit
@@ -24,11 +26,16 @@ class TransactionSelectionMixin:
 
     def select_transactions(self, transactions):
         selected_indexes = []
-        for index, row in enumerate(self):
-            if hasattr(row, 'transaction') and row.transaction in transactions:
+        for index in range(len(self)):
+            if self._transaction_at(index) in transactions:
                 selected_indexes.append(index)
         self.selected_indexes = selected_indexes
 
+    # virtual
+    def _item_transaction(self, item):
+        # Returns the transaction of ``item``, which was added with ``append_lazy()``.
+        raise NotImplementedError()
+
     # virtual
     @property
     def _explicitly_selected_transactions(self):
@@ -37,6 +44,19 @@ class TransactionSelectionMixin:
         return []
 
     # private
+    # The two methods below look at rows without creating those that were added lazily.
+    def _date_at(self, index):
+        row = self._peek(index)
+        return row._date if isinstance(row, Row) else row.date
+
+    def _transaction_at(self, index):
+        # Returns None if the row at ``index`` has no transaction.
+        row = self._peek(index)
+        if isinstance(row, Row):
+            return getattr(row, 'transaction', None)
+        else:
+            return self._item_transaction(row)
+
     def _restore_from_explicit_selection(self, refresh_view=True):
         if self._explicitly_selected_transactions:
             self.select_transactions(self._explicitly_selected_transactions)
@@ -48,8 +68,8 @@ class TransactionSelectionMixin:
     def _select_nearest_date(self, target_date):
         # This method assumes that self is sorted by date
         last_delta = datetime.timedelta.max
-        for index, row in enumerate(self):
-            delta = abs(row._date - target_date)
+        for index in range(len(self)):
+            delta = abs(self._date_at(index) - target_date)
             if delta > last_delta:
                 # The last iteration was the correct one
                 self.selected_index = index - 1
@@ -7,6 +7,7 @@
 # http://www.gnu.org/licenses/gpl-3.0.html
 
 import weakref
+from collections import OrderedDict
 
 from hscommon.trans import tr
 from ..const import PaneType
@@ -42,10 +43,17 @@ class TransactionView(BaseView, ViewWithTransactionsMixin):
     PRINT_TITLE_FORMAT = tr('Transactions from {start_date} to {end_date}')
     PRINT_VIEW_CLASS = TransactionPrint
     INVALIDATING_MESSAGES = MESSAGES_DOCUMENT_CHANGED | {'filter_applied', 'date_range_changed'}
+    # Number of visible transaction lists we remember, for going back and forth between date ranges
+    # or filters.
+    VISIBLE_CACHE_SIZE = 16
 
     def __init__(self, mainwindow):
         BaseView.__init__(self, mainwindow)
         self._visible_transactions = None
+        # (date_range, filter_string, filter_type): visible transactions, least recently used first.
+        # Only valid for the cooked transactions in _visible_cache_source.
+        self._visible_cache = OrderedDict()
+        self._visible_cache_source = None
         self.filter_bar = FilterBar(self)
         self.ttable = TransactionTable(self)
         self.maintable = self.ttable
@@ -53,12 +61,19 @@ class TransactionView(BaseView, ViewWithTransactionsMixin):
         self.set_children([self.ttable])
 
     def _revalidate(self):
+        self._visible_cache.clear()
         self._visible_transactions = None
         self._refresh_totals()
         self.filter_bar.refresh()
 
     # --- Private
     def _invalidate_cache(self):
+        self._visible_cache.clear()
+        self._invalidate_visible_transactions()
+
+    def _invalidate_visible_transactions(self):
+        # Our date range or filter changed, but not the document. What we have in _visible_cache is
+        # still good.
         self._visible_transactions = None
         self._refresh_totals()
 
@@ -71,17 +86,13 @@ class TransactionView(BaseView, ViewWithTransactionsMixin):
         msg = tr("{0} out of {1} selected. Amount: {2}")
         self.status_line = msg.format(selected, total, total_amount_fmt)
 
-    def _set_visible_transactions(self):
-        date_range = self.document.date_range
-        txns = [t for t in self.document.oven.transactions if t.date in date_range]
-        query_string = self.document.filter_string
-        filter_type = self.document.filter_type
+    def _filter_transactions(self, date_range, query_string, filter_type):
+        txns = self.document.oven.transactions_in_range(date_range)
         if not query_string and filter_type is None:
-            self._visible_transactions = txns
-            return
+            return txns
         if query_string:
             query = self.app.parse_search_query(query_string)
-            txns = [t for t in txns if t.matches(query)]
+            txns = self.document.transactions.search(txns, query)
         if filter_type is FilterType.Unassigned:
             txns = [t for t in txns if t.has_unassigned_split]
         elif filter_type is FilterType.Income:
@@ -96,6 +107,24 @@ class TransactionView(BaseView, ViewWithTransactionsMixin):
             txns = [t for t in txns if any(s.reconciled for s in t.splits)]
         elif filter_type is FilterType.NotReconciled:
             txns = [t for t in txns if all(not s.reconciled for s in t.splits)]
+        return txns
+
+    def _set_visible_transactions(self):
+        cooked = self.document.oven.transactions
+        if cooked is not self._visible_cache_source:
+            # Cooking results in a new list. This happens on document changes, but also when a
+            # date range change makes us cook further.
+            self._visible_cache.clear()
+            self._visible_cache_source = cooked
+        key = (self.document.date_range, self.document.filter_string, self.document.filter_type)
+        txns = self._visible_cache.get(key)
+        if txns is None:
+            txns = self._filter_transactions(*key)
+            self._visible_cache[key] = txns
+            if len(self._visible_cache) > self.VISIBLE_CACHE_SIZE:
+                self._visible_cache.popitem(last=False)
+        else:
+            self._visible_cache.move_to_end(key)
         self._visible_transactions = txns
 
     # --- Override
@@ -133,13 +162,13 @@ class TransactionView(BaseView, ViewWithTransactionsMixin):
 
     # --- Event Handlers
     def date_range_changed(self):
-        self._invalidate_cache()
+        self._invalidate_visible_transactions()
 
     def document_changed(self):
         self._invalidate_cache()
 
     def filter_applied(self):
-        self._invalidate_cache()
+        self._invalidate_visible_transactions()
         self.filter_bar.refresh()
 
     def performed_undo_or_redo(self):
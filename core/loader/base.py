@@ -237,10 +237,13 @@ class Loader:
             ).format(currency)
             raise FileFormatError(msg)
 
-    def load(self):
+    def load(self, cook=True):
         """Loads the parsed info into self.accounts and self.transactions.
 
         You must have called parse() before calling this.
+
+        If ``cook`` is false, accounts are left without entries. Use it when the loaded data is
+        going to be cooked elsewhere anyway.
         """
         def load_transaction_info(info):
             description = info.description
@@ -374,7 +377,8 @@ class Loader:
                 budget.repeat_every = info.repeat_every
             self.budgets.append(budget)
         self._post_load()
-        self.oven.cook(datetime.date.min, until_date=None)
+        if cook:
+            self.oven.cook(datetime.date.min, until_date=None)
         Currencies.get_rates_db().ensure_rates(start_date, list(currencies))
 
 
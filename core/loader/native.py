@@ -13,135 +13,175 @@ from ..exception import FileFormatError
 from .base import SplitInfo, TransactionInfo
 from . import base
 
+def handle_newlines(s):
+    # etree doesn't correctly save newlines. During save, we escape them. Now's the time to
+    # restore them.
+    # XXX After a while, when most users will have used a moneyGuru version that doesn't
+    # need newline escaping on save, we can remove this one as well.
+    if not s:
+        return s
+    return s.replace('\\n', '\n')
+
 class Loader(base.Loader):
+    """Loads native moneyGuru documents.
+
+    moneyGuru documents can get big, so we don't build the whole element tree in memory. We go
+    through the file with ``iterparse()`` and read each element directly under the root as soon as
+    it's complete. Then, we throw that element away. This means that the reading is all done in
+    :meth:`_parse` and that :meth:`_load` has nothing left to do.
+    """
     FILE_OPEN_MODE = 'rb'
     NATIVE_DATE_FORMAT = '%Y-%m-%d'
     STRICT_CURRENCY = True
 
-    def _parse(self, infile):
+    def __init__(self, *args, **kwargs):
+        base.Loader.__init__(self, *args, **kwargs)
+        self._today = datetime.now().date()
+        self._element_readers = {
+            'properties': self._read_properties,
+            'group': self._read_group,
+            'account': self._read_account,
+            'transaction': self._read_root_transaction,
+            'recurrence': self._read_recurrence,
+            'budget': self._read_budget,
+        }
+
+    # --- Private
+    def _str2date(self, s, default=None):
         try:
-            root = ET.parse(infile).getroot()
-        except SyntaxError:
-            raise FileFormatError()
-        if root.tag != 'moneyguru-file':
-            raise FileFormatError()
-        self.root = root
+            return self.parse_date_str(s)
+        except (ValueError, TypeError):
+            return default
 
-    def _load(self):
-        TODAY = datetime.now().date()
+    def _read_transaction_element(self, element, info):
+        attrib = element.attrib
+        info.account = attrib.get('account')
+        info.date = self._str2date(attrib.get('date'), self._today)
+        info.description = attrib.get('description')
+        info.payee = attrib.get('payee')
+        info.checkno = attrib.get('checkno')
+        info.notes = handle_newlines(attrib.get('notes'))
+        info.transfer = attrib.get('transfer')
+        try:
+            info.mtime = int(attrib.get('mtime', 0))
+        except ValueError:
+            info.mtime = 0
+        info.reference = attrib.get('reference')
+        for split_element in element.iter('split'):
+            attrib = split_element.attrib
+            split_info = SplitInfo()
+            split_info.account = attrib.get('account')
+            split_info.amount = attrib.get('amount')
+            split_info.memo = attrib.get('memo')
+            split_info.reference = attrib.get('reference')
+            if 'reconciled' in attrib: # legacy
+                split_info.reconciled = attrib['reconciled'] == 'y'
+            if 'reconciliation_date' in attrib:
+                split_info.reconciliation_date = self._str2date(attrib['reconciliation_date'])
+            info.splits.append(split_info)
+        return info
+
+    def _read_properties(self, element):
+        for name, value in element.attrib.items():
+            # For now, all our prefs except default_currency are ints, so
+            # we can simply assume tryint, but we'll eventually need
+            # something more sophisticated.
+            if name != 'default_currency':
+                value = tryint(value, default=None)
+            if name and value is not None:
+                self.properties[name] = value
+
+    def _read_group(self, element):
+        self.start_group()
+        attrib = element.attrib
+        self.group_info.name = attrib.get('name')
+        self.group_info.type = attrib.get('type')
+        self.flush_group()
 
-        def str2date(s, default=None):
+    def _read_account(self, element):
+        self.start_account()
+        attrib = element.attrib
+        self.account_info.name = attrib.get('name')
+        self.account_info.currency = attrib.get('currency')
+        self.account_info.type = attrib.get('type')
+        self.account_info.group = attrib.get('group')
+        self.account_info.budget = attrib.get('budget')
+        self.account_info.budget_target = attrib.get('budget_target')
+        self.account_info.reference = attrib.get('reference')
+        self.account_info.account_number = attrib.get('account_number', '')
+        self.account_info.inactive = attrib.get('inactive') == 'y'
+        self.account_info.notes = handle_newlines(attrib.get('notes', ''))
+        self.flush_account()
+
+    def _read_root_transaction(self, element):
+        self.start_transaction()
+        self._read_transaction_element(element, self.transaction_info)
+        self.flush_transaction()
+
+    def _read_recurrence(self, element):
+        attrib = element.attrib
+        self.recurrence_info.repeat_type = attrib.get('type')
+        self.recurrence_info.repeat_every = int(attrib.get('every', '1'))
+        self.recurrence_info.stop_date = self._str2date(attrib.get('stop_date'))
+        self._read_transaction_element(element.find('transaction'), self.recurrence_info.transaction_info)
+        for exception_element in element.iter('exception'):
             try:
-                return self.parse_date_str(s)
-            except (ValueError, TypeError):
-                return default
-
-        def handle_newlines(s):
-            # etree doesn't correctly save newlines. During save, we escape them. Now's the time to
-            # restore them.
-            # XXX After a while, when most users will have used a moneyGuru version that doesn't
-            # need newline escaping on save, we can remove this one as well.
-            if not s:
-                return s
-            return s.replace('\\n', '\n')
-
-        def read_transaction_element(element, info):
-            attrib = element.attrib
-            info.account = attrib.get('account')
-            info.date = str2date(attrib.get('date'), TODAY)
-            info.description = attrib.get('description')
-            info.payee = attrib.get('payee')
-            info.checkno = attrib.get('checkno')
-            info.notes = handle_newlines(attrib.get('notes'))
-            info.transfer = attrib.get('transfer')
+                date = self._str2date(exception_element.attrib['date'])
+                txn_element = exception_element.find('transaction')
+                txn = None
+                if txn_element is not None:
+                    txn = self._read_transaction_element(txn_element, TransactionInfo())
+                self.recurrence_info.date2exception[date] = txn
+            except KeyError:
+                continue
+        for change_element in element.iter('change'):
             try:
-                info.mtime = int(attrib.get('mtime', 0))
-            except ValueError:
-                info.mtime = 0
-            info.reference = attrib.get('reference')
-            for split_element in element.iter('split'):
-                attrib = split_element.attrib
-                split_info = SplitInfo()
-                split_info.account = split_element.attrib.get('account')
-                split_info.amount = split_element.attrib.get('amount')
-                split_info.memo = split_element.attrib.get('memo')
-                split_info.reference = split_element.attrib.get('reference')
-                if 'reconciled' in split_element.attrib: # legacy
-                    split_info.reconciled = split_element.attrib['reconciled'] == 'y'
-                if 'reconciliation_date' in split_element.attrib:
-                    split_info.reconciliation_date = str2date(split_element.attrib['reconciliation_date'])
-                info.splits.append(split_info)
-            return info
-
-        root = self.root
-        self.document_id = root.attrib.get('document_id')
-        props_element = root.find('properties')
-        if props_element is not None:
-            for name, value in props_element.attrib.items():
-                # For now, all our prefs except default_currency are ints, so
-                # we can simply assume tryint, but we'll eventually need
-                # something more sophisticated.
-                if name != 'default_currency':
-                    value = tryint(value, default=None)
-                if name and value is not None:
-                    self.properties[name] = value
-        for group_element in root.iter('group'):
-            self.start_group()
-            attrib = group_element.attrib
-            self.group_info.name = attrib.get('name')
-            self.group_info.type = attrib.get('type')
-            self.flush_group()
-        for account_element in root.iter('account'):
-            self.start_account()
-            attrib = account_element.attrib
-            self.account_info.name = attrib.get('name')
-            self.account_info.currency = attrib.get('currency')
-            self.account_info.type = attrib.get('type')
-            self.account_info.group = attrib.get('group')
-            self.account_info.budget = attrib.get('budget')
-            self.account_info.budget_target = attrib.get('budget_target')
-            self.account_info.reference = attrib.get('reference')
-            self.account_info.account_number = attrib.get('account_number', '')
-            self.account_info.inactive = attrib.get('inactive') == 'y'
-            self.account_info.notes = handle_newlines(attrib.get('notes', ''))
-            self.flush_account()
-        elements = [e for e in root if e.tag == 'transaction'] # we only want transaction element *at the root*
-        for transaction_element in elements:
-            self.start_transaction()
-            read_transaction_element(transaction_element, self.transaction_info)
-            self.flush_transaction()
-        for recurrence_element in root.iter('recurrence'):
-            attrib = recurrence_element.attrib
-            self.recurrence_info.repeat_type = attrib.get('type')
-            self.recurrence_info.repeat_every = int(attrib.get('every', '1'))
-            self.recurrence_info.stop_date = str2date(attrib.get('stop_date'))
-            read_transaction_element(recurrence_element.find('transaction'), self.recurrence_info.transaction_info)
-            for exception_element in recurrence_element.iter('exception'):
-                try:
-                    date = str2date(exception_element.attrib['date'])
-                    txn_element = exception_element.find('transaction')
-                    txn = read_transaction_element(txn_element, TransactionInfo()) if txn_element is not None else None
-                    self.recurrence_info.date2exception[date] = txn
-                except KeyError:
-                    continue
-            for change_element in recurrence_element.iter('change'):
-                try:
-                    date = str2date(change_element.attrib['date'])
-                    txn_element = change_element.find('transaction')
-                    txn = read_transaction_element(txn_element, TransactionInfo()) if txn_element is not None else None
-                    self.recurrence_info.date2globalchange[date] = txn
-                except KeyError:
+                date = self._str2date(change_element.attrib['date'])
+                txn_element = change_element.find('transaction')
+                txn = None
+                if txn_element is not None:
+                    txn = self._read_transaction_element(txn_element, TransactionInfo())
+                self.recurrence_info.date2globalchange[date] = txn
+            except KeyError:
+                continue
+        self.flush_recurrence()
+
+    def _read_budget(self, element):
+        attrib = element.attrib
+        self.budget_info.account = attrib.get('account')
+        self.budget_info.repeat_type = attrib.get('type')
+        self.budget_info.repeat_every = tryint(attrib.get('every'), default=None)
+        self.budget_info.target = attrib.get('target')
+        self.budget_info.amount = attrib.get('amount')
+        self.budget_info.notes = attrib.get('notes')
+        self.budget_info.start_date = self._str2date(attrib.get('start_date'))
+        self.budget_info.stop_date = self._str2date(attrib.get('stop_date'))
+        self.flush_budget()
+
+    # --- Override
+    def _parse(self, infile):
+        try:
+            events = ET.iterparse(infile, events=('start', 'end'))
+            _, root = next(events)
+            if root.tag != 'moneyguru-file':
+                raise FileFormatError()
+            self.document_id = root.attrib.get('document_id')
+            depth = 0
+            for event, element in events:
+                if event == 'start':
+                    depth += 1
                     continue
-            self.flush_recurrence()
-        for budget_element in root.iter('budget'):
-            attrib = budget_element.attrib
-            self.budget_info.account = attrib.get('account')
-            self.budget_info.repeat_type = attrib.get('type')
-            self.budget_info.repeat_every = tryint(attrib.get('every'), default=None)
-            self.budget_info.target = attrib.get('target')
-            self.budget_info.amount = attrib.get('amount')
-            self.budget_info.notes = attrib.get('notes')
-            self.budget_info.start_date = str2date(attrib.get('start_date'))
-            self.budget_info.stop_date = str2date(attrib.get('stop_date'))
-            self.flush_budget()
+                depth -= 1
+                if depth == 0:
+                    # We only read elements directly under the root. Their children are read along
+                    # with them.
+                    reader = self._element_readers.get(element.tag)
+                    if reader is not None:
+                        reader(element)
+                    root.clear()
+        except SyntaxError:
+            raise FileFormatError()
 
+    def _load(self):
+        # Everything has already been read in _parse().
+        pass
@@ -0,0 +1,277 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Binary snapshots of native documents.
+
+A snapshot holds the same data as the native document it was made from, but packed in fixed-size
+records: dates are ordinals, amounts are int64 values (in the currency's smallest unit) and
+accounts are referred to by their index. Reading it doesn't require any XML or amount parsing.
+
+A snapshot is only valid for the exact document it was made from. Its header holds the SHA-1 of
+that document and :class:`Loader` refuses to load it if the document's hash is different.
+
+Next to a snapshot, we can also have the running balances that were cooked from it (see
+:func:`load_cooked`). Those are also tied to the exchange rates and the current date that were used
+for the cook.
+"""
+
+import datetime
+import hashlib
+import struct
+
+from ..exception import FileFormatError
+from ..model.account import Account, Group
+from ..model.amount import Amount, of_currency
+from ..model.budget import Budget
+from ..model.currency import Currencies
+from ..model.recurrence import Recurrence, Spawn
+from ..model.transaction import Transaction, Split
+from . import base
+
+SNAPSHOT_MAGIC = b'MGSNAP'
+SNAPSHOT_VERSION = 1
+
+HEADER = struct.Struct('<6sH20s')
+COUNT = struct.Struct('<I')
+STRLEN = struct.Struct('<I')
+BOOL = struct.Struct('<B')
+# group index, inactive
+ACCOUNT = struct.Struct('<iB')
+# date, mtime, position, split count
+TRANSACTION = struct.Struct('<iqIH')
+# account index, reconciliation date, amount value
+SPLIT = struct.Struct('<iiq')
+# every, stop date
+RECURRENCE = struct.Struct('<ii')
+# recurrence date, has a transaction
+SPAWN = struct.Struct('<iB')
+# account index, target index, amount value, every, start date, stop date
+BUDGET = struct.Struct('<iiqiii')
+
+COOKED_MAGIC = b'MGCOOK'
+COOKED_VERSION = 1
+# account index, entry count
+COOKED_ACCOUNT = struct.Struct('<II')
+# balance, reconciled balance, balance with budget
+BALANCES = struct.Struct('<qqq')
+
+NONE_STRLEN = 0xffffffff
+NO_INDEX = -1
+
+def source_hash(filename):
+    """Returns the SHA-1 digest of ``filename``'s contents.
+
+    This is what ties a snapshot to the document it was made from.
+    """
+    result = hashlib.sha1()
+    with open(filename, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(1024 * 1024), b''):
+            result.update(chunk)
+    return result.digest()
+
+def cooked_key(source_hash, until_date, currencies):
+    """Returns a digest identifying a cook of the document with ``source_hash``.
+
+    Other than the document itself, cooked balances depend on ``until_date``, on the current date
+    (budgets) and on exchange rates for ``currencies``. Rates can be overwritten at dates we
+    already have, so we use a checksum of the rates we have for each currency.
+    """
+    ratesdb = Currencies.get_rates_db()
+    checksums = [(currency, ratesdb.rates_checksum(currency)) for currency in sorted(currencies)]
+    data = repr((datetime.date.today(), until_date, checksums)).encode('utf-8')
+    return hashlib.sha1(source_hash + data).digest()
+
+def load_cooked(filename, expected_key, accounts):
+    """Loads running balances saved with :func:`.saver.snapshot.save_cooked`.
+
+    ``accounts`` must be in the same order as when the balances were saved. The result can be
+    passed to :meth:`.Oven.cook` as ``precooked``. Raises ``FileFormatError`` if ``filename``
+    wasn't saved with ``expected_key`` (as returned by :func:`cooked_key`).
+    """
+    try:
+        with open(filename, 'rb') as fp:
+            data = fp.read()
+        magic, version, key = HEADER.unpack_from(data)
+        if magic != COOKED_MAGIC or version != COOKED_VERSION or key != expected_key:
+            raise FileFormatError()
+        result = {}
+        offset = HEADER.size
+        account_count, = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        for _ in range(account_count):
+            account_index, entry_count = COOKED_ACCOUNT.unpack_from(data, offset)
+            offset += COOKED_ACCOUNT.size
+            account = accounts[account_index]
+            end = offset + entry_count * BALANCES.size
+            # Balances are saved as the raw values that entry lists hold.
+            result[account] = list(BALANCES.iter_unpack(data[offset:end]))
+            offset = end
+    except (OSError, struct.error, IndexError):
+        raise FileFormatError()
+    return result
+
+def date2ordinal(d):
+    return d.toordinal() if d is not None else 0
+
+def ordinal2date(ordinal):
+    return datetime.date.fromordinal(ordinal) if ordinal else None
+
+def amount2raw(amount):
+    """Returns ``(value, currency)`` with ``value`` being an int in the currency's smallest unit.
+    """
+    if not amount:
+        return 0, None
+    currency = amount.currency_code
+    return round(float(amount) * 10 ** Currencies.exponent(currency)), currency
+
+def raw2amount(value, currency):
+    if not value:
+        return 0
+    return Amount(value / 10 ** Currencies.exponent(currency), currency)
+
+
+class Loader(base.Loader):
+    """Loads a snapshot made with :func:`.saver.snapshot.save`.
+
+    Unlike other loaders, this one directly creates model instances in :meth:`load`. The result is
+    the same as loading the source document with :class:`.native.Loader`, except that nothing is
+    cooked yet.
+
+    :meth:`_parse` raises ``FileFormatError`` if the snapshot wasn't made from a document with
+    ``expected_hash`` (as returned by :func:`source_hash`) or if it was made with another version of
+    the format.
+    """
+    FILE_OPEN_MODE = 'rb'
+
+    def __init__(self, default_currency, expected_hash):
+        base.Loader.__init__(self, default_currency)
+        self.expected_hash = expected_hash
+        self._data = None
+        self._offset = 0
+
+    # --- Private
+    def _unpack(self, record):
+        result = record.unpack_from(self._data, self._offset)
+        self._offset += record.size
+        return result
+
+    def _read_count(self):
+        return self._unpack(COUNT)[0]
+
+    def _read_str(self):
+        length, = self._unpack(STRLEN)
+        if length == NONE_STRLEN:
+            return None
+        start = self._offset
+        self._offset += length
+        return str(self._data[start:self._offset], 'utf-8')
+
+    def _read_transaction(self, accounts):
+        date, mtime, position, split_count = self._unpack(TRANSACTION)
+        transaction = Transaction(ordinal2date(date), self._read_str(), self._read_str(), self._read_str())
+        transaction.notes = self._read_str()
+        transaction.mtime = mtime
+        transaction.position = position
+        for _ in range(split_count):
+            account_index, reconciliation_date, value = self._unpack(SPLIT)
+            account = accounts[account_index] if account_index != NO_INDEX else None
+            amount = raw2amount(value, self._read_str())
+            split = Split(transaction, account, amount)
+            split.memo = self._read_str()
+            split.reference = self._read_str()
+            if account is not None and of_currency(amount, account.currency):
+                split.reconciliation_date = ordinal2date(reconciliation_date)
+            transaction.splits.append(split)
+        # Unlike native documents, snapshots are never edited by hand. Their transactions are
+        # already balanced.
+        return transaction
+
+    def _read_spawns(self, accounts):
+        # yields (recurrence_date, transaction or None)
+        for _ in range(self._read_count()):
+            recurrence_date, has_transaction = self._unpack(SPAWN)
+            txn = self._read_transaction(accounts) if has_transaction else None
+            yield ordinal2date(recurrence_date), txn
+
+    def _load_snapshot(self):
+        self.document_id = self._read_str()
+        for _ in range(self._read_count()):
+            name = self._read_str()
+            is_int, = self._unpack(BOOL)
+            value = self._read_str()
+            self.properties[name] = int(value) if is_int else value
+        for _ in range(self._read_count()):
+            name = self._read_str()
+            self.groups.append(Group(name, self._read_str()))
+        accounts = []
+        currencies = set()
+        for _ in range(self._read_count()):
+            group_index, inactive = self._unpack(ACCOUNT)
+            account = Account(self._read_str(), self._read_str(), self._read_str())
+            if group_index != NO_INDEX:
+                account.group = self.groups[group_index]
+            account.reference = self._read_str()
+            account.account_number = self._read_str()
+            account.notes = self._read_str()
+            account.inactive = bool(inactive)
+            currencies.add(account.currency)
+            self.accounts.add(account)
+            accounts.append(account)
+        start_date = datetime.date.max
+        for _ in range(self._read_count()):
+            transaction = self._read_transaction(accounts)
+            start_date = min(start_date, transaction.date)
+            currencies.update(s.amount.currency_code for s in transaction.splits if s.amount)
+            self.transactions.add(transaction, position=transaction.position)
+        for _ in range(self._read_count()):
+            repeat_type = self._read_str()
+            repeat_every, stop_date = self._unpack(RECURRENCE)
+            ref = self._read_transaction(accounts)
+            recurrence = Recurrence(ref, repeat_type, repeat_every)
+            recurrence.stop_date = ordinal2date(stop_date)
+            # Exceptions and global changes are added in the same order as in the base loader
+            # because deleting spawns can move the recurrence's start date.
+            for date, exception in self._read_spawns(accounts):
+                if exception is not None:
+                    recurrence.date2exception[date] = Spawn(recurrence, exception, date, exception.date)
+                else:
+                    recurrence.delete_at(date)
+            for date, change in self._read_spawns(accounts):
+                recurrence.date2globalchange[date] = Spawn(recurrence, change, date, change.date)
+            self.schedules.append(recurrence)
+        for _ in range(self._read_count()):
+            account_index, target_index, value, repeat_every, budget_start, budget_stop = self._unpack(BUDGET)
+            account = accounts[account_index]
+            target = accounts[target_index] if target_index != NO_INDEX else None
+            amount = raw2amount(value, self._read_str())
+            repeat_type = self._read_str()
+            budget = Budget(account, target, amount, ordinal2date(budget_start), repeat_type=repeat_type)
+            budget.notes = self._read_str()
+            budget.stop_date = ordinal2date(budget_stop)
+            if repeat_every:
+                budget.repeat_every = repeat_every
+            self.budgets.append(budget)
+        Currencies.get_rates_db().ensure_rates(start_date, list(currencies))
+
+    # --- Override
+    def _parse(self, infile):
+        data = infile.read()
+        try:
+            magic, version, digest = HEADER.unpack_from(data)
+        except struct.error:
+            raise FileFormatError()
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or digest != self.expected_hash:
+            raise FileFormatError()
+        self._data = data
+        self._offset = HEADER.size
+
+    def load(self):
+        try:
+            self._load_snapshot()
+        except (struct.error, UnicodeDecodeError, IndexError, ValueError):
+            raise FileFormatError()
+        finally:
+            self._data = None
@@ -6,7 +6,7 @@
 
 from ._ccore import ( # noqa
     Amount, amount_format as format_amount, amount_parse as parse_amount,
-    amount_convert as convert_amount,
+    amount_convert as convert_amount, amount_convert_many as convert_amounts,
     UnsupportedCurrencyError)
 
 
@@ -4,9 +4,11 @@
 # which should be included with this package. The terms are also available at
 # http://www.gnu.org/licenses/gpl-3.0.html
 
+import bisect
 from datetime import date
+from operator import attrgetter
 
-from hscommon.util import extract
+from hscommon.util import nonone
 
 from .amount import prorate_amount
 from .date import DateRange, ONE_DAY
@@ -18,8 +20,45 @@ class BudgetSpawn(Spawn):
 
     The only difference with a normal spawn is that its ``is_budget`` attribute is true.
     """
+    __slots__ = []
     is_budget = True
 
+class BudgetTransactionIndex:
+    """Transactions that can affect budget spawns, by account and sorted by date.
+
+    It's built once for a round of spawning and passed to :meth:`Budget.get_spawns` for each budget.
+    This way, the transactions of a spawn's period can be found with a couple of bisects instead of
+    going through all transactions for each spawn.
+
+    :param transactions: Transactions that can affect budget spawns.
+    :type transactions: list of :class:`.Transaction`
+    :param accounts: Accounts for which we index transactions. Other accounts are ignored.
+    :type accounts: set of :class:`.Account`
+    """
+    def __init__(self, transactions, accounts):
+        account2transactions = {account: [] for account in accounts}
+        for transaction in transactions:
+            for account in transaction.affected_accounts():
+                account_transactions = account2transactions.get(account)
+                if account_transactions is not None:
+                    account_transactions.append(transaction)
+        self._account2transactions = {}
+        self._account2dates = {}
+        for account, account_transactions in account2transactions.items():
+            account_transactions.sort(key=attrgetter('date'))
+            self._account2transactions[account] = account_transactions
+            self._account2dates[account] = [t.date for t in account_transactions]
+
+    def transactions(self, account, start_date, end_date):
+        """Returns transactions affecting ``account`` from ``start_date`` to ``end_date``."""
+        dates = self._account2dates.get(account)
+        if not dates:
+            return []
+        start_index = bisect.bisect_left(dates, start_date)
+        end_index = bisect.bisect_right(dates, end_date)
+        return self._account2transactions[account][start_index:end_index]
+
+
 class Budget(Recurrence):
     """Regular budget for a specific account.
 
@@ -52,12 +91,34 @@ class Budget(Recurrence):
         #: ``str``. Freeform notes from the user.
         self.notes = ''
         self._previous_spawns = []
+        # (currency, today): amounts of our previous spawns. See _spawn_amounts()
+        self._spawn_amounts_cache = {}
         ref = Transaction(ref_date)
         Recurrence.__init__(self, ref, repeat_type, 1)
 
     def __repr__(self):
         return '<Budget %r %r %r>' % (self.account, self.target, self.amount)
 
+    # --- Private
+    def _spawn_amounts(self, currency):
+        # Returns (starts, ends, amounts, cumulative) for our previous spawns with a non-zero amount
+        # in ``currency``. Starts and ends are those of the period over which the spawn is prorated.
+        # ``cumulative[i]`` is the sum of the amounts of spawns before ``i``.
+        today = date.today()
+        key = (currency, today)
+        if key not in self._spawn_amounts_cache:
+            starts, ends, amounts, cumulative = [], [], [], [0]
+            for spawn in self._previous_spawns:
+                amount = spawn.amount_for_account(self.account, currency)
+                if not amount:
+                    continue
+                starts.append(max(spawn.recurrence_date, today + ONE_DAY))
+                ends.append(spawn.date)
+                amounts.append(amount)
+                cumulative.append(cumulative[-1] + amount)
+            self._spawn_amounts_cache[key] = (starts, ends, amounts, cumulative)
+        return self._spawn_amounts_cache[key]
+
     # --- Override
     def _create_spawn(self, ref, recurrence_date):
         # `recurrence_date` is the date at which the budget *starts*.
@@ -67,14 +128,14 @@ class Budget(Recurrence):
         end_date = next(date_counter) - ONE_DAY
         return BudgetSpawn(self, ref, recurrence_date=recurrence_date, date=end_date)
 
-    def get_spawns(self, end, transactions, consumedtxns):
+    def get_spawns(self, end, transaction_index, consumedtxns):
         """Returns the list of transactions spawned by our budget.
 
         Works pretty much like :meth:`core.model.recurrence.Recurrence.get_spawns`, except for the
         extra arguments.
 
-        :param transactions: Transactions that can affect our budget spawns' final amount.
-        :type transactions: list of :class:`.Transaction`
+        :param transaction_index: Transactions that can affect our budget spawns' final amount.
+        :type transaction_index: :class:`BudgetTransactionIndex`
         :param consumedtxns: Transactions that have already been "consumed" by a budget spawn in
                              this current round of spawning (one a budget "ate" a transaction, we
                              don't have it affect another). This set is going to be mutated
@@ -87,12 +148,9 @@ class Budget(Recurrence):
         spawns = [spawn for spawn in spawns if spawn.date > date.today()]
         account = self.account
         budget_amount = self.amount if account.is_debit_account() else -self.amount
-        relevant_transactions = set(t for t in transactions if account in t.affected_accounts())
-        relevant_transactions -= consumedtxns
         for spawn in spawns:
-            affects_spawn = lambda t: spawn.recurrence_date <= t.date <= spawn.date
-            wheat, shaft = extract(affects_spawn, relevant_transactions)
-            relevant_transactions = shaft
+            wheat = transaction_index.transactions(account, spawn.recurrence_date, spawn.date)
+            wheat = [t for t in wheat if t not in consumedtxns]
             txns_amount = sum(t.amount_for_account(account, budget_amount.currency_code) for t in wheat)
             if abs(txns_amount) < abs(budget_amount):
                 spawn_amount = budget_amount - txns_amount
@@ -101,11 +159,23 @@ class Budget(Recurrence):
                     spawn.set_splits([Split(spawn, account, spawn_amount), Split(spawn, self.target, -spawn_amount)])
             else:
                 spawn.set_splits([])
-            consumedtxns |= set(wheat)
+            consumedtxns.update(wheat)
         self._previous_spawns = spawns
+        self._spawn_amounts_cache = {}
         return spawns
 
     # --- Public
+    def affecting_start_date(self):
+        """Returns the earliest date at which a transaction can affect our spawns.
+
+        We only spawn in the future and a spawn is affected by transactions from its recurrence
+        date, which is the start of its period. That makes it the start of the period that contains
+        tomorrow.
+        """
+        tomorrow = date.today() + ONE_DAY
+        date_counter = DateCounter(self.start_date, self.repeat_type, self.repeat_every, tomorrow)
+        return nonone(date_counter.last_date_until(tomorrow), self.start_date)
+
     def amount_for_date_range(self, date_range, currency):
         """Returns the budgeted amount for ``date_range``.
 
@@ -123,15 +193,22 @@ class Budget(Recurrence):
         :type currency: :class:`.Currency`
         :rtype: :class:`.Amount`
         """
-        total_amount = 0
-        for spawn in self._previous_spawns:
-            amount = spawn.amount_for_account(self.account, currency)
-            if not amount:
-                continue
-            my_start_date = max(spawn.recurrence_date, date.today() + ONE_DAY)
-            my_end_date = spawn.date
-            my_date_range = DateRange(my_start_date, my_end_date)
-            total_amount += prorate_amount(amount, my_date_range, date_range)
+        starts, ends, amounts, cumulative = self._spawn_amounts(currency)
+        # Spawns are sorted and don't overlap. Only the first and last spawns intersecting with our
+        # date range can be partially covered by it. Those in between are fully covered.
+        first = bisect.bisect_left(ends, date_range.start)
+        last = bisect.bisect_right(starts, date_range.end) - 1
+        if first > last:
+            return 0
+
+        def prorated(index):
+            return prorate_amount(amounts[index], DateRange(starts[index], ends[index]), date_range)
+
+        total_amount = prorated(first)
+        if last > first:
+            if last > first + 1:
+                total_amount += cumulative[last] - cumulative[first+1]
+            total_amount += prorated(last)
         return total_amount
 
 
@@ -6,26 +6,76 @@
 # which should be included with this package. The terms are also available at 
 # http://www.gnu.org/licenses/gpl-3.0.html
 
+from bisect import bisect_left
+
 from hscommon.util import dedupe
 
 from .sort import sort_string
 
+class CompletionIndex:
+    """Prefix index of completion candidates.
+
+    Candidates are kept sorted by their normalized (:func:`.sort_string`) value so that finding
+    those that start with a prefix is a matter of bisecting. We normalize candidates only once.
+
+    'candidates' is the list of candidate values to be tried, the most likely candidate first.
+    'previous' is an index of candidates that were used before. Its normalized values are reused
+    instead of being computed again.
+    """
+    def __init__(self, candidates, previous=None):
+        candidates = dedupe(c.strip() for c in candidates)
+        previous_normalized = previous._candidate2normalized if previous is not None else {}
+        self._candidate2normalized = {}
+        for candidate in candidates:
+            normalized = previous_normalized.get(candidate)
+            if normalized is None:
+                normalized = sort_string(candidate)
+            self._candidate2normalized[candidate] = normalized
+        # (normalized, rank, candidate), rank being the index of the candidate in `candidates`.
+        entries = sorted(
+            (normalized, rank, candidate)
+            for rank, (candidate, normalized) in enumerate(self._candidate2normalized.items())
+        )
+        self._normalized = [normalized for normalized, rank, candidate in entries]
+        self._ranks = [rank for normalized, rank, candidate in entries]
+        self._candidates = [candidate for normalized, rank, candidate in entries]
+
+    def __len__(self):
+        return len(self._candidates)
+
+    def matches(self, partial):
+        """Returns candidates starting with ``partial``, the most likely candidate first.
+
+        Case and diacritics are ignored.
+        """
+        partial = sort_string(partial)
+        normalized = self._normalized
+        index = bisect_left(normalized, partial)
+        rank_and_candidates = []
+        while index < len(normalized) and normalized[index].startswith(partial):
+            rank_and_candidates.append((self._ranks[index], self._candidates[index]))
+            index += 1
+        rank_and_candidates.sort()
+        return [candidate for rank, candidate in rank_and_candidates]
+
+    def sorted_candidates(self):
+        """Returns all candidates sorted by their normalized value."""
+        return list(self._candidates)
+
+
 class CompletionList:
     def __init__(self, partial, candidates):
         """Build a completion list.
 
         'partial' is the partial value to be completed
-        'candidates' is the list of candidate values to be tried, the most likely candidate first."""
+        'candidates' is the list of candidate values to be tried, the most likely candidate first.
+        It can also be a :class:`CompletionIndex` of those candidates."""
         if not partial:
             self._completions = None
             return
-        partial = sort_string(partial)
-        candidates = dedupe(c.strip() for c in candidates)
-        self._completions = []
-        for candidate in candidates:
-            normalized = sort_string(candidate)
-            if normalized.startswith(partial):
-                self._completions.append(candidate)
+        if not isinstance(candidates, CompletionIndex):
+            candidates = CompletionIndex(candidates)
+        self._completions = candidates.matches(partial)
         self._completions.reverse()
         if self._completions:
             self._index = len(self._completions) - 1
@@ -149,6 +149,14 @@ class RatesDB:
         """
         return _ccore.currency_daterange(currency_code)
 
+    def rates_checksum(self, currency_code):
+        """Returns a checksum of all rates we have for ``currency_code``.
+
+        The checksum changes whenever a rate is added or changed. Returns ``None`` if the currency
+        isn't registered.
+        """
+        return _ccore.currency_rates_checksum(currency_code)
+
     def get_rate(self, date, currency1_code, currency2_code):
         """Returns the exchange rate between currency1 and currency2 for date.
 
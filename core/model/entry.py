@@ -8,12 +8,15 @@
 
 import bisect
 import datetime
-from collections import defaultdict
+from array import array
 from collections.abc import Sequence
-from itertools import takewhile
+from itertools import groupby
+from operator import itemgetter
 
 from hscommon.util import flatten
-from .amount import convert_amount, same_currency
+from .amount import Amount, convert_amount, convert_amounts, same_currency
+from .currency import Currencies
+from .date import DateRange, ONE_DAY
 
 class Entry:
     """Wrapper around a :class:`.Split` to show in an :class:`.Account` ledger.
@@ -28,6 +31,9 @@ class Entry:
     Most entries are created by the :class:`.Oven`, which does the necessary calculations to compute
     running total information that the entry needs on init.
     """
+    # The oven creates an entry per split at each cook. Without a __dict__, they're much smaller.
+    __slots__ = ['split', 'amount', 'balance', 'reconciled_balance', 'balance_with_budget', 'index']
+
     def __init__(self, split, amount, balance, reconciled_balance, balance_with_budget):
         #: The :class:`.Split` our entry wraps.
         self.split = split
@@ -160,29 +166,77 @@ class EntryList(Sequence):
     The main roles of this class is to manage entry order as well as managing "last entries" to be
     able to easily answer questions like "What's the running total of the last entry at date X?"
 
+    Entries aren't stored as :class:`Entry` instances, but in columns: a list of splits, a list of
+    amounts and an int64 ``array`` for each running balance. Balances are in the smallest unit of
+    the account's currency (see :meth:`raw_amount`). An :class:`Entry` is only created when it's
+    accessed, and then kept for further accesses. Balance and cash flow queries work on the columns.
+
     :param account: :class:`.Account` for which we manage entries.
     """
     def __init__(self, account):
         #: :class:`.Account` for which we manage entries.
         self.account = account
+        # Columns, all aligned.
+        self._splits = []
+        self._amounts = []
+        self._balances = array('q')
+        self._reconciled_balances = array('q')
+        self._balances_with_budget = array('q')
+        # Entry instances created so far, None for the others. Also aligned with columns.
         self._entries = []
-        self._date2entries = defaultdict(list)
+        # currency: factor to go from an amount to raw values
+        self._currency2factor = {}
         self._sorted_entry_dates = []
+        # The following lists are aligned with _sorted_entry_dates and contain cumulative values
+        # up to (and including) the date at the same index. _cumulative_counts contains the number
+        # of entries and the dicts, indexed by currency code, contain cumulative amounts and entry
+        # counts of non-budget entries in that currency. With these, we can compute cash flows with
+        # a couple of bisects.
+        self._cumulative_counts = []
+        self._currency2cumflows = {}
+        self._currency2cumcounts = {}
         # the key for this dict is (date_range, currency)
         self._daterange2cashflow = {}
+        # (reconciliation key, index) of the last reconciled entry
         self._last_reconciled = None
 
     def __getitem__(self, key):
-        return self._entries.__getitem__(key)
+        if isinstance(key, slice):
+            return [self[index] for index in range(*key.indices(len(self._splits)))]
+        entry = self._entries[key]
+        if entry is None:
+            if key < 0:
+                key += len(self._splits)
+            entry = Entry(
+                self._splits[key], self._amounts[key], self._raw2amount(self._balances[key]),
+                self._raw2amount(self._reconciled_balances[key]),
+                self._raw2amount(self._balances_with_budget[key]),
+            )
+            entry.index = key
+            self._entries[key] = entry
+        return entry
 
     def __len__(self):
-        return len(self._entries)
+        return len(self._splits)
 
     # --- Private
-    def _balance(self, balance_attr, date=None, currency=None):
-        entry = self.last_entry(date) if date else self.last_entry()
-        if entry:
-            balance = getattr(entry, balance_attr)
+    def _factor(self):
+        currency = self.account.currency
+        try:
+            return self._currency2factor[currency]
+        except KeyError:
+            factor = self._currency2factor[currency] = 10 ** Currencies.exponent(currency)
+            return factor
+
+    def _raw2amount(self, value):
+        if not value:
+            return 0
+        return Amount(value / self._factor(), self.account.currency)
+
+    def _balance(self, balances, date=None, currency=None):
+        index = self._last_index(date) if date else len(self._splits) - 1
+        if index >= 0:
+            balance = self._raw2amount(balances[index])
             if currency:
                 return convert_amount(balance, currency, date)
             else:
@@ -190,28 +244,105 @@ class EntryList(Sequence):
         else:
             return 0
 
-    def _cash_flow(self, date_range, currency):
-        cache = self._date2entries
-        entries = flatten(cache[date] for date in date_range if date in cache)
-        entries = (e for e in entries if not getattr(e.transaction, 'is_budget', False))
-        amounts = (convert_amount(e.amount, currency, e.date) for e in entries)
-        return sum(amounts)
+    def _cash_flows(self, date_ranges, currency):
+        result = []
+        # Foreign amounts have to be converted with the rate at their own date, so for those, we
+        # have no choice but to go through the entries one by one. We convert them all in one batch.
+        # (index in result, amount, date)
+        foreign = []
+        dates = self._sorted_entry_dates
+        for date_range in date_ranges:
+            start_index = bisect.bisect_left(dates, date_range.start)
+            end_index = bisect.bisect_right(dates, date_range.end)
+            if start_index >= end_index:
+                result.append(0)
+                continue
+
+            def delta(cumulative):
+                return cumulative[end_index-1] - (cumulative[start_index-1] if start_index else 0)
+
+            cash_flow = 0
+            must_convert = False
+            for code, cumflows in self._currency2cumflows.items():
+                if code == currency:
+                    cash_flow += delta(cumflows)
+                elif delta(self._currency2cumcounts[code]):
+                    must_convert = True
+            if must_convert:
+                first = self._cumulative_counts[start_index-1] if start_index else 0
+                last = self._cumulative_counts[end_index-1]
+                for split, amount in zip(self._splits[first:last], self._amounts[first:last]):
+                    transaction = split.transaction
+                    if amount and amount.currency_code != currency and not getattr(transaction, 'is_budget', False):
+                        foreign.append((len(result), amount, transaction.date))
+            result.append(cash_flow)
+        if foreign:
+            indexes, amounts, amount_dates = zip(*foreign)
+            converted = convert_amounts(amounts, currency, amount_dates)
+            for index, group in groupby(zip(indexes, converted), key=itemgetter(0)):
+                result[index] += sum(amount for _, amount in group)
+        return result
+
+    def _last_index(self, date):
+        # Index of the last entry with a date that isn't after ``date``. -1 if there's none.
+        index = bisect.bisect_right(self._sorted_entry_dates, date) - 1
+        return self._cumulative_counts[index] - 1 if index >= 0 else -1
+
+    def _reconciliation_key(self, index):
+        # Same as Entry.reconciliation_key, but without an Entry.
+        split = self._splits[index]
+        transaction = split.transaction
+        recdate = split.reconciliation_date
+        if recdate is None:
+            recdate = datetime.date.min
+        return (recdate, transaction.date, transaction.position, index)
 
     # --- Public
+    def add(self, split, amount, balance, reconciled_balance, balance_with_budget):
+        """Adds an entry for ``split`` to the list.
+
+        Balances are raw values (see :meth:`raw_amount`). Like with :meth:`add_entry`, calls must
+        always be made in order.
+        """
+        index = len(self._splits)
+        self._splits.append(split)
+        self._amounts.append(amount)
+        self._balances.append(balance)
+        self._reconciled_balances.append(reconciled_balance)
+        self._balances_with_budget.append(balance_with_budget)
+        self._entries.append(None)
+        transaction = split.transaction
+        date = transaction.date
+        if not self._sorted_entry_dates or self._sorted_entry_dates[-1] < date:
+            self._sorted_entry_dates.append(date)
+            self._cumulative_counts.append(0)
+            for cumulative in flatten([self._currency2cumflows.values(), self._currency2cumcounts.values()]):
+                cumulative.append(cumulative[-1])
+        self._cumulative_counts[-1] = index + 1
+        if amount and not getattr(transaction, 'is_budget', False):
+            code = amount.currency_code
+            if code not in self._currency2cumflows:
+                self._currency2cumflows[code] = [0] * len(self._sorted_entry_dates)
+                self._currency2cumcounts[code] = [0] * len(self._sorted_entry_dates)
+            self._currency2cumflows[code][-1] += amount
+            self._currency2cumcounts[code][-1] += 1
+        key = self._reconciliation_key(index)
+        if (self._last_reconciled is None) or (key >= self._last_reconciled):
+            self._last_reconciled = key
+
     def add_entry(self, entry):
         """Add ``entry`` to the list.
 
         add_entry() calls must *always* be made in order (this is called pretty much only by the
-        :class:`.Oven`).
+        :class:`.Oven`). Balances of ``entry`` have to be in the account's currency.
         """
-        entry.index = len(self)
-        self._entries.append(entry)
-        date = entry.date
-        self._date2entries[date].append(entry)
-        if not self._sorted_entry_dates or self._sorted_entry_dates[-1] < date:
-            self._sorted_entry_dates.append(date)
-        if (self._last_reconciled is None) or (entry.reconciliation_key >= self._last_reconciled.reconciliation_key):
-            self._last_reconciled = entry
+        raw = self.raw_amount
+        self.add(
+            entry.split, entry.amount, raw(entry.balance), raw(entry.reconciled_balance),
+            raw(entry.balance_with_budget)
+        )
+        entry.index = len(self._splits) - 1
+        self._entries[-1] = entry
 
     def balance(self, date=None, currency=None):
         """Returns running balance for :attr:`account` at ``date``.
@@ -221,19 +352,61 @@ class EntryList(Sequence):
         :param date: ``datetime.date``
         :param currency: :class:`.Currency`
         """
-        return self._balance('balance', date, currency=currency)
+        return self._balance(self._balances, date, currency=currency)
+
+    def balance_change_dates(self, date_range, currency=None):
+        """Returns a sorted list of dates in ``date_range`` at which :meth:`balance` might change.
+
+        Between two of these dates (and between the start of ``date_range`` and the first of them),
+        ``balance(date, currency)`` is the same every day. If ``currency`` isn't our account's
+        currency, the balance is converted with the exchange rate of each day, so every day where
+        we have a non-zero balance is a potential change.
+        """
+        dates = self._sorted_entry_dates
+        start_index = bisect.bisect_left(dates, date_range.start)
+        end_index = bisect.bisect_right(dates, date_range.end)
+        result = dates[start_index:end_index]
+        if not currency or currency == self.account.currency:
+            return result
+        result = set(result)
+        # Each entry date starts a period, until the next entry date, during which the raw balance
+        # stays the same. The one before our range might overlap it.
+        for index in range(max(start_index - 1, 0), end_index):
+            if not self._balances[self._cumulative_counts[index] - 1]:
+                continue
+            start = max(dates[index], date_range.start)
+            end = dates[index+1] - ONE_DAY if index + 1 < len(dates) else date_range.end
+            result.update(DateRange(start, min(end, date_range.end)))
+        return sorted(result)
+
+    def balances(self, dates, currency=None):
+        """Returns :meth:`balance` for each date of ``dates``.
+
+        Conversions, if any, are made in a single batch.
+        """
+        balances = self._balances
+        result = []
+        for date in dates:
+            index = self._last_index(date)
+            result.append(self._raw2amount(balances[index]) if index >= 0 else 0)
+        if currency:
+            indexes = [i for i, balance in enumerate(result) if balance]
+            converted = convert_amounts([result[i] for i in indexes], currency, [dates[i] for i in indexes])
+            for index, balance in zip(indexes, converted):
+                result[index] = balance
+        return result
 
     def balance_of_reconciled(self):
         """Returns :attr:`Entry.reconciled_balance` for our last reconciled entry."""
-        entry = self._last_reconciled
-        if entry is not None:
-            return entry.reconciled_balance
+        if self._last_reconciled is not None:
+            index = self._last_reconciled[-1]
+            return self._raw2amount(self._reconciled_balances[index])
         else:
             return 0
 
     def balance_with_budget(self, date=None, currency=None):
         """Same as :meth:`balance`, but including :class:`.Budget` spawns."""
-        return self._balance('balance_with_budget', date, currency=currency)
+        return self._balance(self._balances_with_budget, date, currency=currency)
 
     def cash_flow(self, date_range, currency=None):
         """Returns the sum of entry amounts occuring in ``date_range``.
@@ -243,50 +416,67 @@ class EntryList(Sequence):
         :param date_range: :class:`.DateRange`
         :param currency: :class:`.Currency`
         """
+        return self.cash_flows([date_range], currency)[0]
+
+    def cash_flows(self, date_ranges, currency=None):
+        """Returns :meth:`cash_flow` for each range of ``date_ranges``.
+
+        This is what graphs use to get the cash flow of each of their periods. Amounts that have to
+        be converted are converted in a single batch for all ranges.
+        """
         currency = currency or self.account.currency
-        cache_key = (date_range, currency)
-        if cache_key not in self._daterange2cashflow:
-            cash_flow = self._cash_flow(date_range, currency)
-            self._daterange2cashflow[cache_key] = cash_flow
-        return self._daterange2cashflow[cache_key]
+        cache = self._daterange2cashflow
+        missing = [r for r in date_ranges if (r, currency) not in cache]
+        if missing:
+            for date_range, cash_flow in zip(missing, self._cash_flows(missing, currency)):
+                cache[(date_range, currency)] = cash_flow
+        return [cache[(r, currency)] for r in date_ranges]
 
     def clear(self, from_date):
         """Remove all entries from ``from_date``."""
         if from_date is None:
-            self._entries = []
+            count = 0
         else:
-            self._entries = list(takewhile(lambda e: e.date < from_date, self._entries))
-        if self._entries:
             index = bisect.bisect_left(self._sorted_entry_dates, from_date)
-            for date in self._sorted_entry_dates[index:]:
-                del self._date2entries[date]
+            count = self._cumulative_counts[index-1] if index else 0
+        for column in [
+                self._splits, self._amounts, self._balances, self._reconciled_balances,
+                self._balances_with_budget, self._entries]:
+            del column[count:]
+        if count:
             for date_range, currency in list(self._daterange2cashflow.keys()):
                 if date_range.end >= from_date:
                     del self._daterange2cashflow[(date_range, currency)]
             del self._sorted_entry_dates[index:]
-            self._last_reconciled = max(self._entries, key=lambda e: e.reconciliation_key)
+            del self._cumulative_counts[index:]
+            for cumulative in flatten([self._currency2cumflows.values(), self._currency2cumcounts.values()]):
+                del cumulative[index:]
+            self._last_reconciled = max(self._reconciliation_key(i) for i in range(count))
         else:
-            self._date2entries = defaultdict(list)
             self._daterange2cashflow = {}
             self._sorted_entry_dates = []
+            self._cumulative_counts = []
+            self._currency2cumflows = {}
+            self._currency2cumcounts = {}
             self._last_reconciled = None
 
+    def entries_in_range(self, date_range):
+        """Returns a list of entries with a date in ``date_range``."""
+        dates = self._sorted_entry_dates
+        start_index = bisect.bisect_left(dates, date_range.start)
+        end_index = bisect.bisect_right(dates, date_range.end)
+        if start_index >= end_index:
+            return []
+        first = self._cumulative_counts[start_index-1] if start_index else 0
+        return self[first:self._cumulative_counts[end_index-1]]
+
     def last_entry(self, date=None):
         """Return the last entry with a date that isn't after ``date``.
 
         If ``date`` isn't specified, returns the last entry in the list.
         """
-        if self._entries:
-            if date is None:
-                return self._entries[-1]
-            else:
-                if date not in self._date2entries: # find the nearest smaller date
-                    index = bisect.bisect_right(self._sorted_entry_dates, date) - 1
-                    if index < 0:
-                        return None
-                    date = self._sorted_entry_dates[index]
-                return self._date2entries[date][-1]
-        return None
+        index = self._last_index(date) if date is not None else len(self._splits) - 1
+        return self[index] if index >= 0 else None
 
     def normal_balance(self, date=None, currency=None):
         """Returns a :meth:`normalized <.Account.normalize_amount>` :meth:`balance`."""
@@ -304,3 +494,28 @@ class EntryList(Sequence):
         cash_flow = self.cash_flow(date_range, currency)
         return self.account.normalize_amount(cash_flow)
 
+    def normal_cash_flows(self, date_ranges, currency=None):
+        """Returns a :meth:`normalized <.Account.normalize_amount>` :meth:`cash_flows`."""
+        cash_flows = self.cash_flows(date_ranges, currency)
+        return [self.account.normalize_amount(cash_flow) for cash_flow in cash_flows]
+
+    def raw_amount(self, amount):
+        """Returns ``amount``, which is in the account's currency, as a raw value.
+
+        Raw values are ints in the smallest unit of the currency (cents for USD).
+        """
+        return round(float(amount) * self._factor()) if amount else 0
+
+    def raw_balances(self):
+        """Returns a list of raw ``(balance, reconciled_balance, balance_with_budget)``.
+
+        There's one tuple per entry, in entry order.
+        """
+        return list(zip(self._balances, self._reconciled_balances, self._balances_with_budget))
+
+    def splits(self):
+        """Returns a list of the splits of our entries, in entry order.
+
+        Unlike going through entries, this doesn't create :class:`Entry` instances.
+        """
+        return list(self._splits)
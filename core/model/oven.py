@@ -6,16 +6,21 @@
 # which should be included with this package. The terms are also available at
 # http://www.gnu.org/licenses/gpl-3.0.html
 
+import bisect
 from collections import defaultdict
 from datetime import date
-from itertools import dropwhile
+from itertools import dropwhile, takewhile
 from operator import attrgetter
 
 from hscommon.util import flatten
 
-from .amount import convert_amount
-from .entry import Entry
-from .budget import BudgetSpawn
+from .amount import convert_amounts
+from .budget import BudgetSpawn, BudgetTransactionIndex
+from .recurrence import Spawn
+
+# Number of possible recurrence dates. Spawn positions of each schedule are in their own range of
+# that size.
+DATE_COUNT = date.max.toordinal() + 1
 
 class Oven:
     """Computes raw data from transactions, schedules, budgets.
@@ -25,8 +30,8 @@ class Oven:
     1. Spawns schedule and budget transactions and insert them into its cooked result,
        :attr:`transactions`. This :class:`.TransactionList` is what is then used by the rest of the
        app to display transactions and account entries.
-    2. Creates :class:`.Entry` instances to place in :attr:`.Account.entries`. These entries contain
-       running totals for each account (which is, of course, calculated).
+    2. Adds entries to :attr:`.Account.entries`. These entries contain running totals for each
+       account (which is, of course, calculated).
     """
     def __init__(self, accounts, transactions, scheduled, budgets):
         self._accounts = accounts
@@ -37,13 +42,18 @@ class Oven:
         #: List of cooked transactions, containing :class:`.Transaction` instances mixed with
         #: schedule and budget :class:`.Spawn` instances (in date/position order).
         self.transactions = []
+        # Dates of cooked transactions, aligned with ``transactions``. Computed on demand.
+        self._cooked_dates = None
 
+    # --- Private
     def _budget_spawns(self, until_date, schedule_spawns):
         if not self._budgets:
             return []
         result = []
         ref_date = min(b.start_date for b in self._budgets)
         relevant_txns = list(dropwhile(lambda t: t.date < ref_date, self._transactions)) + schedule_spawns
+        budget_accounts = {b.account for b in self._budgets if b.amount}
+        transaction_index = BudgetTransactionIndex(relevant_txns, budget_accounts)
         # It's possible to have 2 budgets overlapping in date range and having the same account
         # When it happens, we need to keep track of which budget "consume" which txns
         account2consumedtxns = defaultdict(set)
@@ -51,11 +61,24 @@ class Oven:
             if not budget.amount:
                 continue
             consumedtxns = account2consumedtxns[budget.account]
-            spawns = budget.get_spawns(until_date, relevant_txns, consumedtxns)
+            spawns = budget.get_spawns(until_date, transaction_index, consumedtxns)
             spawns = [spawn for spawn in spawns if not spawn.is_null]
             result += spawns
         return result
 
+    def _schedule_spawns(self, until_date, start_date):
+        # Spawns before start_date, if any, are already cooked. We don't need them.
+        return flatten(recurrence.get_spawns(until_date, start=start_date) for recurrence in self._scheduled)
+
+    def _spawn_start_date(self, from_date):
+        # Schedule spawns that we cook start at from_date, but budgets also need those that can
+        # affect their spawns.
+        result = from_date
+        for budget in self._budgets:
+            if budget.amount:
+                result = min(result, budget.affecting_start_date())
+        return result
+
     def _cook_reconciliation_balances(self, splits, start_balance):
         balance = start_balance
         result = {} # split: reconciliation balance
@@ -74,18 +97,82 @@ class Oven:
         return result
 
     def _cook_splits(self, account, splits):
+        # Running balances are computed with raw values (see EntryList.raw_amount()).
         entries = account.entries
-        balance = entries.balance()
-        balance_with_budget = entries.balance_with_budget()
+        raw = entries.raw_amount
+        balance = raw(entries.balance())
+        balance_with_budget = raw(entries.balance_with_budget())
         split2reconciledbal = self._cook_reconciliation_balances(splits, entries.balance_of_reconciled())
-        for split in splits:
-            amount = split.amount
-            converted_amount = convert_amount(amount, account.currency, split.transaction.date)
+        amounts = [split.amount for split in splits]
+        dates = [split.transaction.date for split in splits]
+        converted_amounts = convert_amounts(amounts, account.currency, dates)
+        for split, amount, converted_amount in zip(splits, amounts, converted_amounts):
+            converted_amount = raw(converted_amount)
             balance_with_budget += converted_amount
             if not isinstance(split.transaction, BudgetSpawn):
                 balance += converted_amount
-            reconciled_balance = split2reconciledbal[split]
-            entries.add_entry(Entry(split, amount, balance, reconciled_balance, balance_with_budget))
+            reconciled_balance = raw(split2reconciledbal[split])
+            entries.add(split, amount, balance, reconciled_balance, balance_with_budget)
+
+    def _restore_splits(self, account, splits, balances):
+        # Same as _cook_splits(), but with balances that were cooked previously.
+        entries = account.entries
+        for split, (balance, reconciled_balance, balance_with_budget) in zip(splits, balances):
+            entries.add(split, split.amount, balance, reconciled_balance, balance_with_budget)
+
+    def _changed_spawns(self, from_date, spawns):
+        # Returns spawns from `from_date` that are either new since our last cook or that were
+        # cooked last time but aren't spawned anymore.
+        cooked = reversed(self.transactions)
+        cooked = takewhile(lambda t: t.date >= from_date, cooked)
+        old_spawns = {t for t in cooked if isinstance(t, Spawn)}
+        new_spawns = {s for s in spawns if s.date >= from_date}
+        return old_spawns ^ new_spawns
+
+    def _dirty_accounts(self, accounts):
+        # Budget spawns for an account depend on the transactions of that account. If that account
+        # is dirty, the budget's spawns might change, which makes its target dirty as well.
+        result = set(accounts)
+        for budget in self._budgets:
+            if budget.account in result:
+                result.add(budget.target)
+        result.discard(None)
+        return result
+
+    def _reconciliation_from_date(self, from_date, accounts):
+        # it's possible that we have to reduce from_date a bit. If a split from before as a
+        # reconciled date >= from_date, we have to set from_date to that split's normal date
+        # We reverse the transactions to correctly detect chained overlappings in date/recdate
+        splits = flatten(t.splits for t in reversed(self.transactions)) # splits from *cooked* txns
+        if accounts is not None:
+            splits = (s for s in splits if s.account in accounts)
+        for split in splits:
+            rdate = split.reconciliation_date
+            if rdate is not None and rdate >= from_date:
+                from_date = min(from_date, split.transaction.date)
+        return from_date
+
+    # --- Public
+    def cooked_balances(self):
+        """Returns running balances of all accounts' entries.
+
+        The result is a ``dict`` of ``account: [(balance, reconciled_balance, balance_with_budget)]``
+        with one tuple of raw values (see :meth:`.EntryList.raw_amount`) per entry, in entry order.
+        It can be given back to :meth:`cook` as ``precooked``.
+        """
+        return {account: account.entries.raw_balances() for account in self._accounts}
+
+    def transactions_in_range(self, date_range):
+        """Returns the cooked transactions that are in ``date_range``.
+
+        This is the same as filtering :attr:`transactions` with ``date_range``, but because they're
+        sorted by date, we only have to bisect them.
+        """
+        if self._cooked_dates is None:
+            self._cooked_dates = [t.date for t in self.transactions]
+        start_index = bisect.bisect_left(self._cooked_dates, date_range.start)
+        end_index = bisect.bisect_right(self._cooked_dates, date_range.end)
+        return self.transactions[start_index:end_index]
 
     def continue_cooking(self, until_date):
         """Cooks from where we stop last time until ``until_date``.
@@ -98,7 +185,7 @@ class Oven:
         if until_date > self._cooked_until:
             self.cook(self._cooked_until, until_date)
 
-    def cook(self, from_date=None, until_date=None):
+    def cook(self, from_date=None, until_date=None, accounts=None, precooked=None):
         """Cooks raw data into :attr:`transactions`.
 
         :param from_date: when set, saves calculation time by re-using existing cooked transactions.
@@ -107,36 +194,63 @@ class Oven:
                            cooking. If we don't, we might end up in an infinite loop. If not set,
                            will be the date of the transaction with the highest date.
         :type until_date: ``datetime.date``
+        :param accounts: when set, only the entries of these accounts (and of the targets of
+                         budgets depending on them) are re-cooked. Entries of all other accounts
+                         are kept as they are. It's the responsibility of the caller to include
+                         every account that was affected by the change, *before* and *after* it
+                         happened.
+        :type accounts: collection of :class:`.Account`
+        :param precooked: when set, running balances are taken from there instead of being
+                          computed. It must come from :meth:`cooked_balances` after a cook of the
+                          exact same data up to the same ``until_date``. Accounts for which the
+                          number of balances doesn't match are cooked normally.
+        :type precooked: ``dict``
         """
+        if accounts is not None:
+            accounts = self._dirty_accounts(accounts)
         # Determine from/until dates
         if from_date is None:
             from_date = date.min
         else:
-            # it's possible that we have to reduce from_date a bit. If a split from before as a
-            # reconciled date >= from_date, we have to set from_date to that split's normal date
-            # We reverse the transactions to correctly detect chained overlappings in date/recdate
-            splits = flatten(t.splits for t in reversed(self.transactions)) # splits from *cooked* txns
-            for split in splits:
-                rdate = split.reconciliation_date
-                if rdate is not None and rdate >= from_date:
-                    from_date = min(from_date, split.transaction.date)
+            from_date = self._reconciliation_from_date(from_date, accounts)
         self._transactions.sort(key=attrgetter('date', 'position')) # needed in case until_date is None
         if until_date is None:
             until_date = self._transactions[-1].date if self._transactions else from_date
+        spawn_start = self._spawn_start_date(from_date)
+        schedule_spawns = self._schedule_spawns(until_date, spawn_start)
+        budget_spawns = self._budget_spawns(until_date, schedule_spawns)
+        spawns = schedule_spawns + budget_spawns
+        if accounts is not None:
+            # A schedule that had its spawn cache reset yields new spawn instances and a deleted
+            # spawn is simply gone. Accounts affected by these spawns have to be re-cooked too.
+            changed_spawns = self._changed_spawns(from_date, spawns)
+            spawn_accounts = set(flatten(s.affected_accounts() for s in changed_spawns))
+            if not spawn_accounts <= accounts:
+                accounts = self._dirty_accounts(accounts | spawn_accounts)
+                from_date = self._reconciliation_from_date(from_date, accounts)
+                if from_date < spawn_start:
+                    schedule_spawns = self._schedule_spawns(until_date, from_date)
+                    spawns = schedule_spawns + budget_spawns
         # Clear old cooked data
-        for account in self._accounts:
+        for account in (self._accounts if accounts is None else accounts):
             account.entries.clear(from_date)
         if from_date == date.min:
             self.transactions = []
         else:
             self.transactions = [t for t in self.transactions if t.date < from_date]
         # Cook
-        spawns = flatten(recurrence.get_spawns(until_date) for recurrence in self._scheduled)
-        spawns += self._budget_spawns(until_date, spawns)
         # To ensure that our sort order stay correct and consistent, we assign position values
-        # to our spawns. To ensure that there's no overlap, we start our position counter at
-        # len(transactions)
-        for counter, spawn in enumerate(spawns, start=len(self._transactions)):
+        # to our spawns. To ensure that there's no overlap, we start our positions at
+        # len(transactions). We only spawn schedules from spawn_start, so a schedule spawn's
+        # position comes from its schedule and its recurrence date rather than from its index in
+        # our list. This way, it doesn't depend on the date we cook from.
+        start_position = len(self._transactions)
+        schedule2index = {schedule: index for index, schedule in enumerate(self._scheduled)}
+        for spawn in schedule_spawns:
+            schedule_position = start_position + schedule2index[spawn.recurrence] * DATE_COUNT
+            spawn.position = schedule_position + spawn.recurrence_date.toordinal()
+        start_position += len(self._scheduled) * DATE_COUNT
+        for counter, spawn in enumerate(budget_spawns, start=start_position):
             spawn.position = counter
         txns = self._transactions + spawns
         # we don't filter out txns > until_date because they might be budgets affecting current data
@@ -147,10 +261,15 @@ class Oven:
         account2splits = defaultdict(list)
         for split in splits:
             account = split.account
-            if account is not None:
+            if account is not None and (accounts is None or account in accounts):
                 account2splits[account].append(split)
         for account, splits in account2splits.items():
-            self._cook_splits(account, splits)
+            balances = precooked.get(account) if precooked is not None else None
+            if balances is not None and len(balances) == len(splits):
+                self._restore_splits(account, splits, balances)
+            else:
+                self._cook_splits(account, splits)
         self.transactions += tocook
+        self._cooked_dates = None
         self._cooked_until = until_date
 
@@ -45,6 +45,20 @@ RTYPE2INCFUNC = {
     RepeatType.WeekdayLast: inc_last_weekday_in_month,
 }
 
+def _month_count(date1, date2):
+    return (date2.year - date1.year) * 12 + date2.month - date1.month
+
+# Number of increments (as in the ``count`` argument of inc functions) needed to go from a date to
+# another. It's exact for days and weeks, but it can be one increment too high for month-based types.
+RTYPE2INCCOUNTFUNC = {
+    RepeatType.Daily: lambda date1, date2: (date2 - date1).days,
+    RepeatType.Weekly: lambda date1, date2: (date2 - date1).days // 7,
+    RepeatType.Monthly: _month_count,
+    RepeatType.Yearly: lambda date1, date2: _month_count(date1, date2) // 12,
+    RepeatType.Weekday: _month_count,
+    RepeatType.WeekdayLast: _month_count,
+}
+
 ONE_DAY = datetime.timedelta(1)
 
 class DateCounter:
@@ -77,6 +91,7 @@ class DateCounter:
         self.end = end
         self.inccount = 0
         self.incfunc = RTYPE2INCFUNC[repeat_type]
+        self.inccountfunc = RTYPE2INCCOUNTFUNC[repeat_type]
         self.incsize = repeat_every
         self.current_date = None
 
@@ -100,6 +115,46 @@ class DateCounter:
         self.current_date = new_date
         return new_date
 
+    def skip_to(self, date):
+        """Skips all dates before ``date``.
+
+        Rather than going through all these dates, we compute where we should be with date
+        arithmetic. Must be called before the iteration begins.
+        """
+        if date <= self.base_date:
+            return
+        # This count of increments lands before ``date``. We then move forward until the next
+        # increment lands on or after it, which shouldn't take more than a couple of steps.
+        count = self.inccountfunc(self.base_date, date) - 1
+        count = max(count // self.incsize * self.incsize, 0)
+        while True:
+            new_date = self.incfunc(self.base_date, count + self.incsize)
+            if new_date is not None and new_date >= date:
+                break
+            count += self.incsize
+        self.inccount = count
+        # Any date before the next one will do. What matters is that base_date isn't yielded.
+        self.current_date = self.base_date
+
+    def last_date_until(self, date):
+        """Returns the last date we'd yield that is ``date`` or earlier.
+
+        This gives the same result as iterating until ``date``, but uses :meth:`skip_to`. Returns
+        ``None`` if ``date`` is before our base date. Must be called before the iteration begins.
+        """
+        if date < self.base_date:
+            return None
+        self.skip_to(date + ONE_DAY)
+        # We're now at the increment preceding the first date after ``date``. With weekday types,
+        # some increments don't land on a date and we have to go back further.
+        count = self.inccount
+        while count:
+            result = self.incfunc(self.base_date, count)
+            if result is not None:
+                return result
+            count -= self.incsize
+        return self.base_date
+
 
 class Spawn(Transaction):
     """Instance of a recurrent transaction at a specific date.
@@ -116,6 +171,8 @@ class Spawn(Transaction):
 
     Subclasses :class:`.Transaction`.
     """
+    __slots__ = ['recurrence_date', 'ref', 'recurrence']
+
     def __init__(self, recurrence, ref, recurrence_date, date=None):
         date = date or recurrence_date
         Transaction.__init__(self, date, ref.description, ref.payee, ref.checkno)
@@ -188,6 +245,8 @@ class Recurrence:
         self.date2globalchange = {}
         #: ``recurrent_date -> transaction`` mapping of spawns. Used as a cache. Frequently purged.
         self.date2instances = {}
+        # No instance in date2instances has a recurrence date later than this.
+        self._instances_until = datetime.date.min
         self.rtype2desc = {
             RepeatType.Daily: tr('Daily'),
             RepeatType.Weekly: tr('Weekly'),
@@ -209,6 +268,11 @@ class Recurrence:
     def _create_spawn(self, ref, date):
         return Spawn(self, ref, date)
 
+    def _is_recurrence_date(self, date):
+        date_counter = DateCounter(self.start_date, self.repeat_type, self.repeat_every, date)
+        date_counter.skip_to(date)
+        return next(date_counter, None) == date
+
     def _update_ref(self):
         # Go through our recurrence dates and see if we should either move our start date due to
         # deleted spawns or to update or ref transaction due to a global change that end up being
@@ -282,12 +346,17 @@ class Recurrence:
         self.date2exception[date] = None
         self._update_ref()
 
-    def get_spawns(self, end):
+    def get_spawns(self, end, start=None):
         """Returns the list of transactions spawned by our recurrence.
 
         We start at :attr:`start_date` and end at ``end``. We have to specify an end to our spawning
         to avoid getting infinite results.
 
+        If ``start`` is specified, we skip spawns that can't have a date that is ``start`` or later.
+        Rather than going through all recurrence dates before it, we jump directly to the first
+        relevant one (see :meth:`DateCounter.skip_to`). Note that some spawns with an earlier date
+        might still be returned.
+
         .. rubric:: End date adjustment
 
         If a changed date end up being smaller than the "spawn date", it's possible that a spawn
@@ -297,6 +366,7 @@ class Recurrence:
         doesn't go far enough, so we must adjust our max date by this delta.
 
         :param datetime.date end: When to stop spawning.
+        :param datetime.date start: Spawns before that date aren't needed.
         :rtype: list of :class:`Spawn`
         """
         if self.date2exception:
@@ -311,6 +381,23 @@ class Recurrence:
         result = []
         global_date_delta = datetime.timedelta(days=0)
         current_ref = self.ref
+        if start is not None and start > self.start_date:
+            # Global changes can push spawns after their recurrence date. Those we skip must not end
+            # up at ``start`` or later.
+            deltas = [ref.date - date for date, ref in self.date2globalchange.items()]
+            max_date_delta = max(deltas + [datetime.timedelta(days=0)])
+            skip_until = start - min(max_date_delta, start - datetime.date.min)
+            date_counter.skip_to(skip_until)
+            skipped_changes = [date for date in self.date2globalchange if date < skip_until]
+            if skipped_changes:
+                change_date = max(skipped_changes)
+                current_ref = self.date2globalchange[change_date]
+                global_date_delta = current_ref.date - change_date
+            # Local exceptions can be moved anywhere.
+            for date, exception in sorted(self.date2exception.items()):
+                if date < skip_until and exception is not None and exception.date >= start \
+                        and self._is_recurrence_date(date):
+                    result.append(exception)
         for current_date in date_counter:
             if current_date in self.date2globalchange:
                 current_ref = self.date2globalchange[current_date]
@@ -328,6 +415,12 @@ class Recurrence:
                         spawn.date = current_date + global_date_delta
                     self.date2instances[current_date] = spawn
                 result.append(self.date2instances[current_date])
+        if self._instances_until > end:
+            # Spawns after ``end`` aren't cooked anymore. We don't keep them around because they
+            # can be numerous when we've spawned far in the future. If we spawn that far again,
+            # they'll simply be re-created.
+            self.date2instances = {d: spawn for d, spawn in self.date2instances.items() if d <= end}
+        self._instances_until = end
         return result
 
     def reassign_account(self, account, reassign_to=None):
@@ -346,7 +439,7 @@ class Recurrence:
         result = copy.copy(self)
         result.date2exception = copy.copy(self.date2exception)
         result.date2globalchange = copy.copy(self.date2globalchange)
-        result.date2instances = {}
+        result.reset_spawn_cache()
         result.ref = self.ref.replicate()
         return result
 
@@ -358,6 +451,7 @@ class Recurrence:
     def reset_spawn_cache(self):
         """Empties :attr:`date2instances`."""
         self.date2instances = {}
+        self._instances_until = datetime.date.min
 
     def stop_at(self, spawn):
         """Stop further spawning at ``spawn`` (sets :attr:`stop_date`)."""
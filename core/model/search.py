@@ -0,0 +1,357 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+import re
+from bisect import bisect_left, bisect_right
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date
+
+from .amount import parse_amount
+from .date import DateRange
+
+ALL_QUERY_TYPES = ['account', 'group', 'amount', 'description', 'checkno', 'payee', 'memo']
+TARGETED_QUERY_TYPES = ALL_QUERY_TYPES + ['date']
+RE_TARGET = re.compile(r'(?:^|\s)({}):'.format('|'.join(TARGETED_QUERY_TYPES)))
+RE_OR = re.compile(r'\s+OR\s+')
+RE_AMOUNT_COMPARISON = re.compile(r'^(>=|<=|>|<)(.*)$')
+RE_DATE = re.compile(r'^(\d{4})(?:-(\d{1,2}))?(?:-(\d{1,2}))?$')
+
+class AmountRange:
+    """A range of absolute amount values, as floats.
+
+    ``low`` and ``high`` can be ``None`` for an open range. ``include_low`` and ``include_high``
+    tell whether bounds themselves are part of the range.
+    """
+    def __init__(self, low, high, include_low=True, include_high=True):
+        self.low = low
+        self.high = high
+        self.include_low = include_low
+        self.include_high = include_high
+
+    def __contains__(self, value):
+        low = self.low
+        if low is not None and (value < low or (value == low and not self.include_low)):
+            return False
+        high = self.high
+        if high is not None and (value > high or (value == high and not self.include_high)):
+            return False
+        return True
+
+
+class SearchQuery:
+    """A compiled search query, as returned by :func:`parse_query`.
+
+    ``clauses`` is a list of clauses. A transaction matches the query if it matches any of them. A
+    clause is a list of terms, and a transaction matches the clause if it matches all of them. A
+    term is a ``dict`` of criteria as in :meth:`.Transaction.matches`.
+    """
+    def __init__(self, clauses):
+        self.clauses = clauses
+
+    def matches(self, transaction):
+        """Returns whether ``transaction`` matches the query."""
+        return any(all(transaction.matches(term) for term in clause) for clause in self.clauses)
+
+    def search(self, index):
+        """Returns the set of transactions in ``index`` (a :class:`SearchIndex`) matching the query.
+
+        Terms are looked up in the index and their results are intersected (for clauses) and then
+        united.
+        """
+        result = set()
+        for clause in self.clauses:
+            matching = None
+            for term in clause:
+                term_matching = index.search(term)
+                matching = term_matching if matching is None else matching & term_matching
+                if not matching:
+                    break
+            if matching:
+                result |= matching
+        return result
+
+
+def _parse_amount_value(s, default_currency):
+    # Returns the absolute float value of ``s`` or None if it's not an amount.
+    s = s.strip()
+    if not s:
+        return None
+    try:
+        amount = parse_amount(s, default_currency, with_expression=False)
+    except ValueError:
+        return None
+    return abs(float(amount)) if amount else 0
+
+def _parse_amount_criteria(s, default_currency):
+    if '..' in s:
+        low, high = s.split('..', 1)
+        low_value = _parse_amount_value(low, default_currency)
+        high_value = _parse_amount_value(high, default_currency)
+        if (low.strip() and low_value is None) or (high.strip() and high_value is None):
+            return {}
+        return {'amount_range': AmountRange(low_value, high_value)}
+    m = RE_AMOUNT_COMPARISON.match(s)
+    if m is not None:
+        op, s = m.groups()
+        value = _parse_amount_value(s, default_currency)
+        if value is None:
+            return {}
+        if op.startswith('>'):
+            return {'amount_range': AmountRange(value, None, include_low=(op == '>='))}
+        else:
+            return {'amount_range': AmountRange(None, value, include_high=(op == '<='))}
+    try:
+        return {'amount': abs(parse_amount(s, default_currency, with_expression=False))}
+    except ValueError:
+        return {}
+
+def _parse_period(s):
+    # Returns the (first day, last day) of the period that ``s`` represents. A period is
+    # YYYY, YYYY-MM or YYYY-MM-DD.
+    m = RE_DATE.match(s.strip())
+    if m is None:
+        raise ValueError()
+    year, month, day = m.groups()
+    year = int(year)
+    if month is None:
+        return date(year, 1, 1), date(year, 12, 31)
+    month = int(month)
+    if day is None:
+        return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+    d = date(year, month, int(day))
+    return d, d
+
+def _parse_date_criteria(s):
+    try:
+        if '..' in s:
+            low, high = s.split('..', 1)
+            start = _parse_period(low)[0] if low.strip() else date.min
+            end = _parse_period(high)[1] if high.strip() else date.max
+        else:
+            start, end = _parse_period(s)
+    except ValueError:
+        return {}
+    return {'date_range': DateRange(start, end)}
+
+def _parse_criteria(qtype, qargs, default_currency):
+    if qtype in {'account', 'group'}:
+        # account and group args are comma-splitted
+        return {qtype: {s.strip() for s in qargs.split(',')}}
+    elif qtype == 'amount':
+        return _parse_amount_criteria(qargs, default_currency)
+    elif qtype == 'date':
+        return _parse_date_criteria(qargs)
+    else:
+        return {qtype: qargs}
+
+def _parse_clause(clause_string, default_currency):
+    clause = []
+    targets = list(RE_TARGET.finditer(clause_string))
+    text = clause_string[:targets[0].start()] if targets else clause_string
+    if text.strip() or not targets:
+        # Untargeted text is looked for everywhere, except in dates.
+        term = {}
+        for qtype in ALL_QUERY_TYPES:
+            if qtype == 'amount':
+                # Here, we only look for exact amounts.
+                try:
+                    term['amount'] = abs(parse_amount(text, default_currency, with_expression=False))
+                except ValueError:
+                    pass
+            else:
+                term.update(_parse_criteria(qtype, text, default_currency))
+        clause.append(term)
+    for target, next_target in zip(targets, targets[1:] + [None]):
+        end = next_target.start() if next_target is not None else len(clause_string)
+        qargs = clause_string[target.end():end].strip()
+        clause.append(_parse_criteria(target.group(1), qargs, default_currency))
+    return clause
+
+def parse_query(query_string, default_currency):
+    """Parses ``query_string`` into a :class:`SearchQuery`.
+
+    A query is made of terms that must all match. A term is either ``type:value`` or untargeted
+    text, which is looked for in all fields. ``value`` goes up to the next ``type:``, so it can
+    contain spaces. ``type`` can be:
+
+    * ``description``, ``payee``, ``memo``: the field contains ``value``.
+    * ``checkno``: the check number is ``value``.
+    * ``account``, ``group``: one of the splits' account (or its group) is named after one of the
+      comma-separated names in ``value``.
+    * ``amount``: one of the splits' absolute amount is ``value``. ``value`` can also be a range
+      (``100..200``, ``100..``, ``..200``) or a comparison (``>100``, ``>=100``, ``<100``,
+      ``<=100``).
+    * ``date``: the date is in ``value``, which is a ``YYYY``, ``YYYY-MM`` or ``YYYY-MM-DD``
+      period or a range of those (``2018-01..2018-03``, ``2018..``, ``..2018-03-15``).
+
+    Queries can be combined with ``OR`` (uppercase), which has a lower precedence than the
+    implicit "and" between terms. Everything but ``OR`` is case insensitive.
+
+    Amounts are parsed in ``default_currency`` if they don't specify a currency.
+    """
+    clauses = []
+    for clause_string in RE_OR.split(query_string.strip()):
+        clauses.append(_parse_clause(clause_string.strip().lower(), default_currency))
+    return SearchQuery(clauses)
+
+
+class SearchIndex:
+    """Inverted index of the transaction attributes that :meth:`.Transaction.matches` looks at.
+
+    For each searchable attribute, we keep the distinct (lowercased) values it has and, for each
+    of those, the transactions having it. Documents use the same descriptions, payees and memos
+    over and over, so looking for a substring in those distinct values is much faster than looking
+    at every transaction.
+
+    Accounts are indexed as accounts, not as names, so account and group changes don't require any
+    reindexing. Amounts and dates are also kept sorted for range queries.
+
+    :meth:`search` gives the same results as :meth:`.Transaction.matches` for indexed transactions.
+    """
+    def __init__(self):
+        # lowercased value: set of transactions
+        self._descriptions = defaultdict(set)
+        self._payees = defaultdict(set)
+        self._checknos = defaultdict(set)
+        self._memos = defaultdict(set)
+        # absolute float value: set of transactions
+        self._amounts = defaultdict(set)
+        # account: set of transactions
+        self._accounts = defaultdict(set)
+        # date: set of transactions
+        self._dates = defaultdict(set)
+        # Sorted keys of _amounts and _dates, for range queries. None when they have to be sorted.
+        self._sorted_amounts = None
+        self._sorted_dates = None
+        # transaction: (description, payee, checkno, memos, amounts, accounts, date) as indexed
+        self._transaction2keys = {}
+
+    # --- Private
+    def _all_postings(self):
+        return [
+            self._descriptions, self._payees, self._checknos, self._memos, self._amounts,
+            self._accounts, self._dates,
+        ]
+
+    def _range_keys(self, sorted_keys, value_range, low, high):
+        # Returns keys in ``sorted_keys`` that are ``in value_range``. ``low`` and ``high`` are the
+        # range's bounds (or None) and are used to bisect ``sorted_keys``.
+        start = bisect_left(sorted_keys, low) if low is not None else 0
+        end = bisect_right(sorted_keys, high) if high is not None else len(sorted_keys)
+        return [key for key in sorted_keys[start:end] if key in value_range]
+
+    # --- Public
+    def add(self, transaction):
+        """Adds ``transaction`` to the index.
+
+        If it's already there, its indexed values are replaced with its current values.
+        """
+        if transaction in self._transaction2keys:
+            self.remove(transaction)
+        description = transaction.description.lower()
+        payee = transaction.payee.lower()
+        checkno = transaction.checkno.lower()
+        self._descriptions[description].add(transaction)
+        self._payees[payee].add(transaction)
+        self._checknos[checkno].add(transaction)
+        # Values can be there more than once, but that doesn't matter to sets.
+        memos = []
+        amounts = []
+        accounts = []
+        for split in transaction.splits:
+            memo = split.memo.lower()
+            amount = abs(float(split.amount)) if split.amount else 0
+            memos.append(memo)
+            amounts.append(amount)
+            self._memos[memo].add(transaction)
+            if amount not in self._amounts:
+                self._sorted_amounts = None
+            self._amounts[amount].add(transaction)
+            account = split.account
+            if account is not None:
+                accounts.append(account)
+                self._accounts[account].add(transaction)
+        txn_date = transaction.date
+        if txn_date not in self._dates:
+            self._sorted_dates = None
+        self._dates[txn_date].add(transaction)
+        self._transaction2keys[transaction] = (description, payee, checkno, memos, amounts, accounts, txn_date)
+
+    def clear(self):
+        """Removes all transactions from the index."""
+        for postings in self._all_postings():
+            postings.clear()
+        self._sorted_amounts = None
+        self._sorted_dates = None
+        self._transaction2keys.clear()
+
+    def remove(self, transaction):
+        """Removes ``transaction`` from the index. Does nothing if it isn't there."""
+        keys = self._transaction2keys.pop(transaction, None)
+        if keys is None:
+            return
+        description, payee, checkno, memos, amounts, accounts, txn_date = keys
+        all_values = [[description], [payee], [checkno], memos, amounts, accounts, [txn_date]]
+        for postings, values in zip(self._all_postings(), all_values):
+            for value in values:
+                transactions = postings.get(value)
+                if transactions is not None:
+                    transactions.discard(transaction)
+                    if not transactions:
+                        del postings[value]
+                        if postings is self._amounts:
+                            self._sorted_amounts = None
+                        elif postings is self._dates:
+                            self._sorted_dates = None
+
+    def search(self, query):
+        """Returns the set of indexed transactions matching ``query``.
+
+        ``query`` is a ``dict`` of criteria, as in :meth:`.Transaction.matches`.
+        """
+        result = set()
+        for name, postings in [
+                ('description', self._descriptions), ('payee', self._payees), ('memo', self._memos)]:
+            query_value = query.get(name)
+            if query_value is not None:
+                for value, transactions in postings.items():
+                    if query_value in value:
+                        result |= transactions
+        query_checkno = query.get('checkno')
+        if query_checkno is not None:
+            result |= self._checknos.get(query_checkno, set())
+        query_amount = query.get('amount')
+        if query_amount is not None:
+            query_value = float(query_amount) if query_amount else 0
+            result |= self._amounts.get(query_value, set())
+        query_amount_range = query.get('amount_range')
+        if query_amount_range is not None:
+            if self._sorted_amounts is None:
+                self._sorted_amounts = sorted(self._amounts)
+            amounts = self._range_keys(
+                self._sorted_amounts, query_amount_range, query_amount_range.low, query_amount_range.high
+            )
+            for amount in amounts:
+                result |= self._amounts[amount]
+        query_date_range = query.get('date_range')
+        if query_date_range is not None:
+            if self._sorted_dates is None:
+                self._sorted_dates = sorted(self._dates)
+            dates = self._range_keys(
+                self._sorted_dates, query_date_range, query_date_range.start, query_date_range.end
+            )
+            for txn_date in dates:
+                result |= self._dates[txn_date]
+        query_account = query.get('account')
+        query_group = query.get('group')
+        if query_account is not None or query_group is not None:
+            for account, transactions in self._accounts.items():
+                if query_account is not None and account.name.lower() in query_account:
+                    result |= transactions
+                elif query_group is not None and account.group and account.group.name.lower() in query_group:
+                    result |= transactions
+        return result
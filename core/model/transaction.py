@@ -28,6 +28,9 @@ class Transaction:
     we initialize what would otherwise be an empty split list with two splits: One adding ``amount``
     to ``account``, and the other adding ``-amount`` to ``None`` (an unassigned split).
     """
+    # Documents can have a lot of transactions. Without a __dict__, they're much smaller.
+    __slots__ = ['date', 'description', 'payee', 'checkno', 'notes', 'splits', 'position', 'mtime']
+
     def __init__(self, date, description=None, payee=None, checkno=None, account=None, amount=None):
         #: Date at which the transation occurs.
         self.date = date
@@ -290,11 +293,14 @@ class Transaction:
         * checkno
         * memo
         * amount
+        * amount_range
+        * date_range
         * account
         * group
 
         All of these queries are string-based, except ``amount``, which requires an
-        :class:`.Amount`.
+        :class:`.Amount`, ``amount_range``, which requires a :class:`.search.AmountRange` and
+        ``date_range``, which requires a :class:`.DateRange`.
 
         Returns true if any criteria matches, false otherwise.
         """
@@ -322,6 +328,16 @@ class Transaction:
                 split_value = float(split.amount) if split.amount else 0
                 if query_value == abs(split_value):
                     return True
+        query_amount_range = query.get('amount_range')
+        if query_amount_range is not None:
+            for split in self.splits:
+                split_value = float(split.amount) if split.amount else 0
+                if abs(split_value) in query_amount_range:
+                    return True
+        query_date_range = query.get('date_range')
+        if query_date_range is not None:
+            if self.date in query_date_range:
+                return True
         query_account = query.get('account')
         if query_account is not None:
             for split in self.splits:
@@ -385,7 +401,8 @@ class Transaction:
             if len(splits) < len(self.splits):
                 del self.splits[len(splits):]
             for split, newsplit in zip(self.splits, splits):
-                split.__dict__.update(newsplit.__dict__)
+                for attrname in Split.__slots__:
+                    setattr(split, attrname, getattr(newsplit, attrname))
                 split.transaction = self
             for split in splits[len(self.splits):]:
                 split.transaction = self
@@ -478,6 +495,8 @@ class Transaction:
 
 class Split:
     """Assignment of money to an :class:`.Account` within a :class:`Transaction`."""
+    __slots__ = ['transaction', '_account', 'memo', '_amount', 'reconciliation_date', 'reference']
+
     def __init__(self, transaction, account, amount):
         #: Transaction within which our split lives.
         self.transaction = transaction
@@ -4,7 +4,96 @@
 # which should be included with this package. The terms are also available at
 # http://www.gnu.org/licenses/gpl-3.0.html
 
-from operator import itemgetter
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import count
+
+from .search import SearchIndex
+
+class MTimeIndex:
+    """Keeps values used by transactions in reverse mtime order.
+
+    The mtime of a value is the highest mtime among transactions using it. Values with the same
+    mtime are kept in the order in which they were first added.
+
+    Values are only sorted on the first call to :meth:`values`. Until then, we only record which
+    transactions use them. After that, additions and removals move values around in the already
+    sorted list.
+    """
+    def __init__(self):
+        self._value2transactions = defaultdict(dict) # value: {transaction: mtime}
+        # Only maintained once we're sorted.
+        self._value2key = {} # value: (-mtime, serial)
+        self._serials = None
+        self._keys = None
+        self._values = None
+
+    # --- Private
+    def _place(self, value, key):
+        # Moves ``value`` from its current key to ``key`` (if not None) in our sorted lists.
+        oldkey = self._value2key.get(value)
+        if oldkey == key:
+            return
+        if oldkey is not None:
+            index = bisect_left(self._keys, oldkey)
+            del self._keys[index]
+            del self._values[index]
+        if key is None:
+            del self._value2key[value]
+        else:
+            self._value2key[value] = key
+            index = bisect_left(self._keys, key)
+            self._keys.insert(index, key)
+            self._values.insert(index, value)
+
+    def _sort(self):
+        for serial, (value, transactions) in enumerate(self._value2transactions.items()):
+            self._value2key[value] = (-max(transactions.values()), serial)
+        self._serials = count(len(self._value2key))
+        key_and_values = sorted((key, value) for value, key in self._value2key.items())
+        self._keys = [key for key, value in key_and_values]
+        self._values = [value for key, value in key_and_values]
+
+    # --- Public
+    def add(self, value, transaction, mtime):
+        """Records that ``transaction``, modified at ``mtime``, uses ``value``."""
+        self._value2transactions[value][transaction] = mtime
+        if self._keys is None:
+            return
+        oldkey = self._value2key.get(value)
+        if oldkey is None:
+            self._place(value, (-mtime, next(self._serials)))
+        elif -mtime < oldkey[0]:
+            self._place(value, (-mtime, oldkey[1]))
+
+    def clear(self):
+        """Removes all values."""
+        self._value2transactions.clear()
+        self._value2key.clear()
+        self._serials = None
+        self._keys = None
+        self._values = None
+
+    def remove(self, value, transaction):
+        """Records that ``transaction`` doesn't use ``value`` anymore."""
+        transactions = self._value2transactions[value]
+        mtime = transactions.pop(transaction)
+        if not transactions:
+            del self._value2transactions[value]
+        if self._keys is None:
+            return
+        oldkey = self._value2key[value]
+        if not transactions:
+            self._place(value, None)
+        elif -mtime == oldkey[0]:
+            self._place(value, (-max(transactions.values()), oldkey[1]))
+
+    def values(self):
+        """Returns a list of all values in reverse mtime order."""
+        if self._keys is None:
+            self._sort()
+        return list(self._values)
+
 
 class TransactionList(list):
     """Manages the :class:`.Transaction` instances of a document.
@@ -13,6 +102,11 @@ class TransactionList(list):
     a cache of values to use for completion. There's only one of those in a document, in
     :attr:`.Document.transactions`.
 
+    Transactions are indexed by date and by the values we use for completion so that we don't have
+    to go through the whole list to find transactions of a specific date or to build completion
+    lists. This index follows additions and removals, but if you change a transaction that is in
+    the list, call :meth:`reindex` afterwards.
+
     Subclasses ``list``.
     """
     def __init__(self, *args, **kwargs):
@@ -20,43 +114,100 @@ class TransactionList(list):
         self._descriptions = None
         self._payees = None
         self._account_names = None
+        # date: set of transactions at that date
+        self._date2transactions = defaultdict(set)
+        # transaction: date under which it's indexed
+        self._transaction2date = {}
+        # date: highest position among transactions at that date. Only holds dates that have
+        # transactions.
+        self._date2maxpos = {}
+        # Completion indexes are only updated when we need completion data. Until then, we keep
+        # track of the transactions we have to (re)index. This way, we don't pay for them when
+        # loading a document.
+        self._description_index = MTimeIndex()
+        self._payee_index = MTimeIndex()
+        self._account_index = MTimeIndex()
+        # transaction: (description, payee, accounts) as they were when indexed
+        self._transaction2completion = {}
+        # Ordered set of transactions that have to be reindexed for completion.
+        self._completion_pending = {}
+        # Same thing for searches.
+        self._search_index = SearchIndex()
+        self._search_pending = {}
+        for transaction in self:
+            self._index(transaction)
 
     # --- Overrides
+    def __contains__(self, transaction):
+        return transaction in self._transaction2date
+
     def remove(self, transaction):
         """Removes ``transaction`` from the list."""
         list.remove(self, transaction)
-        self.clear_cache()
+        self._unindex(transaction)
 
     # --- Private
-    def _compute_completion_list(self, data_and_mtime):
-        """Returns a list of unique data sorted in mtime order.
+    def _index(self, transaction):
+        date = transaction.date
+        self._transaction2date[transaction] = date
+        self._date2transactions[date].add(transaction)
+        maxpos = self._date2maxpos.get(date)
+        if maxpos is None or transaction.position > maxpos:
+            self._date2maxpos[date] = transaction.position
+        self._completion_pending[transaction] = None
+        self._search_pending[transaction] = None
+        self.clear_cache()
 
-        ``data_and_mtime`` is an iterable containing ``(data, mtime)`` pairs.
-        """
-        data2mtime = {}
-        for data, mtime in data_and_mtime:
-            maxmtime = max(mtime, data2mtime.get(data, 0))
-            data2mtime[data] = maxmtime
-        data_and_mtime = sorted(data2mtime.items(), key=itemgetter(1), reverse=True)
-        return [data for data, mtime in data_and_mtime]
-
-    def _compute_account_names(self):
-        def data_and_mtime_gen():
-            for txn in self:
-                mtime = txn.mtime
-                for account in txn.affected_accounts():
-                    if not account.inactive:
-                        yield (account.name, mtime)
-
-        self._account_names = self._compute_completion_list(data_and_mtime_gen())
-
-    def _compute_descriptions(self):
-        data_and_mtime = ((t.description, t.mtime) for t in self)
-        self._descriptions = self._compute_completion_list(data_and_mtime)
-
-    def _compute_payees(self):
-        data_and_mtime = ((t.payee, t.mtime) for t in self)
-        self._payees = self._compute_completion_list(data_and_mtime)
+    def _unindex(self, transaction):
+        date = self._transaction2date.pop(transaction)
+        transactions = self._date2transactions[date]
+        transactions.discard(transaction)
+        if transactions:
+            self._date2maxpos[date] = max(t.position for t in transactions)
+        else:
+            del self._date2transactions[date]
+            del self._date2maxpos[date]
+        if transaction in self._transaction2completion:
+            self._completion_pending[transaction] = None
+        else:
+            self._completion_pending.pop(transaction, None)
+        self._search_pending[transaction] = None
+        self.clear_cache()
+
+    def _update_completion_indexes(self):
+        # This is called with all transactions pending after a load, so we keep the loop tight.
+        add_description = self._description_index.add
+        add_payee = self._payee_index.add
+        add_account = self._account_index.add
+        transaction2completion = self._transaction2completion
+        for transaction in self._completion_pending:
+            indexed = transaction2completion.pop(transaction, None)
+            if indexed is not None:
+                description, payee, accounts = indexed
+                self._description_index.remove(description, transaction)
+                self._payee_index.remove(payee, transaction)
+                for account in accounts:
+                    self._account_index.remove(account, transaction)
+            if transaction not in self._transaction2date:
+                continue
+            description = transaction.description
+            payee = transaction.payee
+            accounts = transaction.affected_accounts()
+            mtime = transaction.mtime
+            transaction2completion[transaction] = (description, payee, accounts)
+            add_description(description, transaction, mtime)
+            add_payee(payee, transaction, mtime)
+            for account in accounts:
+                add_account(account, transaction, mtime)
+        self._completion_pending.clear()
+
+    def _update_search_index(self):
+        for transaction in self._search_pending:
+            if transaction in self._transaction2date:
+                self._search_index.add(transaction)
+            else:
+                self._search_index.remove(transaction)
+        self._search_pending.clear()
 
     # --- Public
     def add(self, transaction, keep_position=False, position=None):
@@ -68,22 +219,33 @@ class TransactionList(list):
         if position is not None:
             transaction.position = position
         elif not keep_position:
-            transactions = self.transactions_at_date(transaction.date)
-            if transactions:
-                transaction.position = max(t.position for t in transactions) + 1
+            maxpos = self._date2maxpos.get(transaction.date)
+            if maxpos is not None:
+                transaction.position = maxpos + 1
         self.append(transaction)
-        self.clear_cache()
+        self._index(transaction)
 
     def clear(self):
         """Clears the list of all transactions."""
         del self[:]
+        self._date2transactions.clear()
+        self._transaction2date.clear()
+        self._date2maxpos.clear()
+        self._description_index.clear()
+        self._payee_index.clear()
+        self._account_index.clear()
+        self._transaction2completion.clear()
+        self._completion_pending.clear()
+        self._search_index.clear()
+        self._search_pending.clear()
         self.clear_cache()
 
     def clear_cache(self):
         """Clears cached data.
 
-        For now cache date is auto-completion data (payee, transaction, account). Call this when
-        a transaction has been changed.
+        For now cache date is auto-completion data (payee, transaction, account). It's cleared
+        whenever the index changes, but account names also depend on accounts themselves. Call this
+        when an account has been changed.
         """
         self._descriptions = None
         self._payees = None
@@ -96,10 +258,12 @@ class TransactionList(list):
         removed.
         """
         for transaction in self[:]:
+            affected = account in transaction.affected_accounts()
             transaction.reassign_account(account, reassign_to)
             if not transaction.affected_accounts():
                 self.remove(transaction)
-        self.clear_cache()
+            elif affected:
+                self.reindex(transaction)
 
     def move_before(self, from_transaction, to_transaction):
         """Moves ``from_transaction`` just before ``to_transaction``.
@@ -111,7 +275,10 @@ class TransactionList(list):
             return
         if to_transaction is not None and to_transaction.date != from_transaction.date:
             to_transaction = None
-        transactions = self.transactions_at_date(from_transaction.date)
+        date = from_transaction.date
+        # This is often called right after a date change.
+        self.reindex(from_transaction)
+        transactions = self.transactions_at_date(date)
         transactions.remove(from_transaction)
         if not transactions:
             return
@@ -123,34 +290,60 @@ class TransactionList(list):
         for transaction in transactions:
             if transaction.position >= target_position:
                 transaction.position += 1
+        self._date2maxpos[date] = max(t.position for t in self._date2transactions[date])
 
     def move_last(self, transaction):
         """Equivalent to :meth:`move_before` with ``to_transaction`` to ``None``."""
         self.move_before(transaction, None)
 
+    def reindex(self, transaction):
+        """Updates the index for ``transaction``.
+
+        Call this after having changed a transaction that is in the list. Does nothing if
+        ``transaction`` isn't in the list.
+        """
+        if transaction in self:
+            self._unindex(transaction)
+            self._index(transaction)
+
+    def search(self, transactions, query):
+        """Returns transactions in ``transactions`` that match ``query``.
+
+        ``query`` is a :class:`.SearchQuery`. This is the same as calling
+        :meth:`.SearchQuery.matches` on each of them, but transactions that are in this list are
+        looked up in our search index. The others (schedule spawns, for example), are matched one
+        by one.
+        """
+        self._update_search_index()
+        matching = query.search(self._search_index)
+        return [t for t in transactions if t in matching or (t not in self and query.matches(t))]
+
     def transactions_at_date(self, target_date):
         """Returns a set of all transactions occurring on ``target_date``."""
-        return set(t for t in self if t.date == target_date)
+        return set(self._date2transactions.get(target_date, ()))
 
     # --- Properties
     @property
     def account_names(self):
         """A list of active account names used in the transactions, in reverse mtime order."""
         if self._account_names is None:
-            self._compute_account_names()
+            self._update_completion_indexes()
+            accounts = self._account_index.values()
+            self._account_names = [a.name for a in accounts if not a.inactive]
         return self._account_names
 
     @property
     def descriptions(self):
         """A list of descriptions used in the transactions, in reverse mtime order."""
         if self._descriptions is None:
-            self._compute_descriptions()
+            self._update_completion_indexes()
+            self._descriptions = self._description_index.values()
         return self._descriptions
 
     @property
     def payees(self):
         """A list of payees used in the transactions, in reverse mtime order."""
         if self._payees is None:
-            self._compute_payees()
+            self._update_completion_indexes()
+            self._payees = self._payee_index.values()
         return self._payees
-
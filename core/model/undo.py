@@ -7,18 +7,28 @@
 # http://www.gnu.org/licenses/gpl-3.0.html
 
 import copy
+from datetime import date
 
 from hscommon.util import extract, flatten
 
 from ..model.recurrence import Spawn
+from ..model.transaction import Split
 
 ACCOUNT_SWAP_ATTRS = ['name', 'currency', 'type', 'group', 'account_number', 'notes']
 GROUP_SWAP_ATTRS = ['name', 'type']
 TRANSACTION_SWAP_ATTRS = ['date', 'description', 'payee', 'checkno', 'notes', 'position', 'splits']
 SPLIT_SWAP_ATTRS = ['account', 'amount', 'reconciliation_date']
-SCHEDULE_SWAP_ATTRS = ['repeat_type', 'repeat_every', 'stop_date', 'date2exception',
-                       'date2globalchange', 'date2instances']
+SCHEDULE_SWAP_ATTRS = ['repeat_type', 'repeat_every', 'stop_date', 'date2exception', 'date2globalchange']
 BUDGET_SWAP_ATTRS = SCHEDULE_SWAP_ATTRS + ['account', 'target', 'amount']
+# Split attributes that hold values (as opposed to the transaction it belongs to).
+SPLIT_VALUE_ATTRS = [attr for attr in Split.__slots__ if attr != 'transaction']
+
+# Once an action is compacted, values that are the same before and after it are replaced by this.
+UNCHANGED = object()
+
+# Rough maximum of instances and values held by the actions of an Undoer. When we go over it,
+# we forget about the oldest actions.
+MAX_UNDO_SIZE = 500000
 
 def swapvalues(first, second, attrs):
     for attr in attrs:
@@ -26,6 +36,40 @@ def swapvalues(first, second, attrs):
         setattr(first, attr, getattr(second, attr))
         setattr(second, attr, tmp)
 
+def backup_values(instance, attrs):
+    """Returns a tuple of the values of ``attrs`` in ``instance``."""
+    result = []
+    for attr in attrs:
+        value = getattr(instance, attr)
+        if attr == 'splits':
+            # Splits are changed in place. We need copies.
+            value = [copy.copy(split) for split in value]
+        result.append(value)
+    return tuple(result)
+
+def swapbackup(instance, backup, attrs):
+    """Sets ``backup`` values in ``instance`` and returns a backup of the values it replaced."""
+    result = []
+    for attr, value in zip(attrs, backup):
+        if value is UNCHANGED:
+            result.append(UNCHANGED)
+        else:
+            result.append(getattr(instance, attr))
+            setattr(instance, attr, value)
+    return tuple(result)
+
+def same_value(attr, value1, value2):
+    if value1 is value2:
+        return True
+    if attr == 'splits':
+        if len(value1) != len(value2):
+            return False
+        return all(
+            getattr(split1, a) == getattr(split2, a)
+            for split1, split2 in zip(value1, value2) for a in SPLIT_VALUE_ATTRS
+        )
+    return value1 == value2
+
 class Action:
     """A unit of change that can be undone and redone.
 
@@ -35,9 +79,13 @@ class Action:
     ``transactions``, ``schedules``, ``budgets``).
 
     For ``added`` and ``deleted``, it's rather easy. The set contains instances directly. For
-    ``change``, it's different. The set contains 2-sized tuples ``(instance, backup)``. Whenever
-    we're about to make a change to something, we copy it first and store that backup. Then, when
-    we undo our action, we can use our backup.
+    ``change``, it's different. Whenever we're about to make a change to something, we backup the
+    values of the attributes we can change (the ``*_SWAP_ATTRS`` lists) and, when we undo our
+    action, we swap them back. For accounts, groups, transactions and splits, ``changed_*`` are
+    dicts of ``instance: backup`` where ``backup`` is a tuple of values aligned with the attribute
+    list. Once the change is made, :meth:`compact` drops the values that didn't change. Schedules
+    and budgets are few and have more complex attributes. For those, ``changed_*`` are sets of
+    ``(instance, copy)`` tuples.
 
     To create an action, you can operate on set attributes directly for ``added`` and ``deleted``,
     but you should use convenience method for ``changed``. They perform the copying for you.
@@ -48,15 +96,15 @@ class Action:
     def __init__(self, description):
         self.description = description
         self.added_accounts = set()
-        self.changed_accounts = set()
+        self.changed_accounts = {}
         self.deleted_accounts = set()
         self.added_groups = set()
-        self.changed_groups = set()
+        self.changed_groups = {}
         self.deleted_groups = set()
         self.added_transactions = set()
-        self.changed_transactions = set()
+        self.changed_transactions = {}
         self.deleted_transactions = set()
-        self.changed_splits = set()
+        self.changed_splits = {}
         self.added_schedules = set()
         self.changed_schedules = set()
         self.deleted_schedules = set()
@@ -64,13 +112,27 @@ class Action:
         self.changed_budgets = set()
         self.deleted_budgets = set()
 
+    # --- Private
+    def _backups(self):
+        # (changed dict, attrs) for all our backups.
+        return [
+            (self.changed_accounts, ACCOUNT_SWAP_ATTRS), (self.changed_groups, GROUP_SWAP_ATTRS),
+            (self.changed_transactions, TRANSACTION_SWAP_ATTRS), (self.changed_splits, SPLIT_SWAP_ATTRS),
+        ]
+
+    def _record(self, changed, instances, attrs):
+        for instance in instances:
+            if instance not in changed:
+                changed[instance] = backup_values(instance, attrs)
+
+    # --- Public
     def change_accounts(self, accounts):
         """Record imminent changes to ``accounts``."""
-        self.changed_accounts |= set((a, copy.copy(a)) for a in accounts)
+        self._record(self.changed_accounts, accounts, ACCOUNT_SWAP_ATTRS)
 
     def change_groups(self, groups):
         """Record imminent changes to ``groups``."""
-        self.changed_groups |= set((g, copy.copy(g)) for g in groups)
+        self._record(self.changed_groups, groups, GROUP_SWAP_ATTRS)
 
     def change_schedule(self, schedule):
         """Record imminent changes to ``schedule``."""
@@ -87,13 +149,99 @@ class Action:
         schedule.
         """
         spawns, normal = extract(lambda t: isinstance(t, Spawn), transactions)
-        self.changed_transactions |= set((t, t.replicate()) for t in normal)
+        self._record(self.changed_transactions, normal, TRANSACTION_SWAP_ATTRS)
         for schedule in set(spawn.recurrence for spawn in spawns):
             self.change_schedule(schedule)
 
     def change_splits(self, splits):
         """Record imminent changes to ``splits``."""
-        self.changed_splits |= set((s, copy.copy(s)) for s in splits)
+        self._record(self.changed_splits, splits, SPLIT_SWAP_ATTRS)
+
+    def compact(self, following=None):
+        """Drops the values we don't need anymore.
+
+        Backed up values that are the same as current ones are replaced by ``UNCHANGED`` and
+        instances that didn't change at all are forgotten. Entries of deleted accounts are also
+        cleared. If we're undone, these accounts will be cooked again anyway.
+
+        This must only be called when our recorded changes have been made (or undone). If
+        ``following``, an action recorded after us, already started its changes, the values it
+        backed up are those we compare with.
+        """
+        following_backups = following._backups() if following is not None else None
+        for index, (changed, attrs) in enumerate(self._backups()):
+            following_changed = following_backups[index][0] if following_backups is not None else {}
+            for instance, backup in list(changed.items()):
+                if instance in following_changed:
+                    current = following_changed[instance]
+                else:
+                    current = [getattr(instance, attr) for attr in attrs]
+                backup = tuple(
+                    UNCHANGED if value is UNCHANGED or same_value(attr, value, current_value) else value
+                    for attr, value, current_value in zip(attrs, backup, current)
+                )
+                if all(value is UNCHANGED for value in backup):
+                    del changed[instance]
+                else:
+                    changed[instance] = backup
+        for account in self.deleted_accounts:
+            account.entries.clear(None)
+
+    def dirty_region(self):
+        """Returns the region of the document that our action touches, for :ref:`cooking <cooking>`.
+
+        Returns a ``(from_date, accounts)`` tuple. ``from_date`` is the earliest date touched by the
+        action, in its "before" or "after" state, and ``accounts`` is the set of
+        :class:`.Account` for which entries have to be re-cooked. If the action touches nothing that
+        needs cooking (a group rename, for example), ``from_date`` is ``None``.
+        """
+        dates = set()
+        accounts = set()
+
+        def add_txns(txns):
+            for txn in txns:
+                dates.add(txn.date)
+                accounts.update(txn.affected_accounts())
+
+        def add_schedules(schedules):
+            for schedule in schedules:
+                dates.add(schedule.start_date)
+                accounts.update(schedule.affected_accounts())
+
+        def add_budgets(budgets):
+            for budget in budgets:
+                dates.add(budget.start_date)
+                accounts.update([budget.account, budget.target])
+
+        for account in flatten([self.added_accounts, self.deleted_accounts, self.changed_accounts]):
+            dates.add(date.min)
+            accounts.add(account)
+        add_txns(self.added_transactions)
+        add_txns(self.deleted_transactions)
+        add_txns(self.changed_transactions)
+        # The other side of the change is in our backups.
+        date_index = TRANSACTION_SWAP_ATTRS.index('date')
+        splits_index = TRANSACTION_SWAP_ATTRS.index('splits')
+        for backup in self.changed_transactions.values():
+            if backup[date_index] is not UNCHANGED:
+                dates.add(backup[date_index])
+            if backup[splits_index] is not UNCHANGED:
+                accounts.update(split.account for split in backup[splits_index])
+        account_index = SPLIT_SWAP_ATTRS.index('account')
+        for split, backup in self.changed_splits.items():
+            dates.add(split.transaction.date)
+            accounts.add(split.account)
+            if backup[account_index] is not UNCHANGED:
+                accounts.add(backup[account_index])
+        add_schedules(self.added_schedules)
+        add_schedules(self.deleted_schedules)
+        add_schedules(flatten(self.changed_schedules))
+        add_budgets(self.added_budgets)
+        add_budgets(self.deleted_budgets)
+        add_budgets(flatten(self.changed_budgets))
+        accounts.discard(None)
+        from_date = min(dates) if dates else None
+        return from_date, accounts
 
     def delete_accounts(self, accounts, reassign=False):
         """Record the imminent deletion of ``accounts``.
@@ -107,12 +255,28 @@ class Action:
         """
         accounts = set(accounts)
         self.deleted_accounts |= accounts
-        all_entries = flatten(a.entries for a in accounts)
+        all_splits = flatten(a.entries.splits() for a in accounts)
         if not reassign:
-            transactions = {e.transaction for e in all_entries if not isinstance(e.transaction, Spawn)}
+            transactions = {s.transaction for s in all_splits if not isinstance(s.transaction, Spawn)}
             transactions = {t for t in transactions if not t.affected_accounts() - accounts}
             self.deleted_transactions |= transactions
-        self.change_splits(e.split for e in all_entries)
+        self.change_splits(all_splits)
+
+    def size(self):
+        """Returns a rough measure of the memory we hold: the number of instances and values."""
+        result = sum(len(instances) for instances in [
+            self.added_accounts, self.deleted_accounts, self.added_groups, self.deleted_groups,
+            self.added_transactions, self.deleted_transactions, self.added_schedules,
+            self.changed_schedules, self.deleted_schedules, self.added_budgets, self.changed_budgets,
+            self.deleted_budgets,
+        ])
+        for changed, attrs in self._backups():
+            for backup in changed.values():
+                result += 1
+                for value in backup:
+                    if value is not UNCHANGED:
+                        result += len(value) if isinstance(value, list) else 1
+        return result
 
 
 class Undoer:
@@ -135,6 +299,8 @@ class Undoer:
         self._budgets = budgets
         self._index = -1
         self._save_point = None
+        # Action.size() of each of our actions, aligned with self._actions.
+        self._sizes = []
 
     # --- Private
     def _add_auto_created_accounts(self, transaction):
@@ -157,23 +323,33 @@ class Undoer:
             self._budgets.append(budget)
 
     def _do_changes(self, action):
-        for account, old in action.changed_accounts:
-            swapvalues(account, old, ACCOUNT_SWAP_ATTRS)
-        for group, old in action.changed_groups:
-            swapvalues(group, old, GROUP_SWAP_ATTRS)
-        for txn, old in action.changed_transactions:
+        changed = action.changed_accounts
+        for account, backup in changed.items():
+            changed[account] = swapbackup(account, backup, ACCOUNT_SWAP_ATTRS)
+        changed = action.changed_groups
+        for group, backup in changed.items():
+            changed[group] = swapbackup(group, backup, GROUP_SWAP_ATTRS)
+        changed = action.changed_transactions
+        for txn, backup in changed.items():
             self._remove_auto_created_account(txn)
-            swapvalues(txn, old, TRANSACTION_SWAP_ATTRS)
+            changed[txn] = swapbackup(txn, backup, TRANSACTION_SWAP_ATTRS)
+            self._transactions.reindex(txn)
             for split in txn.splits:
                 split.transaction = txn
             self._add_auto_created_accounts(txn)
-        for split, old in action.changed_splits:
-            swapvalues(split, old, SPLIT_SWAP_ATTRS)
+        changed = action.changed_splits
+        for split, backup in changed.items():
+            changed[split] = swapbackup(split, backup, SPLIT_SWAP_ATTRS)
+            self._transactions.reindex(split.transaction)
+        # Spawns aren't part of the swap. They're re-created from the swapped attributes, which
+        # saves us from keeping them in our history.
         for schedule, old in action.changed_schedules:
             swapvalues(schedule, old, SCHEDULE_SWAP_ATTRS)
             swapvalues(schedule.ref, old.ref, TRANSACTION_SWAP_ATTRS)
+            schedule.reset_spawn_cache()
         for budget, old in action.changed_budgets:
             swapvalues(budget, old, BUDGET_SWAP_ATTRS)
+            budget.reset_spawn_cache()
 
     def _do_deletes(self, accounts, groups, transactions, schedules, budgets):
         for account in accounts:
@@ -217,6 +393,7 @@ class Undoer:
     def clear(self):
         """Clear our action list."""
         self._actions = []
+        self._sizes = []
 
     def undo_description(self):
         """Textual description of the action to be undone next."""
@@ -244,13 +421,26 @@ class Undoer:
         recording our new action), discard all actions following the current one before recording
         our new action.
 
+        The previous action is then done, so we :meth:`compact <Action.compact>` it. If our actions
+        hold more than ``MAX_UNDO_SIZE`` values, we forget the oldest ones.
+
         :param action: Action to be recorded.
         :type action: :class:`Action`
         """
         if self._index < -1:
             self._actions = self._actions[:self._index + 1]
+            self._sizes = self._sizes[:self._index + 1]
+        if self._actions:
+            # Some actions are recorded after their changes have been made. Their backups hold the
+            # values our previous action ended up with.
+            self._actions[-1].compact(following=action)
+            self._sizes[-1] = self._actions[-1].size()
         self._actions.append(action)
+        self._sizes.append(action.size())
         self._index = -1
+        while len(self._actions) > 1 and sum(self._sizes) > MAX_UNDO_SIZE:
+            del self._actions[0]
+            del self._sizes[0]
 
     def undo(self):
         """Undo the next action to be undone.
@@ -260,6 +450,8 @@ class Undoer:
         action and decrease our pointer to the previous action.
 
         Make sure you can call this with :meth:`can_undo` first.
+
+        Returns the :meth:`Action.dirty_region` of the undone action.
         """
         assert self.can_undo()
         action = self._actions[self._index]
@@ -273,6 +465,7 @@ class Undoer:
         )
         self._do_changes(action)
         self._index -= 1
+        return action.dirty_region()
 
     def redo(self):
         """Redo the next action to be redone.
@@ -281,6 +474,8 @@ class Undoer:
         increase our pointer to the next action.
 
         Make sure you can call this with :meth:`can_redo` first.
+
+        Returns the :meth:`Action.dirty_region` of the redone action.
         """
         assert self.can_redo()
         action = self._actions[self._index + 1]
@@ -294,6 +489,7 @@ class Undoer:
         )
         self._do_changes(action)
         self._index += 1
+        return action.dirty_region()
 
     # --- Properties
     @property
@@ -10,8 +10,9 @@ from itertools import groupby
 from operator import attrgetter
 
 from core.plugin import ReadOnlyTablePlugin, Column
-# Import convert_amount(), a utility function to convert amount from one currency to another.
-from core.model.amount import convert_amount
+# Import convert_amounts(), a utility function to convert a list of amounts from one currency to
+# another.
+from core.model.amount import convert_amounts
 
 class PayeeBreakdownPlugin(ReadOnlyTablePlugin):
     NAME = 'Payee Breakdown'
@@ -50,13 +51,15 @@ class PayeeBreakdownPlugin(ReadOnlyTablePlugin):
             # groupby() returns an iterator, but because we want to count the number of
             # transactions we have, we need to convert it to a list.
             subtransactions = list(subtransactions)
-            total_amount = 0
             count = len(subtransactions)
-            for txn in subtransactions:
-                # Convert the transactions's amount to the native currency.
-                native_amount = convert_amount(txn.amount, currency, txn.date)
-                # Add that amount to the running total
-                total_amount += native_amount
+            # Convert the transactions's amounts to the native currency, each at the rate of its
+            # transaction's date. Converting them all in one call is much faster than converting
+            # them one by one.
+            amounts = [txn.amount for txn in subtransactions]
+            dates = [txn.date for txn in subtransactions]
+            native_amounts = convert_amounts(amounts, currency, dates)
+            # Add those amounts together
+            total_amount = sum(native_amounts)
             row = self.add_row()
             row.set_field('payee', payee)
             # When we set field values, we set strings. However, our table can be sorted by any
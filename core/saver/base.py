@@ -0,0 +1,35 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+import os
+import os.path as op
+import shutil
+from contextlib import contextmanager
+
+from hscommon.util import ensure_folder
+
+@contextmanager
+def replacing_file(filename, mode, **kwargs):
+    """Opens a temporary file that replaces ``filename`` once we're done writing to it.
+
+    This way, if something goes wrong while we write, ``filename`` is left untouched and the
+    temporary file is removed. If ``filename`` is a symlink, the file it points to is the one we
+    replace, and if it already exists, its permissions are kept. ``mode`` and ``kwargs`` are passed
+    to ``open()``.
+    """
+    filename = op.realpath(filename)
+    ensure_folder(op.dirname(filename))
+    tmp_filename = filename + '.tmp'
+    try:
+        with open(tmp_filename, mode, **kwargs) as fp:
+            yield fp
+        if op.exists(filename):
+            shutil.copymode(filename, tmp_filename)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if op.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
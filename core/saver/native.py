@@ -4,14 +4,34 @@
 # which should be included with this package. The terms are also available at
 # http://www.gnu.org/licenses/gpl-3.0.html
 
-import sys
-import os.path as op
-import xml.etree.cElementTree as ET
-
 from ..model.amount import format_amount
-from hscommon.util import remove_invalid_xml, ensure_folder
+from hscommon.util import remove_invalid_xml
+from .base import replacing_file
+
+def escape_attrib(s):
+    # Escapes attribute values the same way ElementTree does so that our output stays the same as
+    # when we used to build a tree and write it with ElementTree.
+    s = remove_invalid_xml(s)
+    if '&' in s:
+        s = s.replace('&', '&amp;')
+    if '<' in s:
+        s = s.replace('<', '&lt;')
+    if '>' in s:
+        s = s.replace('>', '&gt;')
+    if '"' in s:
+        s = s.replace('"', '&quot;')
+    if '\r' in s:
+        s = s.replace('\r', '&#13;')
+    if '\n' in s:
+        s = s.replace('\n', '&#10;')
+    if '\t' in s:
+        s = s.replace('\t', '&#09;')
+    return s
 
 def save(filename, document_id, properties, accounts, groups, transactions, schedules, budgets):
+    # We don't build an element tree, we write elements as we go. To avoid leaving a half-written
+    # file behind us if something goes wrong in the middle of the save, we write to a temporary file
+    # first and replace the target only when we're done.
     def date2str(date):
         return date.strftime('%Y-%m-%d')
 
@@ -26,99 +46,94 @@ def save(filename, document_id, properties, accounts, groups, transactions, sche
 
     def setattrib(attribs, attribname, value):
         if value:
-            attribs[attribname] = value
+            attribs.append((attribname, value))
+
+    def start_element(tag, attribs, empty=False):
+        write('<' + tag)
+        for name, value in attribs:
+            write(' %s="%s"' % (name, escape_attrib(value)))
+        write(' />' if empty else '>')
 
-    def write_transaction_element(parent_element, transaction):
-        transaction_element = ET.SubElement(parent_element, 'transaction')
-        attrib = transaction_element.attrib
-        attrib['date'] = date2str(transaction.date)
-        setattrib(attrib, 'description', transaction.description)
-        setattrib(attrib, 'payee', transaction.payee)
-        setattrib(attrib, 'checkno', transaction.checkno)
-        setattrib(attrib, 'notes', handle_newlines(transaction.notes))
-        attrib['mtime'] = str(int(transaction.mtime))
+    def end_element(tag):
+        write('</' + tag + '>')
+
+    def write_transaction_element(transaction):
+        attribs = [('date', date2str(transaction.date))]
+        setattrib(attribs, 'description', transaction.description)
+        setattrib(attribs, 'payee', transaction.payee)
+        setattrib(attribs, 'checkno', transaction.checkno)
+        setattrib(attribs, 'notes', handle_newlines(transaction.notes))
+        attribs.append(('mtime', str(int(transaction.mtime))))
+        if not transaction.splits:
+            start_element('transaction', attribs, empty=True)
+            return
+        start_element('transaction', attribs)
         for split in transaction.splits:
-            split_element = ET.SubElement(transaction_element, 'split')
-            attrib = split_element.attrib
-            attrib['account'] = split.account_name
-            attrib['amount'] = format_amount(split.amount)
-            setattrib(attrib, 'memo', split.memo)
-            setattrib(attrib, 'reference', split.reference)
+            attribs = [('account', split.account_name), ('amount', format_amount(split.amount))]
+            setattrib(attribs, 'memo', split.memo)
+            setattrib(attribs, 'reference', split.reference)
             if split.reconciliation_date is not None:
-                attrib['reconciliation_date'] = date2str(split.reconciliation_date)
+                attribs.append(('reconciliation_date', date2str(split.reconciliation_date)))
+            start_element('split', attribs, empty=True)
+        end_element('transaction')
+
+    def write_spawn_element(tag, date, spawn):
+        attribs = [('date', date2str(date))]
+        if spawn is None:
+            start_element(tag, attribs, empty=True)
+        else:
+            start_element(tag, attribs)
+            write_transaction_element(spawn)
+            end_element(tag)
 
-    root = ET.Element('moneyguru-file')
-    root.attrib['document_id'] = document_id
-    props_element = ET.SubElement(root, 'properties')
-    for name, value in properties.items():
-        value = str(value)
-        props_element.attrib[name] = value
-    for group in groups:
-        group_element = ET.SubElement(root, 'group')
-        attrib = group_element.attrib
-        attrib['name'] = group.name
-        attrib['type'] = group.type
-    for account in accounts:
-        account_element = ET.SubElement(root, 'account')
-        attrib = account_element.attrib
-        attrib['name'] = account.name
-        attrib['currency'] = account.currency
-        attrib['type'] = account.type
-        if account.group:
-            attrib['group'] = account.group.name
-        if account.reference is not None:
-            attrib['reference'] = account.reference
-        if account.account_number:
-            attrib['account_number'] = account.account_number
-        if account.inactive:
-            attrib['inactive'] = 'y'
-        if account.notes:
-            attrib['notes'] = handle_newlines(account.notes)
-    for transaction in transactions:
-        write_transaction_element(root, transaction)
-    # the functionality of the line below is untested because it's an optimisation
-    scheduled = [s for s in schedules if s.is_alive]
-    for recurrence in scheduled:
-        recurrence_element = ET.SubElement(root, 'recurrence')
-        attrib = recurrence_element.attrib
-        attrib['type'] = recurrence.repeat_type
-        attrib['every'] = str(recurrence.repeat_every)
-        if recurrence.stop_date is not None:
-            attrib['stop_date'] = date2str(recurrence.stop_date)
-        for date, change in recurrence.date2globalchange.items():
-            change_element = ET.SubElement(recurrence_element, 'change')
-            change_element.attrib['date'] = date2str(date)
-            if change is not None:
-                write_transaction_element(change_element, change)
-        for date, exception in recurrence.date2exception.items():
-            exception_element = ET.SubElement(recurrence_element, 'exception')
-            exception_element.attrib['date'] = date2str(date)
-            if exception is not None:
-                write_transaction_element(exception_element, exception)
-        write_transaction_element(recurrence_element, recurrence.ref)
-    for budget in budgets:
-        budget_element = ET.SubElement(root, 'budget')
-        attrib = budget_element.attrib
-        attrib['account'] = budget.account.name
-        attrib['type'] = budget.repeat_type
-        attrib['every'] = str(budget.repeat_every)
-        attrib['amount'] = format_amount(budget.amount)
-        attrib['notes'] = budget.notes
-        if budget.target is not None:
-            attrib['target'] = budget.target.name
-        attrib['start_date'] = date2str(budget.start_date)
-        if budget.stop_date is not None:
-            attrib['stop_date'] = date2str(budget.stop_date)
-    for elem in root.iter():
-        attrib = elem.attrib
-        for key, value in attrib.items():
-            attrib[key] = remove_invalid_xml(value)
-    tree = ET.ElementTree(root)
-    ensure_folder(op.dirname(filename))
-    fp = open(filename, 'wt', encoding='utf-8')
-    fp.write('<?xml version="1.0" encoding="utf-8"?>\n')
-    # This 'unicode' encoding thing is only available (and necessary) from Python 3.2
-    if sys.version_info[1] >= 2:
-        tree.write(fp, encoding='unicode')
-    else:
-        tree.write(fp)
+    with replacing_file(filename, 'wt', encoding='utf-8') as fp:
+        write = fp.write
+        write('<?xml version="1.0" encoding="utf-8"?>\n')
+        start_element('moneyguru-file', [('document_id', document_id)])
+        attribs = [(name, str(value)) for name, value in properties.items()]
+        start_element('properties', attribs, empty=True)
+        for group in groups:
+            start_element('group', [('name', group.name), ('type', group.type)], empty=True)
+        for account in accounts:
+            attribs = [('name', account.name), ('currency', account.currency), ('type', account.type)]
+            if account.group:
+                attribs.append(('group', account.group.name))
+            if account.reference is not None:
+                attribs.append(('reference', account.reference))
+            if account.account_number:
+                attribs.append(('account_number', account.account_number))
+            if account.inactive:
+                attribs.append(('inactive', 'y'))
+            if account.notes:
+                attribs.append(('notes', handle_newlines(account.notes)))
+            start_element('account', attribs, empty=True)
+        for transaction in transactions:
+            write_transaction_element(transaction)
+        # the functionality of the line below is untested because it's an optimisation
+        scheduled = [s for s in schedules if s.is_alive]
+        for recurrence in scheduled:
+            attribs = [('type', recurrence.repeat_type), ('every', str(recurrence.repeat_every))]
+            if recurrence.stop_date is not None:
+                attribs.append(('stop_date', date2str(recurrence.stop_date)))
+            start_element('recurrence', attribs)
+            for date, change in recurrence.date2globalchange.items():
+                write_spawn_element('change', date, change)
+            for date, exception in recurrence.date2exception.items():
+                write_spawn_element('exception', date, exception)
+            write_transaction_element(recurrence.ref)
+            end_element('recurrence')
+        for budget in budgets:
+            attribs = [
+                ('account', budget.account.name),
+                ('type', budget.repeat_type),
+                ('every', str(budget.repeat_every)),
+                ('amount', format_amount(budget.amount)),
+                ('notes', budget.notes),
+            ]
+            if budget.target is not None:
+                attribs.append(('target', budget.target.name))
+            attribs.append(('start_date', date2str(budget.start_date)))
+            if budget.stop_date is not None:
+                attribs.append(('stop_date', date2str(budget.stop_date)))
+            start_element('budget', attribs, empty=True)
+        end_element('moneyguru-file')
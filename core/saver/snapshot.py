@@ -0,0 +1,133 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+from itertools import groupby
+from operator import attrgetter
+
+from hscommon.util import remove_invalid_xml
+
+from ..loader.snapshot import (
+    SNAPSHOT_MAGIC, SNAPSHOT_VERSION, COOKED_MAGIC, COOKED_VERSION, HEADER, COUNT, STRLEN, BOOL,
+    ACCOUNT, TRANSACTION, SPLIT, RECURRENCE, SPAWN, BUDGET, COOKED_ACCOUNT, BALANCES, NONE_STRLEN,
+    NO_INDEX, date2ordinal, amount2raw
+)
+from .base import replacing_file
+
+def save(
+        filename, source_hash, document_id, properties, accounts, groups, transactions, schedules,
+        budgets):
+    """Saves a snapshot of a document to ``filename``.
+
+    ``source_hash`` is the hash of the native document that holds the same data (see
+    :func:`.loader.snapshot.source_hash`). Other arguments are the same as in
+    :func:`.saver.native.save`.
+
+    What we save is what we'd get by loading the native document. For example, text goes through
+    the same invalid character removal and transaction positions are the ones the loader would
+    give.
+    """
+    def write_count(count):
+        write(COUNT.pack(count))
+
+    def write_str(s):
+        if s is None:
+            write(STRLEN.pack(NONE_STRLEN))
+        else:
+            data = remove_invalid_xml(s).encode('utf-8')
+            write(STRLEN.pack(len(data)))
+            write(data)
+
+    def write_transaction(transaction, position=0):
+        write(TRANSACTION.pack(
+            date2ordinal(transaction.date), int(transaction.mtime), position, len(transaction.splits)
+        ))
+        write_str(transaction.description)
+        write_str(transaction.payee)
+        write_str(transaction.checkno)
+        write_str(transaction.notes)
+        for split in transaction.splits:
+            value, currency = amount2raw(split.amount)
+            account_index = account2index.get(split.account, NO_INDEX)
+            write(SPLIT.pack(account_index, date2ordinal(split.reconciliation_date), value))
+            write_str(currency)
+            write_str(split.memo)
+            write_str(split.reference)
+
+    def write_spawns(date2spawn):
+        write_count(len(date2spawn))
+        for date, spawn in date2spawn.items():
+            write(SPAWN.pack(date2ordinal(date), spawn is not None))
+            if spawn is not None:
+                write_transaction(spawn)
+
+    account2index = {account: index for index, account in enumerate(accounts)}
+    group2index = {group: index for index, group in enumerate(groups)}
+    with replacing_file(filename, 'wb') as fp:
+        write = fp.write
+        write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, source_hash))
+        write_str(document_id)
+        write_count(len(properties))
+        for name, value in properties.items():
+            write_str(name)
+            write(BOOL.pack(isinstance(value, int)))
+            write_str(str(value))
+        write_count(len(groups))
+        for group in groups:
+            write_str(group.name)
+            write_str(group.type)
+        write_count(len(accounts))
+        for account in accounts:
+            write(ACCOUNT.pack(group2index.get(account.group, NO_INDEX), account.inactive))
+            write_str(account.name)
+            write_str(account.currency)
+            write_str(account.type)
+            write_str(account.reference)
+            write_str(account.account_number)
+            write_str(account.notes)
+        # The native loader gives positions starting at 1 to transactions of the same date, in the
+        # order in which they were saved.
+        write_count(len(transactions))
+        for date, day_transactions in groupby(sorted(transactions, key=attrgetter('date')), attrgetter('date')):
+            for position, transaction in enumerate(day_transactions, start=1):
+                write_transaction(transaction, position)
+        scheduled = [s for s in schedules if s.is_alive]
+        write_count(len(scheduled))
+        for recurrence in scheduled:
+            write_str(recurrence.repeat_type)
+            write(RECURRENCE.pack(recurrence.repeat_every, date2ordinal(recurrence.stop_date)))
+            write_transaction(recurrence.ref)
+            write_spawns(recurrence.date2exception)
+            write_spawns(recurrence.date2globalchange)
+        write_count(len(budgets))
+        for budget in budgets:
+            value, currency = amount2raw(budget.amount)
+            target_index = account2index[budget.target] if budget.target is not None else NO_INDEX
+            write(BUDGET.pack(
+                account2index[budget.account], target_index, value, budget.repeat_every,
+                date2ordinal(budget.start_date), date2ordinal(budget.stop_date)
+            ))
+            write_str(currency)
+            write_str(budget.repeat_type)
+            write_str(budget.notes)
+
+def save_cooked(filename, key, accounts, balances):
+    """Saves running balances cooked by the oven to ``filename``.
+
+    ``balances`` is what :meth:`.Oven.cooked_balances` returns. ``key`` comes from
+    :func:`.loader.snapshot.cooked_key`.
+    """
+    account2values = {}
+    for index, account in enumerate(accounts):
+        values = balances[account]
+        if values:
+            account2values[index] = values
+    with replacing_file(filename, 'wb') as fp:
+        write = fp.write
+        write(HEADER.pack(COOKED_MAGIC, COOKED_VERSION, key))
+        write(COUNT.pack(len(account2values)))
+        for index, values in account2values.items():
+            write(COOKED_ACCOUNT.pack(index, len(values)))
+            write(b''.join(BALANCES.pack(*v) for v in values))
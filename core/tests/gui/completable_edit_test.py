@@ -130,3 +130,22 @@ def test_set_attrname_then_up(app):
     app.ce.up()
     eq_(app.ce.text, '')
     eq_(app.ce.completion, '')
+
+@with_app(app_default)
+def test_refresh_candidates_on_txn_edit_and_undo(app):
+    # Completion candidates follow transaction edits and their undo.
+    app.ce.text = 'f' # build candidates
+    app.show_tview()
+    app.ttable.select([3])
+    eq_(app.ttable[3].description, 'foo')
+    app.ttable[3].description = 'other'
+    app.ttable.save_edits()
+    app.ce.text = 'o'
+    eq_(app.ce.completion, 'ther')
+    app.ce.text = 'f'
+    eq_(app.ce.completion, '')
+    app.doc.undo()
+    app.ce.text = 'o'
+    eq_(app.ce.completion, '')
+    app.ce.text = 'f'
+    eq_(app.ce.completion, 'oo')
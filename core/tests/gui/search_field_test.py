@@ -122,6 +122,20 @@ def test_dont_parse_amount_with_expression(app):
     app.sfield.text = '100+40' # The txn with the '140' amount shouldn't show up.
     eq_(app.ttable.row_count, 0)
 
+@with_app(app_two_transactions)
+def test_query_several_terms(app):
+    # Targeted terms and untargeted text can be combined. They all have to match.
+    app.sfield.text = 'deposit amount:>200'
+    eq_(app.ttable.row_count, 1)
+    eq_(app.ttable[0].description, 'a Deposit')
+    app.sfield.text = 'withdrawal amount:>200'
+    eq_(app.ttable.row_count, 0)
+
+@with_app(app_two_transactions)
+def test_query_or(app):
+    app.sfield.text = 'checkno:42a OR checkno:24b'
+    eq_(app.ttable.row_count, 2)
+
 # ---
 def app_ambiguity_in_txn_values():
     # Transactions have similar values in different fields
@@ -224,6 +238,39 @@ def test_modify_transaction_out_of_filter(app):
     eq_(app.ttable.row_count, 1)
     eq_(app.ttable.selected_indexes, [0])
 
+@with_app(app_three_txns_filtered)
+def test_undo_modification_out_of_filter(app):
+    # Undoing a change that took a transaction out of the filter brings it back.
+    row = app.ttable.selected_row
+    row.description = 'baz'
+    app.ttable.save_edits()
+    app.doc.undo()
+    eq_(app.ttable.row_count, 2)
+
+@with_app(app_two_transactions)
+def test_query_renamed_account(app):
+    # Account searches look at current account names.
+    app.show_nwview()
+    app.bsheet.selected = app.bsheet.assets[0]
+    app.bsheet.selected.name = 'Renamed'
+    app.bsheet.save_edits()
+    app.show_tview()
+    app.sfield.text = 'account:renamed'
+    eq_(app.ttable.row_count, 2)
+    app.sfield.text = 'account:desjardins'
+    eq_(app.ttable.row_count, 0)
+
+@with_app(TestApp)
+def test_query_schedule_spawns(app, monkeypatch):
+    # Schedule spawns aren't in the document's transaction list, but they're searched too.
+    monkeypatch.patch_today(2012, 6, 18)
+    app.add_schedule(start_date='18/06/2012', description='schedule', stop_date='18/06/2012')
+    app.add_txn(date='18/06/2012', description='normal')
+    app.show_tview()
+    app.sfield.text = 'sched'
+    eq_(app.ttable.row_count, 1)
+    eq_(app.ttable[0].description, 'schedule')
+
 # --- Grouped and ungrouped txns
 def app_grouped_and_ungrouped_txns():
     app = TestApp()
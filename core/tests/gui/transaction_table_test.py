@@ -111,6 +111,21 @@ def test_schedule_spawn_sorting(app, monkeypatch):
 def test_all_amount_native_empty(app):
     assert app.ttable.all_amounts_are_native
 
+@with_app(app_tview_shown)
+def test_rows_are_created_on_access(app):
+    # Rows are only created for transactions when they're accessed. Until then, selecting
+    # transactions and sorting by date don't need them.
+    for description in ['a', 'b', 'c']:
+        app.add_txn(description=description)
+    app.ttable.refresh()
+    transaction = app.ttable._peek(1)
+    eq_(transaction.description, 'b')
+    app.ttable.select_transactions([transaction])
+    app.ttable.sort_by('date', desc=True)
+    eq_(app.ttable.selected_indexes, [1])
+    assert app.ttable._peek(0) is not app.ttable[0]
+    eq_(app.ttable[0].description, 'c')
+
 # ---
 class TestEditionMode:
     def do_setup(self):
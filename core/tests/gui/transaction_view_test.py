@@ -46,3 +46,36 @@ def test_totals_select_all(app):
     app.ttable.select([0, 1])
     expected = "2 out of 2 selected. Amount: 15.00"
     eq_(app.mw.status_line, expected)
+
+# --- Transactions in two months
+def app_two_months():
+    app = TestApp()
+    app.drsel.select_month_range()
+    app.add_txn('10/01/2010', 'first', amount='1')
+    app.add_txn('15/02/2010', 'second', amount='2')
+    app.drsel.select_prev_date_range()
+    return app
+
+@with_app(app_two_months)
+def test_going_back_to_a_date_range_reuses_visible_transactions(app):
+    visible = app.tview.visible_transactions
+    app.drsel.select_next_date_range()
+    eq_(app.ttable[0].description, 'second')
+    app.drsel.select_prev_date_range()
+    assert app.tview.visible_transactions is visible
+    eq_(app.ttable[0].description, 'first')
+
+@with_app(app_two_months)
+def test_document_changes_clear_visible_transactions_cache(app):
+    app.drsel.select_next_date_range()
+    app.add_txn('20/02/2010', 'third', amount='3')
+    app.drsel.select_prev_date_range()
+    app.ttable[0].description = 'changed'
+    app.ttable.save_edits()
+    app.drsel.select_next_date_range()
+    eq_(app.ttable.row_count, 2)
+    app.drsel.select_prev_date_range()
+    eq_(app.ttable[0].description, 'changed')
+    app.sfield.text = 'second'
+    app.drsel.select_next_date_range()
+    eq_(app.ttable.row_count, 1)
@@ -8,10 +8,15 @@ from datetime import date
 
 from hscommon.testutil import eq_
 
+from ..app import Application
 from ..document import ScheduleScope
+from ..loader import native
 from ..model.account import AccountType
+from ..model.currency import Currencies
 from ..model.date import MonthRange
-from .base import compare_apps, TestApp, with_app, testdata
+from ..model.oven import Oven
+from ..saver import snapshot as snapshot_saver
+from .base import compare_apps, ApplicationGUI, TestApp, with_app, testdata
 
 
 # --- Pristine
@@ -479,6 +484,107 @@ def test_save_load(tmpdir, monkeypatch):
     app = app_account_and_group()
     check(app)
 
+def test_save_load_snapshot(tmpdir, monkeypatch):
+    # When we have a cache path, loading a document creates a snapshot of it and loading it again
+    # loads the snapshot instead. Running balances are also re-used instead of being cooked again.
+    # The result is the same as loading the XML document.
+    def balances(app):
+        return {a.name: b for a, b in app.doc.oven.cooked_balances().items()}
+
+    def check(app):
+        filepath = str(tmpdir.join('foo.xml'))
+        app.doc.save_to_xml(filepath)
+        cache_path = str(tmpdir.join('cache'))
+        xmlapp = TestApp(app=Application(ApplicationGUI(), cache_path=cache_path))
+        xmlapp.doc.load_from_xml(filepath)
+        with monkeypatch.context() as m:
+            # we crash if we don't use the snapshot and the cooked balances
+            m.setattr(native.Loader, 'load', None)
+            m.setattr(Oven, '_cook_splits', None)
+            snapapp = TestApp(app=Application(ApplicationGUI(), cache_path=cache_path))
+            snapapp.doc.load_from_xml(filepath)
+        eq_(balances(snapapp), balances(xmlapp))
+        # Saving both documents yields the exact same file.
+        xmlapp.doc.save_to_xml(str(tmpdir.join('fromxml.xml')))
+        snapapp.doc.save_to_xml(str(tmpdir.join('fromsnapshot.xml')))
+        eq_(tmpdir.join('fromxml.xml').read(), tmpdir.join('fromsnapshot.xml').read())
+        snapapp.doc.date_range = app.doc.date_range
+        snapapp.doc._cook()
+        compare_apps(app.doc, snapapp.doc)
+
+    check(app_account_with_budget())
+    check(app_transaction_with_memos())
+    check(app_one_account_in_one_group())
+    check(app_budget_with_all_fields_set())
+    check(app_account_with_apanel_attrs())
+    check(app_one_schedule_and_one_normal_txn())
+    check(app_schedule_with_global_change(monkeypatch))
+    check(app_schedule_with_local_deletion(monkeypatch))
+
+def test_cooked_balances_are_not_reused_on_another_day(tmpdir, monkeypatch):
+    # Budgets depend on the current date, so cooked balances are only re-used on the same day.
+    monkeypatch.patch_today(2008, 1, 1)
+    cache_path = str(tmpdir.join('cache'))
+    filepath = str(tmpdir.join('foo.xml'))
+    app = app_account_with_budget()
+    app.doc.save_to_xml(filepath)
+    TestApp(app=Application(ApplicationGUI(), cache_path=cache_path)).doc.load_from_xml(filepath)
+    monkeypatch.patch_today(2008, 1, 2)
+    monkeypatch.setattr(Oven, '_restore_splits', None) # we crash if we re-use cooked balances
+    newapp = TestApp(app=Application(ApplicationGUI(), cache_path=cache_path))
+    newapp.doc.load_from_xml(filepath) # no crash
+
+def test_cooked_balances_are_not_reused_when_rates_change(tmpdir, monkeypatch):
+    # Overwriting an exchange rate at a date we already have a rate for changes cooked balances in
+    # other currencies, so they're not re-used.
+    def set_rates(rate_on_5th):
+        ratesdb = Currencies.get_rates_db()
+        for day, rate in [(1, 1.5), (5, rate_on_5th), (10, 1.5)]:
+            ratesdb.set_CAD_value(date(2008, 1, day), 'EUR', rate)
+
+    cache_path = str(tmpdir.join('cache'))
+    filepath = str(tmpdir.join('foo.xml'))
+    app = TestApp()
+    app.add_account('foo', currency='EUR')
+    app.show_account()
+    app.add_entry('5/1/2008', increase='42')
+    app.doc.save_to_xml(filepath)
+    loadapp = TestApp(app=Application(ApplicationGUI(), cache_path=cache_path))
+    set_rates(1.5)
+    loadapp.doc.load_from_xml(filepath)
+    newapp = TestApp(app=Application(ApplicationGUI(), cache_path=cache_path))
+    set_rates(1.6)
+    monkeypatch.setattr(Oven, '_restore_splits', None) # we crash if we re-use cooked balances
+    newapp.doc.load_from_xml(filepath) # no crash
+
+def test_stale_snapshot_is_not_loaded(tmpdir):
+    # A snapshot is only loaded if the document hasn't changed since the snapshot was made.
+    cache_path = str(tmpdir.join('cache'))
+    filepath = str(tmpdir.join('foo.xml'))
+    app = TestApp(app=Application(ApplicationGUI(), cache_path=cache_path))
+    app.add_account('first')
+    app.doc.save_to_xml(filepath)
+    otherapp = TestApp()
+    otherapp.add_account('second')
+    otherapp.doc.save_to_xml(filepath)
+    newapp = TestApp(app=Application(ApplicationGUI(), cache_path=cache_path))
+    newapp.doc.load_from_xml(filepath)
+    eq_([a.name for a in newapp.doc.accounts], ['second'])
+
+def test_failed_snapshot_save_leaves_no_file(tmpdir, monkeypatch):
+    # If writing a snapshot or cooked balances fails, we don't leave temporary files in our cache.
+    class FailingStruct:
+        def pack(self, *args):
+            raise OSError("disk full")
+
+    cache_path = tmpdir.join('cache')
+    filepath = str(tmpdir.join('foo.xml'))
+    app_account_with_budget().doc.save_to_xml(filepath)
+    monkeypatch.setattr(snapshot_saver, 'COUNT', FailingStruct())
+    app = TestApp(app=Application(ApplicationGUI(), cache_path=str(cache_path)))
+    app.doc.load_from_xml(filepath) # no crash
+    eq_(cache_path.join('snapshots').listdir(), [])
+
 def test_save_load_qif(tmpdir):
     def check(app):
         filepath = str(tmpdir.join('foo.qif'))
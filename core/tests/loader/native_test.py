@@ -40,6 +40,13 @@ def test_parse_minimal(loader):
     except FileFormatError:
         assert False
 
+def test_parse_truncated(loader):
+    # A file that stops in the middle of the document is invalid even if what's before the
+    # truncation has already been read.
+    content = b'<moneyguru-file><account name="foo" currency="USD" /><transaction date="2008-01-01">'
+    with raises(FileFormatError):
+        loader._parse(BytesIO(content))
+
 def test_wrong_date(loader):
     # these used to raise FileFormatError, but now, we just want to make sure that there is no
     # crash.
@@ -21,6 +21,7 @@ from ..gui.entry_table import EntryTable
 from ..loader import base
 from ..model.account import AccountType
 from ..model.date import MonthRange, QuarterRange, YearRange
+from ..saver import native as native_saver
 
 # --- No Setup
 def test_can_use_another_amount_format():
@@ -103,7 +104,7 @@ def test_load_empty(monkeypatch):
     # When loading an empty file (we mock it here), make sure no exception occur.
     app = TestApp()
     monkeypatch.setattr(base.Loader, 'parse', lambda self, filename: None)
-    monkeypatch.setattr(base.Loader, 'load', lambda self: None)
+    monkeypatch.setattr(base.Loader, 'load', lambda self, cook=True: None)
     app.doc.load_from_xml('filename does not matter here')
 
 def test_modified_flag():
@@ -220,6 +221,41 @@ def test_save_dest_folder_doesnt_exist(app, tmpdir):
     app.doc.save_to_xml(str(dest))
     assert dest.exists()
 
+@with_app(app_one_empty_account_range_on_october_2007)
+def test_failed_save_keeps_previous_file(app, tmpdir, monkeypatch):
+    # Elements are written as we go during a save. If something goes wrong in the middle of it, the
+    # file that was there before is left untouched.
+    dest = tmpdir.join('foo.xml')
+    app.doc.save_to_xml(str(dest))
+    saved = dest.read()
+    app.add_entry('1/10/2007', increase='42')
+    monkeypatch.setattr(native_saver, 'format_amount', lambda amount: 1 / 0)
+    with raises(ZeroDivisionError):
+        app.doc.save_to_xml(str(dest))
+    eq_(dest.read(), saved)
+    # We don't leave our temporary file behind.
+    eq_(tmpdir.listdir(), [dest])
+
+@with_app(app_one_empty_account_range_on_october_2007)
+def test_save_through_symlink(app, tmpdir):
+    # When saving to a symlink, the file it points to is the one that is saved. The link stays.
+    target = tmpdir.join('target.xml')
+    target.write('')
+    link = tmpdir.join('link.xml')
+    link.mksymlinkto(target)
+    app.doc.save_to_xml(str(link))
+    assert link.islink()
+    assert 'moneyguru-file' in target.read()
+
+@with_app(app_one_empty_account_range_on_october_2007)
+def test_save_keeps_file_mode(app, tmpdir):
+    # Saving over an existing document keeps its permissions.
+    dest = tmpdir.join('foo.xml')
+    dest.write('')
+    dest.chmod(0o600)
+    app.doc.save_to_xml(str(dest))
+    eq_(dest.stat().mode & 0o777, 0o600)
+
 # ---
 class TestThreeAccountsAndOneEntry:
     def do_setup(self):
@@ -11,7 +11,7 @@ from hscommon.testutil import eq_
 from ...model.account import Account, Group, AccountList, AccountType
 from ...model.amount import Amount
 from ...model.currency import Currencies
-from ...model.date import MonthRange
+from ...model.date import DateRange, MonthRange
 from ...model.oven import Oven
 from ...model.transaction import Transaction
 from ...model.transaction_list import TransactionList
@@ -69,8 +69,8 @@ class TestOneAccount:
             Transaction(date(2008, 1, 3), account=self.account, amount=Amount(70, 'CAD')),
             Transaction(date(2008, 1, 31), account=self.account, amount=Amount(2, 'USD')),
         ])
-        oven = Oven(accounts, transactions, [], [])
-        oven.cook(date.min, date.max)
+        self.oven = Oven(accounts, transactions, [], [])
+        self.oven.cook(date.min, date.max)
 
     def test_balance(self):
         eq_(self.account.entries.balance(date(2007, 12, 31)), Amount(20, 'USD'))
@@ -86,3 +86,67 @@ class TestOneAccount:
         # Each entry is converted using the entry's day rate.
         eq_(self.account.entries.cash_flow(range, 'CAD'), Amount(201.40, 'CAD'))
 
+
+    def test_cash_flow_partial_range(self):
+        # Ranges that start or end between entry dates only count entries within the range.
+        range = DateRange(date(2008, 1, 2), date(2008, 1, 30))
+        eq_(self.account.entries.cash_flow(range), Amount(50, 'USD') + Amount(70 / 0.7, 'USD'))
+        eq_(self.account.entries.cash_flow(DateRange(date(2008, 2, 1), date(2008, 2, 28))), 0)
+
+    def test_cash_flow_after_clear(self):
+        # When entries are cleared, cash flow indexes follow.
+        self.account.entries.clear(date(2008, 1, 2))
+        eq_(self.account.entries.cash_flow(MonthRange(date(2008, 1, 1))), Amount(100, 'USD'))
+
+    def test_entries_are_created_on_access(self):
+        # Entries are stored in columns and only created when accessed. Once created, we get the
+        # same instance back.
+        entries = self.account.entries
+        entry = entries[1]
+        assert entries[1] is entry
+        assert entries[-4] is entry
+        eq_(entry.balance, Amount(120, 'USD'))
+        eq_(entry.index, 1)
+        assert entries.last_entry(date(2008, 1, 1)) is entry
+
+    def test_entries_in_range(self):
+        entries = self.account.entries.entries_in_range(DateRange(date(2008, 1, 1), date(2008, 1, 3)))
+        eq_([e.date for e in entries], [date(2008, 1, 1), date(2008, 1, 2), date(2008, 1, 3)])
+        eq_(self.account.entries.entries_in_range(DateRange(date(2008, 2, 1), date(2008, 2, 28))), [])
+
+    def test_raw_balances(self):
+        # Raw balances are in cents. The CAD entry is converted at its date's rate.
+        eq_(self.account.entries.raw_balances()[:4], [
+            (2000, 0, 2000), (12000, 0, 12000), (17000, 0, 17000), (27000, 0, 27000)
+        ])
+
+    def test_balance_change_dates(self):
+        entries = self.account.entries
+        eq_(entries.balance_change_dates(DateRange(date(2008, 1, 2), date(2008, 2, 2))), [
+            date(2008, 1, 2), date(2008, 1, 3), date(2008, 1, 31)
+        ])
+        # With a conversion, every day with a balance is a potential change.
+        eq_(len(entries.balance_change_dates(DateRange(date(2008, 1, 2), date(2008, 2, 2)), currency='CAD')), 32)
+        eq_(entries.balance_change_dates(DateRange(date(2007, 1, 1), date(2007, 12, 31)), currency='CAD'), [
+            date(2007, 12, 31)
+        ])
+
+    def test_balances(self):
+        # balances() gives the same results as balance() on each date.
+        entries = self.account.entries
+        dates = [date(2007, 12, 30), date(2008, 1, 1), date(2008, 1, 3), date(2008, 2, 1)]
+        eq_(entries.balances(dates), [entries.balance(d) for d in dates])
+        eq_(entries.balances(dates, currency='CAD'), [entries.balance(d, currency='CAD') for d in dates])
+
+    def test_cash_flows(self):
+        # cash_flows() gives the same results as cash_flow() on each range, even when some amounts
+        # have to be converted.
+        entries = self.account.entries
+        date_ranges = [
+            DateRange(date(2007, 12, 1), date(2007, 12, 31)), DateRange(date(2008, 1, 1), date(2008, 1, 2)),
+            DateRange(date(2008, 1, 3), date(2008, 1, 30)), DateRange(date(2008, 2, 1), date(2008, 2, 29)),
+        ]
+        expected = [entries.cash_flow(r, currency='CAD') for r in date_ranges]
+        self.oven.cook(date.min, date.max) # clears the cash flow cache
+        eq_(entries.cash_flows(date_ranges, currency='CAD'), expected)
+        eq_(entries.cash_flows(date_ranges[1:3]), [Amount(150, 'USD'), Amount(70 / 0.7, 'USD')])
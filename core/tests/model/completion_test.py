@@ -0,0 +1,39 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+from hscommon.testutil import eq_
+
+from ...model.completion import CompletionIndex, CompletionList
+
+def test_matches_are_in_candidate_order():
+    index = CompletionIndex(['foobar', 'bar', 'Foo', 'fooz'])
+    eq_(index.matches('foo'), ['foobar', 'Foo', 'fooz'])
+    eq_(index.matches('FOOB'), ['foobar'])
+    eq_(index.matches('baz'), [])
+
+def test_matches_ignore_diacritics():
+    index = CompletionIndex(['électrique', 'eau'])
+    eq_(index.matches('e'), ['électrique', 'eau'])
+    eq_(index.matches('él'), ['électrique'])
+
+def test_candidates_are_stripped_and_deduped():
+    index = CompletionIndex(['foo ', 'foo', 'bar'])
+    eq_(len(index), 2)
+    eq_(index.sorted_candidates(), ['bar', 'foo'])
+
+def test_reuse_previous_index():
+    previous = CompletionIndex(['foo', 'bar'])
+    index = CompletionIndex(['baz', 'foo'], previous=previous)
+    eq_(index.matches('ba'), ['baz'])
+    eq_(index.matches('f'), ['foo'])
+
+def test_completion_list_with_index():
+    # Passing an index or a list of candidates gives the same result.
+    candidates = ['foobar', 'bar', 'fooz']
+    for source in [candidates, CompletionIndex(candidates)]:
+        completions = CompletionList('f', source)
+        eq_(completions.current(), 'foobar')
+        eq_(completions.next(), 'fooz')
@@ -125,6 +125,16 @@ def test_date_range_for_unfetched_currency():
     dr = Currencies.get_rates_db().date_range('PLN')
     assert dr is None
 
+def test_rates_checksum_changes_when_rate_is_overwritten():
+    # Unlike the date range, the checksum changes when we overwrite a rate we already have.
+    setup_two_daily_rate()
+    db = Currencies.get_rates_db()
+    checksum = db.rates_checksum('USD')
+    eq_(db.rates_checksum('USD'), checksum)
+    db.set_CAD_value(date(2008, 4, 20), 'USD', 1/0.5)
+    assert db.rates_checksum('USD') != checksum
+    eq_(db.date_range('USD'), (date(2008, 4, 20), date(2008, 4, 25)))
+
 def test_seek_rate_middle():
     # A rate request with seek in the middle will return the lowest date.
     setup_two_daily_rate()
@@ -10,7 +10,7 @@ import time
 from pytest import raises
 from hscommon.testutil import jointhreads, eq_
 
-from ...model.amount import convert_amount
+from ...model.amount import convert_amount, convert_amounts
 from ...model.amount import Amount
 from ...model.currency import (
     Currencies, RateProviderUnavailable, RatesDB)
@@ -64,6 +64,26 @@ def test_seek_rate():
     eq_(convert_amount(amount, 'CAD', date(2008, 5, 21)), expected)
     eq_(convert_amount(amount, 'CAD', date(2008, 5, 19)), expected)
 
+def test_convert_amounts():
+    # convert_amounts() converts each amount at the rate of its matching date and gives the same
+    # results as convert_amount(). Zeroes and amounts already in the target currency are untouched.
+    set_ratedb_for_tests()
+    db = Currencies.get_rates_db()
+    db.set_CAD_value(date(2008, 5, 20), 'USD', 0.98)
+    db.set_CAD_value(date(2008, 5, 25), 'USD', 0.96)
+    db.set_CAD_value(date(2008, 5, 20), 'EUR', 1.42)
+    amounts = [Amount(42, 'USD'), 0, Amount(12, 'CAD'), Amount(42, 'USD'), Amount(3, 'EUR')]
+    dates = [date(2008, 5, 21), date(2008, 5, 21), date(2008, 5, 21), date(2008, 5, 26), date(2008, 5, 26)]
+    expected = [convert_amount(a, 'CAD', d) for a, d in zip(amounts, dates)]
+    eq_(convert_amounts(amounts, 'CAD', dates), expected)
+    eq_(convert_amounts(amounts, 'CAD', [d.toordinal() for d in dates]), expected)
+    eq_(convert_amounts([], 'CAD', []), [])
+
+def test_convert_amounts_length_mismatch():
+    # amounts and dates must have the same length.
+    with raises(ValueError):
+        convert_amounts([Amount(42, 'USD')], 'CAD', [])
+
 # ---
 def test_ask_for_rates_in_the_past():
     # If a rate is asked for a date lower than the lowest fetched date, fetch that range.
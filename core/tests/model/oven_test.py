@@ -0,0 +1,169 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+from datetime import date
+
+from hscommon.testutil import eq_
+
+from ...model.account import Account, AccountList, AccountType
+from ...model.amount import Amount
+from ...model.budget import Budget
+from ...model.date import DateRange
+from ...model.oven import Oven
+from ...model.recurrence import Recurrence, RepeatType
+from ...model.transaction import Transaction
+from ...model.transaction_list import TransactionList
+
+class TestCookSpecificAccounts:
+    def setup_method(self, method):
+        self.checking = Account('Checking', 'USD', AccountType.Asset)
+        self.savings = Account('Savings', 'USD', AccountType.Asset)
+        self.accounts = AccountList('USD')
+        self.accounts.add(self.checking)
+        self.accounts.add(self.savings)
+        self.transactions = TransactionList([
+            Transaction(date(2008, 1, 1), account=self.checking, amount=Amount(100, 'USD')),
+            Transaction(date(2008, 1, 2), account=self.savings, amount=Amount(50, 'USD')),
+            Transaction(date(2008, 1, 3), account=self.checking, amount=Amount(10, 'USD')),
+        ])
+        self.schedules = []
+        self.oven = Oven(self.accounts, self.transactions, self.schedules, [])
+        self.oven.cook(date.min, date(2008, 1, 31))
+
+    def test_only_dirty_accounts_are_recooked(self):
+        # When specifying accounts, entries for other accounts are left untouched.
+        savings_entries = list(self.savings.entries)
+        self.transactions[0].splits[0].amount = Amount(200, 'USD')
+        self.oven.cook(date(2008, 1, 1), date(2008, 1, 31), accounts={self.checking})
+        eq_(self.checking.entries.balance(), Amount(210, 'USD'))
+        assert self.savings.entries[0] is savings_entries[0]
+        eq_(len(self.oven.transactions), 3)
+
+    def test_moved_split_from_account_not_in_dirty_set(self):
+        # A transaction moved from one account to the other must have both accounts in the set. If
+        # it only has the new one, the old entries are kept (this is what the `accounts` argument
+        # is about).
+        txn = self.transactions[1]
+        txn.splits[0].account = self.checking
+        self.oven.cook(date(2008, 1, 2), date(2008, 1, 31), accounts={self.checking, self.savings})
+        eq_(len(self.savings.entries), 0)
+        eq_(self.checking.entries.balance(), Amount(160, 'USD'))
+
+    def test_respawned_schedule_makes_its_accounts_dirty(self):
+        # When a schedule re-spawns its transactions, accounts affected by it are re-cooked even if
+        # they're not in the specified accounts.
+        ref = Transaction(date(2008, 1, 10), account=self.savings, amount=Amount(1, 'USD'))
+        schedule = Recurrence(ref, RepeatType.Weekly, 1)
+        self.schedules.append(schedule)
+        self.oven.cook(date.min, date(2008, 1, 31))
+        eq_(self.savings.entries.balance(), Amount(54, 'USD'))
+        schedule.delete_at(date(2008, 1, 17))
+        self.oven.cook(date(2008, 1, 3), date(2008, 1, 31), accounts={self.checking})
+        eq_(self.savings.entries.balance(), Amount(53, 'USD'))
+        cooked_spawns = [t for t in self.oven.transactions if t.date >= date(2008, 1, 10)]
+        eq_([e.transaction for e in self.savings.entries[1:]], cooked_spawns)
+
+    def test_transactions_in_range(self):
+        eq_(self.oven.transactions_in_range(DateRange(date(2008, 1, 2), date(2008, 1, 3))), self.transactions[1:])
+        eq_(self.oven.transactions_in_range(DateRange(date(2008, 2, 1), date(2008, 2, 29))), [])
+        # The dates we bisect follow cooks.
+        self.transactions.add(Transaction(date(2008, 1, 2), account=self.checking, amount=Amount(1, 'USD')))
+        self.oven.cook(date(2008, 1, 2), date(2008, 1, 31))
+        eq_(len(self.oven.transactions_in_range(DateRange(date(2008, 1, 2), date(2008, 1, 2)))), 2)
+
+
+
+class TestOldSchedule:
+    def setup_method(self, method):
+        self.checking = Account('Checking', 'USD', AccountType.Asset)
+        self.accounts = AccountList('USD')
+        self.accounts.add(self.checking)
+        ref = Transaction(date(2005, 1, 1), account=self.checking, amount=Amount(1, 'USD'))
+        self.schedule = Recurrence(ref, RepeatType.Daily, 1)
+        self.oven = Oven(self.accounts, TransactionList(), [self.schedule], [])
+        self.oven.cook(date.min, date(2008, 1, 31))
+
+    def test_cook_recent_window(self):
+        # Cooking from a recent date only spawns from that date, but gives the same result.
+        expected = self.checking.entries.balance()
+        self.oven.cook(date(2008, 1, 20), date(2008, 1, 31))
+        eq_(self.checking.entries.balance(), expected)
+        eq_(len(self.oven.transactions), (date(2008, 1, 31) - date(2005, 1, 1)).days + 1)
+
+    def test_same_date_spawn_positions(self):
+        # Spawns are positioned the same way whatever date we cook from. Reconciling a spawn
+        # materializes it with its position, so reconciled balances depend on it.
+        ref_a = Transaction(date(2005, 1, 1), account=self.checking, amount=Amount(2, 'USD'))
+        ref_b = Transaction(date(2005, 1, 1), account=self.checking, amount=Amount(3, 'USD'))
+        schedule_a = Recurrence(ref_a, RepeatType.Weekly, 1)
+        schedule_b = Recurrence(ref_b, RepeatType.Weekly, 1)
+        transactions = TransactionList()
+        oven = Oven(self.accounts, transactions, [schedule_a, schedule_b], [])
+        oven.cook(date.min, date(2008, 1, 31))
+        spawn = schedule_a.get_spawns(date(2008, 1, 31))[-10]
+        schedule_a.delete(spawn)
+        materialized = spawn.replicate()
+        materialized.splits[0].reconciliation_date = spawn.date
+        transactions.add(materialized)
+
+        def reconciled_balances():
+            entries = self.checking.entries.entries_in_range(DateRange(spawn.date, spawn.date))
+            return [float(e.reconciled_balance) for e in entries]
+
+        oven.cook(spawn.date, date(2008, 1, 31), accounts={self.checking})
+        result = reconciled_balances()
+        oven.cook(date.min, date(2008, 1, 31))
+        eq_(reconciled_balances(), result)
+        eq_(result, [2, 2])
+
+class TestBudgets:
+    def setup_method(self, method):
+        self.checking = Account('Checking', 'USD', AccountType.Asset)
+        self.expense = Account('Expense', 'USD', AccountType.Expense)
+        self.accounts = AccountList('USD')
+        self.accounts.add(self.checking)
+        self.accounts.add(self.expense)
+        self.transactions = TransactionList([
+            Transaction(date(2008, 1, 10), account=self.expense, amount=Amount(30, 'USD')),
+            Transaction(date(2008, 2, 10), account=self.expense, amount=Amount(150, 'USD')),
+            Transaction(date(2008, 2, 11), account=self.checking, amount=Amount(1, 'USD')),
+        ])
+        self.budgets = [
+            Budget(self.expense, self.checking, Amount(100, 'USD'), date(2008, 1, 1)),
+            Budget(self.expense, self.checking, Amount(100, 'USD'), date(2008, 1, 1)),
+        ]
+        self.oven = Oven(self.accounts, self.transactions, [], self.budgets)
+
+    def test_transactions_are_consumed_by_first_budget(self, monkeypatch):
+        # A transaction only affects the spawn of the first budget covering it. The other budget
+        # spawns its whole amount.
+        monkeypatch.patch_today(2007, 12, 31)
+        self.oven.cook(date.min, date(2008, 2, 29))
+        amounts = [[float(s.amount) for s in b._previous_spawns] for b in self.budgets]
+        eq_(amounts, [[70, 0], [100, 100]])
+
+    def test_affecting_start_date(self, monkeypatch):
+        # It's the start of the budget period that contains tomorrow.
+        monkeypatch.patch_today(2008, 3, 30)
+        eq_(self.budgets[0].affecting_start_date(), date(2008, 3, 1))
+        monkeypatch.patch_today(2008, 3, 31)
+        eq_(self.budgets[0].affecting_start_date(), date(2008, 4, 1))
+        monkeypatch.patch_today(2007, 6, 1)
+        eq_(self.budgets[0].affecting_start_date(), date(2008, 1, 1))
+
+    def test_amount_for_date_range(self, monkeypatch):
+        # Spawns partially covered by the range are pro-rated, the others are counted fully.
+        monkeypatch.patch_today(2007, 12, 31)
+        self.oven.cook(date.min, date(2008, 3, 31))
+        budget = self.budgets[1]
+
+        def amount(start, end):
+            return budget.amount_for_date_range(DateRange(start, end), 'USD')
+
+        eq_(amount(date(2008, 1, 16), date(2008, 3, 31)), Amount(16 / 31 * 100 + 200, 'USD'))
+        eq_(amount(date(2008, 1, 1), date(2008, 2, 14)), Amount(100 + 14 / 29 * 100, 'USD'))
+        eq_(amount(date(2008, 2, 2), date(2008, 2, 2)), Amount(100 / 29, 'USD'))
+        eq_(amount(date(2008, 4, 1), date(2008, 4, 30)), 0)
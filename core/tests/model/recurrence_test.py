@@ -0,0 +1,102 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+from datetime import date
+
+from hscommon.testutil import eq_
+
+from ...model.recurrence import DateCounter, Recurrence, RepeatType, Spawn
+from ...model.transaction import Transaction
+
+class TestDateCounterSkipTo:
+    def test_monthly(self):
+        # Skipping lands on the same dates as iterating, even at the end of months.
+        counter = DateCounter(date(2008, 1, 31), RepeatType.Monthly, 1, date(2008, 6, 30))
+        counter.skip_to(date(2008, 3, 31))
+        eq_(list(counter), [date(2008, 3, 31), date(2008, 4, 30), date(2008, 5, 31), date(2008, 6, 30)])
+
+    def test_repeat_every(self):
+        counter = DateCounter(date(2008, 1, 1), RepeatType.Daily, 3, date(2008, 1, 20))
+        counter.skip_to(date(2008, 1, 12))
+        eq_(list(counter), [date(2008, 1, 13), date(2008, 1, 16), date(2008, 1, 19)])
+
+    def test_skip_weekday_not_in_month(self):
+        # The 5th friday of the month doesn't exist in every month.
+        counter = DateCounter(date(2008, 2, 29), RepeatType.Weekday, 1, date(2008, 12, 31))
+        counter.skip_to(date(2008, 3, 1))
+        eq_(next(counter), date(2008, 5, 30))
+
+    def test_skip_to_base_date(self):
+        counter = DateCounter(date(2008, 1, 1), RepeatType.Weekly, 1, date(2008, 1, 8))
+        counter.skip_to(date(2007, 1, 1))
+        eq_(list(counter), [date(2008, 1, 1), date(2008, 1, 8)])
+
+    def test_last_date_until(self):
+        counter = DateCounter(date(2008, 1, 31), RepeatType.Monthly, 1, date(2008, 12, 31))
+        eq_(counter.last_date_until(date(2008, 5, 30)), date(2008, 4, 30))
+        counter = DateCounter(date(2008, 1, 31), RepeatType.Monthly, 1, date(2008, 12, 31))
+        eq_(counter.last_date_until(date(2008, 5, 31)), date(2008, 5, 31))
+
+    def test_last_date_until_weekday_not_in_month(self):
+        # We go back to the last month that has a 5th friday.
+        counter = DateCounter(date(2008, 2, 29), RepeatType.Weekday, 1, date(2008, 12, 31))
+        eq_(counter.last_date_until(date(2008, 5, 29)), date(2008, 2, 29))
+
+    def test_last_date_until_before_base_date(self):
+        counter = DateCounter(date(2008, 1, 1), RepeatType.Weekly, 1, date(2008, 1, 8))
+        assert counter.last_date_until(date(2007, 1, 1)) is None
+
+
+class TestGetSpawnsWithStart:
+    def setup_method(self, method):
+        self.recurrence = Recurrence(Transaction(date(2005, 1, 1), 'foo'), RepeatType.Daily, 1)
+
+    def test_spawns_before_start_are_skipped(self):
+        spawns = self.recurrence.get_spawns(date(2008, 1, 10), start=date(2008, 1, 5))
+        eq_([s.date for s in spawns][:2], [date(2008, 1, 5), date(2008, 1, 6)])
+        eq_(len(spawns), 6)
+
+    def test_same_instances_as_full_spawning(self):
+        full = self.recurrence.get_spawns(date(2008, 1, 10))
+        spawns = self.recurrence.get_spawns(date(2008, 1, 10), start=date(2008, 1, 5))
+        assert spawns[0] is full[-6]
+
+    def test_exception_moved_after_start(self):
+        # An exception with an earlier recurrence date, moved after start, is returned.
+        spawn = Spawn(self.recurrence, self.recurrence.ref, date(2007, 6, 1), date=date(2008, 1, 7))
+        self.recurrence.date2exception[date(2007, 6, 1)] = spawn
+        spawns = self.recurrence.get_spawns(date(2008, 1, 10), start=date(2008, 1, 5))
+        assert spawns[0] is spawn
+        eq_(len(spawns), 7)
+
+    def test_global_change_moved_after_start(self):
+        # A global change pushing spawns later makes earlier recurrence dates relevant.
+        spawn = Spawn(self.recurrence, self.recurrence.ref, date(2007, 6, 1), date=date(2007, 6, 4))
+        self.recurrence.change_globally(spawn)
+        spawns = self.recurrence.get_spawns(date(2008, 1, 10), start=date(2008, 1, 5))
+        eq_([s.date for s in spawns if s.date >= date(2008, 1, 5)][0], date(2008, 1, 5))
+        eq_(spawns[-1].date, date(2008, 1, 13))
+
+
+class TestSpawnCache:
+    def setup_method(self, method):
+        self.recurrence = Recurrence(Transaction(date(2008, 1, 1), 'foo'), RepeatType.Daily, 1)
+
+    def test_spawns_are_cached(self):
+        spawns = self.recurrence.get_spawns(date(2008, 1, 10))
+        assert self.recurrence.get_spawns(date(2008, 1, 10))[3] is spawns[3]
+
+    def test_spawns_after_end_are_evicted(self):
+        # When we spawn less far than before, spawns after the new end are dropped from the cache.
+        # Spawning that far again re-creates them.
+        spawns = self.recurrence.get_spawns(date(2008, 12, 31))
+        self.recurrence.get_spawns(date(2008, 1, 10))
+        eq_(len(self.recurrence.date2instances), 10)
+        respawns = self.recurrence.get_spawns(date(2008, 12, 31))
+        assert respawns[3] is spawns[3]
+        assert respawns[-1] is not spawns[-1]
+        eq_(respawns[-1].date, spawns[-1].date)
+        eq_(respawns[-1].description, 'foo')
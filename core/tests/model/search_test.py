@@ -0,0 +1,127 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+from datetime import date
+
+from hscommon.testutil import eq_
+
+from ...model.account import Account, AccountType, Group
+from ...model.amount import Amount
+from ...model.date import DateRange
+from ...model.search import SearchIndex, AmountRange, parse_query
+from ...model.transaction import Transaction
+
+class TestSearchIndex:
+    def setup_method(self, method):
+        group = Group('Group', AccountType.Asset)
+        self.checking = Account('Checking', 'USD', AccountType.Asset)
+        self.checking.group = group
+        self.income = Account('Income', 'USD', AccountType.Income)
+        self.t1 = Transaction(date(2008, 1, 1), 'Grocery store', 'Joe', '42A', self.checking, Amount(12, 'USD'))
+        self.t1.splits[1].memo = 'Some Memo'
+        self.t2 = Transaction(date(2008, 1, 2), 'Salary', 'Boss', '', self.income, Amount(-100, 'USD'))
+        self.transactions = [self.t1, self.t2]
+        self.index = SearchIndex()
+        for txn in self.transactions:
+            self.index.add(txn)
+
+    def check(self, query, expected):
+        eq_(self.index.search(query), expected)
+        eq_({t for t in self.transactions if t.matches(query)}, expected)
+
+    def test_text_queries(self):
+        self.check({'description': 'ocer'}, {self.t1})
+        self.check({'payee': 'bo'}, {self.t2})
+        self.check({'memo': 'memo'}, {self.t1})
+        self.check({'checkno': '42a'}, {self.t1})
+        self.check({'checkno': '42'}, set())
+        self.check({'description': 's', 'payee': 'joe'}, {self.t1, self.t2})
+
+    def test_amount_queries(self):
+        self.check({'amount': Amount(100, 'USD')}, {self.t2})
+        self.check({'amount': Amount(12.01, 'USD')}, set())
+
+    def test_account_and_group_queries(self):
+        self.check({'account': {'income', 'foo'}}, {self.t2})
+        self.check({'group': {'group'}}, {self.t1})
+        self.checking.name = 'Renamed'
+        self.check({'account': {'renamed'}}, {self.t1})
+
+    def test_reindex_and_remove(self):
+        self.t1.description = 'Hardware store'
+        self.index.add(self.t1)
+        self.check({'description': 'store'}, {self.t1})
+        self.check({'description': 'grocery'}, set())
+        self.index.remove(self.t1)
+        eq_(self.index.search({'description': 'store'}), set())
+
+    def test_amount_range_queries(self):
+        self.check({'amount_range': AmountRange(12, None, include_low=False)}, {self.t2})
+        self.check({'amount_range': AmountRange(None, 12)}, {self.t1})
+        self.check({'amount_range': AmountRange(10, 200)}, {self.t1, self.t2})
+        self.check({'amount_range': AmountRange(13, 99)}, set())
+
+    def test_date_range_queries(self):
+        self.check({'date_range': DateRange(date(2008, 1, 2), date(2008, 1, 31))}, {self.t2})
+        self.t2.date = date(2008, 2, 1)
+        self.index.add(self.t2)
+        self.check({'date_range': DateRange(date(2008, 1, 2), date(2008, 1, 31))}, set())
+
+
+class TestParseQuery:
+    def setup_method(self, method):
+        self.income = Account('Income', 'USD', AccountType.Income)
+        self.visa = Account('Visa', 'USD', AccountType.Liability)
+        self.t1 = Transaction(date(2018, 1, 15), 'Groceries', 'Acme', '', self.income, Amount(150, 'USD'))
+        self.t2 = Transaction(date(2018, 3, 1), 'Hardware store', 'Acme', '', self.visa, Amount(-50, 'USD'))
+        self.t3 = Transaction(date(2018, 4, 1), 'Groceries', 'Other', '', self.visa, Amount(100, 'USD'))
+        self.transactions = [self.t1, self.t2, self.t3]
+        self.index = SearchIndex()
+        for txn in self.transactions:
+            self.index.add(txn)
+
+    def check(self, query_string, expected):
+        query = parse_query(query_string, 'USD')
+        eq_(query.search(self.index), set(expected))
+        eq_({t for t in self.transactions if query.matches(t)}, set(expected))
+
+    def test_untargeted_text(self):
+        self.check('groc', [self.t1, self.t3])
+        self.check('hardware STORE', [self.t2])
+        self.check('visa', [self.t2, self.t3])
+        self.check('50', [self.t2])
+        self.check('', self.transactions)
+
+    def test_targeted_value_can_contain_spaces(self):
+        self.check('description:hardware store', [self.t2])
+        self.check('account: income, visa', self.transactions)
+
+    def test_terms_are_anded(self):
+        self.check('payee:acme amount:>100', [self.t1])
+        self.check('groceries payee:other', [self.t3])
+        self.check('payee:acme account:visa', [self.t2])
+
+    def test_or(self):
+        self.check('payee:other OR description:hardware', [self.t2, self.t3])
+        # lowercase "or" is just text
+        self.check('payee:other or description:hardware', [])
+
+    def test_amount_ranges(self):
+        self.check('amount:50..100', [self.t2, self.t3])
+        self.check('amount:100..', [self.t1, self.t3])
+        self.check('amount:..99.99', [self.t2])
+        self.check('amount:>=100', [self.t1, self.t3])
+        self.check('amount:<100', [self.t2])
+        self.check('amount:>foo', [])
+
+    def test_date_ranges(self):
+        self.check('date:2018-01', [self.t1])
+        self.check('date:2018-01..2018-03', [self.t1, self.t2])
+        self.check('date:2018-03-01', [self.t2])
+        self.check('date:2018-03-02..', [self.t3])
+        self.check('date:..2018-02', [self.t1])
+        self.check('date:2018', self.transactions)
+        self.check('date:2018-13', [])
@@ -0,0 +1,140 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+from datetime import date
+
+from hscommon.testutil import eq_
+
+from ...model.account import Account, AccountType
+from ...model.amount import Amount
+from ...model.transaction import Transaction
+from ...model.transaction_list import TransactionList
+
+class TestDateIndex:
+    def setup_method(self, method):
+        self.t1 = Transaction(date(2008, 1, 1), 'first')
+        self.t2 = Transaction(date(2008, 1, 1), 'second')
+        self.t3 = Transaction(date(2008, 1, 2), 'third')
+        self.transactions = TransactionList()
+        for txn in [self.t1, self.t2, self.t3]:
+            self.transactions.add(txn)
+
+    def test_add_puts_transaction_last_at_its_date(self):
+        eq_(self.t1.position, 0)
+        eq_(self.t2.position, 1)
+        eq_(self.t3.position, 0)
+        txn = Transaction(date(2008, 1, 1))
+        self.transactions.add(txn)
+        eq_(txn.position, 2)
+
+    def test_transactions_at_date(self):
+        eq_(self.transactions.transactions_at_date(date(2008, 1, 1)), {self.t1, self.t2})
+        eq_(self.transactions.transactions_at_date(date(2008, 1, 3)), set())
+
+    def test_initial_transactions_are_indexed(self):
+        transactions = TransactionList([self.t1, self.t3])
+        eq_(transactions.transactions_at_date(date(2008, 1, 1)), {self.t1})
+        assert self.t3 in transactions
+        assert self.t2 not in transactions
+
+    def test_remove(self):
+        self.transactions.remove(self.t2)
+        eq_(self.transactions.transactions_at_date(date(2008, 1, 1)), {self.t1})
+        assert self.t2 not in self.transactions
+        # The max position at that date went down with the removal.
+        txn = Transaction(date(2008, 1, 1))
+        self.transactions.add(txn)
+        eq_(txn.position, 1)
+
+    def test_reindex_after_date_change(self):
+        self.t1.date = date(2008, 1, 2)
+        self.transactions.reindex(self.t1)
+        eq_(self.transactions.transactions_at_date(date(2008, 1, 1)), {self.t2})
+        eq_(self.transactions.transactions_at_date(date(2008, 1, 2)), {self.t1, self.t3})
+
+    def test_move_last_after_date_change(self):
+        # move_last() is called right after a date change, before any reindex.
+        self.t1.date = date(2008, 1, 2)
+        self.transactions.move_last(self.t1)
+        eq_(self.t1.position, 1)
+        eq_(self.transactions.transactions_at_date(date(2008, 1, 2)), {self.t1, self.t3})
+        txn = Transaction(date(2008, 1, 2))
+        self.transactions.add(txn)
+        eq_(txn.position, 2)
+
+    def test_move_before_updates_max_position(self):
+        txn = Transaction(date(2008, 1, 1))
+        self.transactions.add(txn)
+        self.transactions.move_before(txn, self.t1)
+        eq_([self.t1.position, self.t2.position, txn.position], [1, 2, 0])
+        new = Transaction(date(2008, 1, 1))
+        self.transactions.add(new)
+        eq_(new.position, 3)
+
+    def test_clear(self):
+        self.transactions.clear()
+        eq_(self.transactions.transactions_at_date(date(2008, 1, 1)), set())
+        assert self.t1 not in self.transactions
+
+
+class TestCompletionLists:
+    def setup_method(self, method):
+        self.checking = Account('Checking', 'USD', AccountType.Asset)
+        self.income = Account('Income', 'USD', AccountType.Income)
+        self.transactions = TransactionList()
+        for mtime, description, payee, account in [
+                (3, 'foo', 'alice', self.checking), (1, 'bar', 'bob', self.income),
+                (2, 'foo', 'bob', None)]:
+            txn = Transaction(date(2008, 1, 1), description, payee, account=account, amount=Amount(1, 'USD'))
+            txn.mtime = mtime
+            self.transactions.add(txn)
+
+    def test_lists_are_in_reverse_mtime_order(self):
+        eq_(self.transactions.descriptions, ['foo', 'bar'])
+        eq_(self.transactions.payees, ['alice', 'bob'])
+        eq_(self.transactions.account_names, ['Checking', 'Income'])
+
+    def test_same_mtime_keeps_first_added_first(self):
+        transactions = TransactionList()
+        for description in ['b', 'a', 'c', 'a']:
+            transactions.add(Transaction(date(2008, 1, 1), description))
+        eq_(transactions.descriptions, ['b', 'a', 'c'])
+
+    def test_add_after_lists_were_computed(self):
+        self.transactions.descriptions # sorts the index
+        txn = Transaction(date(2008, 1, 2), 'bar')
+        txn.mtime = 4
+        self.transactions.add(txn)
+        eq_(self.transactions.descriptions, ['bar', 'foo'])
+
+    def test_remove(self):
+        self.transactions.descriptions # sorts the index
+        self.transactions.remove(self.transactions[0])
+        # 'foo' is still used, but its mtime went down.
+        eq_(self.transactions.descriptions, ['foo', 'bar'])
+        eq_(self.transactions.payees, ['bob'])
+        eq_(self.transactions.account_names, ['Income'])
+        self.transactions.remove(self.transactions[1])
+        eq_(self.transactions.descriptions, ['bar'])
+
+    def test_reindex_after_change(self):
+        txn = self.transactions[1]
+        txn.change(description='baz', from_=self.checking)
+        txn.mtime = 4
+        self.transactions.reindex(txn)
+        eq_(self.transactions.descriptions, ['baz', 'foo'])
+        eq_(self.transactions.account_names, ['Checking', 'Income'])
+
+    def test_account_changes_need_clear_cache(self):
+        eq_(self.transactions.account_names, ['Checking', 'Income'])
+        self.checking.name = 'Renamed'
+        self.income.inactive = True
+        self.transactions.clear_cache()
+        eq_(self.transactions.account_names, ['Renamed'])
+
+    def test_reassign_account(self):
+        self.transactions.reassign_account(self.income, self.checking)
+        eq_(self.transactions.account_names, ['Checking'])
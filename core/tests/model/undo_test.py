@@ -0,0 +1,80 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+from datetime import date
+
+from hscommon.testutil import eq_
+
+from ...model import undo
+from ...model.account import Account, AccountList, AccountType
+from ...model.amount import Amount
+from ...model.transaction import Transaction
+from ...model.transaction_list import TransactionList
+from ...model.undo import Action, Undoer, UNCHANGED
+
+class TestCompact:
+    def setup_method(self, method):
+        self.account = Account('Checking', 'USD', AccountType.Asset)
+        self.txn = Transaction(date(2008, 1, 1), 'foo', account=self.account, amount=Amount(42, 'USD'))
+        self.accounts = AccountList('USD')
+        self.accounts.add(self.account)
+        self.transactions = TransactionList([self.txn])
+        self.undoer = Undoer(self.accounts, [], self.transactions, [], [])
+
+    def change_description(self, description):
+        action = Action('Change')
+        action.change_transactions([self.txn])
+        self.txn.description = description
+        self.undoer.record(action)
+        return action
+
+    def test_unchanged_values_are_dropped(self):
+        action = Action('Change')
+        action.change_transactions([self.txn])
+        self.txn.description = 'bar'
+        action.compact()
+        [backup] = action.changed_transactions.values()
+        eq_([v for v in backup if v is not UNCHANGED], ['foo'])
+        eq_(action.size(), 2)
+
+    def test_unchanged_instances_are_forgotten(self):
+        action = Action('Change')
+        action.change_transactions([self.txn])
+        action.change_accounts([self.account])
+        action.compact()
+        eq_(action.changed_transactions, {})
+        eq_(action.changed_accounts, {})
+
+    def test_split_changes_are_kept(self):
+        # Splits are changed in place. Our backup isn't affected.
+        action = Action('Change')
+        action.change_transactions([self.txn])
+        self.txn.splits[0].amount = Amount(12, 'USD')
+        action.compact()
+        eq_(len(action.changed_transactions), 1)
+
+    def test_undo_redo_after_compact(self):
+        # Previous actions are compacted when new ones are recorded.
+        self.change_description('bar')
+        self.change_description('baz')
+        self.undoer.undo()
+        eq_(self.txn.description, 'bar')
+        self.undoer.undo()
+        eq_(self.txn.description, 'foo')
+        self.undoer.redo()
+        eq_(self.txn.description, 'bar')
+        self.undoer.redo()
+        eq_(self.txn.description, 'baz')
+
+    def test_oldest_actions_forgotten_over_max_size(self, monkeypatch):
+        # When our actions hold too many values, we can't undo the oldest ones anymore.
+        monkeypatch.setattr(undo, 'MAX_UNDO_SIZE', 12)
+        for description in ['bar', 'baz', 'qux', 'quux']:
+            self.change_description(description)
+        self.undoer.undo()
+        self.undoer.undo()
+        eq_(self.txn.description, 'baz')
+        assert not self.undoer.can_undo()
@@ -16,6 +16,7 @@ from ..const import PaneType
 from ..document import ScheduleScope
 from ..model.date import MonthRange
 from ..model.account import AccountType
+from ..model.amount import Amount
 from .base import compare_apps, testdata, TestApp, with_app
 
 def copydoc(doc):
@@ -787,3 +788,27 @@ def test_delete_account_with_budget(app, checkstate):
 def test_delete_budget(app, checkstate):
     app.btable.delete()
     checkstate()
+
+# ---
+def app_two_accounts_with_txns():
+    app = TestApp()
+    app.add_account('checking')
+    app.add_account('savings')
+    app.add_txn('01/01/2008', from_='checking', to='groceries', amount='42')
+    app.add_txn('02/01/2008', from_='savings', to='rent', amount='100')
+    return app
+
+@with_app(app_two_accounts_with_txns)
+def test_undo_only_recooks_touched_accounts(app, checkstate):
+    # Undoing a transaction change only re-cooks the accounts that the change touched. Entries of
+    # other accounts are kept as they are.
+    savings = app.doc.accounts.find('savings')
+    savings_entry = savings.entries[0]
+    app.show_tview()
+    app.ttable.select([0])
+    app.ttable[0].amount = '12'
+    app.ttable.save_edits()
+    checkstate()
+    assert savings.entries[0] is savings_entry
+    checking = app.doc.accounts.find('checking')
+    eq_(checking.entries.balance(), Amount(-12, 'USD'))
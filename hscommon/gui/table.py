@@ -23,6 +23,10 @@ class Table(MutableSequence, Selectable):
 
     Usually used with :class:`~hscommon.gui.column.Column`.
 
+    Rows can also be added lazily with :meth:`append_lazy`. In that case, we only hold the model item
+    that the row presents and create the row with :meth:`_make_row` the first time it's accessed.
+    With big tables, of which only a few rows are ever shown at once, it saves a lot of work.
+
     Subclasses :class:`.Selectable`.
     """
     def __init__(self):
@@ -40,7 +44,12 @@ class Table(MutableSequence, Selectable):
         self._check_selection_range()
 
     def __getitem__(self, key):
-        return self._rows.__getitem__(key)
+        if isinstance(key, slice):
+            return [self[index] for index in range(*key.indices(len(self._rows)))]
+        row = self._rows[key]
+        if not isinstance(row, Row):
+            row = self._rows[key] = self._make_row(row)
+        return row
 
     def __len__(self):
         return len(self._rows)
@@ -48,6 +57,28 @@ class Table(MutableSequence, Selectable):
     def __setitem__(self, key, value):
         self._rows.__setitem__(key, value)
 
+    #--- Virtual
+    def _make_row(self, item):
+        """(Virtual) Creates the row presenting ``item``, which was added with :meth:`append_lazy`.
+        """
+        raise NotImplementedError()
+
+    def _sort_key_for_item(self, item, column_name):
+        """(Virtual) Returns the sort key of the row that ``item`` would be presented with.
+
+        Used by :meth:`sort_by` for rows that haven't been created yet. By default, we create a row
+        to get its key (and throw it away). Override this when you can get the key from ``item``
+        directly.
+        """
+        return self._make_row(item).sort_key_for_column(column_name)
+
+    #--- Protected
+    def _peek(self, index):
+        """Returns the row at ``index`` if it has been created, or the item it will be created from.
+        """
+        return self._rows[index]
+
+    #--- Public
     def append(self, item):
         """Appends ``item`` at the end of the table.
 
@@ -58,6 +89,25 @@ class Table(MutableSequence, Selectable):
         else:
             self._rows.append(item)
 
+    def append_lazy(self, item):
+        """Appends a row presenting ``item`` at the end of the table.
+
+        The row itself is only created, with :meth:`_make_row`, when it's accessed. Like with
+        :meth:`append`, if there's a footer, the row goes before it.
+        """
+        self.append(item)
+
+    def index(self, row):
+        """Returns the index of ``row`` in the table.
+
+        Rows are compared by identity and rows that haven't been created yet are left alone.
+        Raises ``ValueError`` if ``row`` isn't in the table.
+        """
+        for index, candidate in enumerate(self._rows):
+            if candidate is row:
+                return index
+        raise ValueError()
+
     def insert(self, index, item):
         """Inserts ``item`` at ``index`` in the table.
 
@@ -79,7 +129,7 @@ class Table(MutableSequence, Selectable):
             self._header = None
         if row is self._footer:
             self._footer = None
-        self._rows.remove(row)
+        del self._rows[self.index(row)]
         self._check_selection_range()
 
     def sort_by(self, column_name, desc=False):
@@ -95,7 +145,12 @@ class Table(MutableSequence, Selectable):
             self._rows.pop(0)
         if self._footer is not None:
             self._rows.pop()
-        key = lambda row: row.sort_key_for_column(column_name)
+        def key(row):
+            if isinstance(row, Row):
+                return row.sort_key_for_column(column_name)
+            else:
+                return self._sort_key_for_item(row, column_name)
+
         self._rows.sort(key=key, reverse=desc)
         if self._header is not None:
             self._rows.insert(0, self._header)
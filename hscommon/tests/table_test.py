@@ -323,3 +323,56 @@ def test_add_with_view_that_saves_during_refresh():
     table.add()
     assert table.edited is not None # still in edit mode
 
+
+#--- Lazy rows
+class LazyTable(Table):
+    def __init__(self):
+        Table.__init__(self)
+        self.made = []
+
+    def _make_row(self, item):
+        self.made.append(item)
+        return TestRow(self, item)
+
+
+def lazy_table_with_footer():
+    table = LazyTable()
+    for index in range(5):
+        table.append_lazy(index)
+    footer = TestRow(table, 99)
+    table.footer = footer
+    return table, footer
+
+def test_lazy_rows_are_made_on_access():
+    table, footer = lazy_table_with_footer()
+    eq_(len(table), 6)
+    eq_(table.row_count, 5)
+    eq_(table.made, [])
+    row = table[2]
+    eq_(row.index, 2)
+    assert table[2] is row
+    eq_(table.made, [2])
+    assert table[-1] is footer
+
+def test_lazy_rows_stay_before_footer():
+    table, footer = lazy_table_with_footer()
+    table.append_lazy(5)
+    eq_([row.index for row in table], [0, 1, 2, 3, 4, 5, 99])
+
+def test_sort_lazy_rows():
+    # Rows that weren't made yet are sorted through _sort_key_for_item(), which makes throwaway
+    # rows by default.
+    table, footer = lazy_table_with_footer()
+    row = table[1]
+    table.sort_by('index', desc=True)
+    eq_(table.made, [1, 0, 2, 3, 4])
+    eq_([row.index for row in table], [4, 3, 2, 1, 0, 99])
+    assert table[3] is row
+
+def test_remove_and_index_only_look_at_made_rows():
+    table, footer = lazy_table_with_footer()
+    row = table[3]
+    eq_(table.index(row), 3)
+    table.remove(row)
+    eq_(table.made, [3])
+    eq_(table.row_count, 4)
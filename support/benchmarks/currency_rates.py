@@ -0,0 +1,45 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Measures the speed of foreign currency conversions.
+
+Fills an in-memory rates DB with ten years of daily USD and EUR rates and then converts amounts
+from USD to EUR at random dates. Run from the root of the source tree with::
+
+    python -m support.benchmarks.currency_rates
+"""
+
+import random
+import time
+from datetime import date, timedelta
+
+from core.model.amount import Amount, convert_amount
+from core.model.currency import RatesDB, Currencies
+
+DAY_COUNT = 3650
+CONVERSION_COUNT = 200000
+
+def main():
+    random.seed(42)
+    ratesdb = RatesDB(':memory:', async_=False)
+    Currencies.set_rates_db(ratesdb)
+    start = date(2008, 1, 1)
+    for i in range(DAY_COUNT):
+        d = start + timedelta(days=i)
+        ratesdb.set_CAD_value(d, 'USD', 1 + random.random() / 10)
+        ratesdb.set_CAD_value(d, 'EUR', 1.4 + random.random() / 10)
+    dates = [start + timedelta(days=random.randrange(DAY_COUNT)) for _ in range(CONVERSION_COUNT)]
+    amounts = [Amount(random.randrange(1, 100000) / 100, 'USD') for _ in range(CONVERSION_COUNT)]
+    started = time.perf_counter()
+    for amount, d in zip(amounts, dates):
+        convert_amount(amount, 'EUR', d)
+    elapsed = time.perf_counter() - started
+    print("{} conversions in {:.2f}s ({:.0f} conversions/sec)".format(
+        CONVERSION_COUNT, elapsed, CONVERSION_COUNT / elapsed
+    ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Measures the memory that transactions, splits and entries take.
+
+Loads a big document (built like in :mod:`.native_loader`), cooks it and reports how much memory
+its transactions (with their splits) and the entries created by the cook hold, per transaction.
+Run from the root of the source tree with::
+
+    python -m support.benchmarks.model_memory [transaction_count]
+
+To compare two versions of the model, run it on both.
+"""
+
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+from datetime import date
+
+from core.model.amount import Amount
+from core.model.currency import RatesDB, Currencies
+from core.model.entry import Entry
+from core.model.oven import Oven
+from core.model.transaction import Transaction
+from .native_loader import DEFAULT_TRANSACTION_COUNT, build_document, load
+
+def instance_size(obj):
+    # Size of the instance itself plus, if it has one, of its __dict__.
+    result = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        result += sys.getsizeof(obj.__dict__)
+    return result
+
+def traced_size(func):
+    # Returns (result of func(), memory still allocated by it).
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+def main():
+    transaction_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TRANSACTION_COUNT
+    Currencies.set_rates_db(RatesDB(':memory:', async_=False))
+    Currencies.register('PLN', 'PLN')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'big.moneyguru')
+        build_document(path, transaction_count)
+
+        def load_model():
+            # We only keep what a document keeps, not the loader's parsing data.
+            loader = load(path)
+            return loader.accounts, loader.transactions, loader.schedules, loader.budgets
+
+        model, model_size = traced_size(load_model)
+    accounts, transactions, schedules, budgets = model
+    split_count = sum(len(t.splits) for t in transactions)
+    oven = Oven(accounts, transactions, schedules, budgets)
+    _, cooked_size = traced_size(lambda: oven.cook(date.min, None))
+    entry_count = sum(len(a.entries) for a in accounts)
+    txn = Transaction(date.today(), 'description', 'payee', account=None, amount=Amount(1, 'USD'))
+    print("Instance sizes: Transaction {} bytes, Split {} bytes, Entry {} bytes".format(
+        instance_size(txn), instance_size(txn.splits[0]), instance_size(Entry(txn.splits[0], 0, 0, 0, 0)),
+    ))
+    print("{} transactions, {} splits: {:.1f} MB loaded ({:.0f} bytes per transaction)".format(
+        len(transactions), split_count, model_size / 2**20, model_size / len(transactions)
+    ))
+    print("{} entries: {:.1f} MB cooked ({:.0f} bytes per transaction)".format(
+        entry_count, cooked_size / 2**20, cooked_size / len(transactions)
+    ))
+
+if __name__ == '__main__':
+    main()
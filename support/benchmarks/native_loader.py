@@ -0,0 +1,86 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Measures the time and peak memory it takes to load a big moneyGuru document.
+
+The document is built by repeating the transactions of ``core/tests/testdata/moneyguru`` files with
+their dates shifted until it reaches the wanted size. Run from the root of the source tree with::
+
+    python -m support.benchmarks.native_loader [transaction_count]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.cElementTree as ET
+from datetime import datetime, timedelta
+
+from core.loader import native
+from core.model.currency import RatesDB, Currencies
+
+DEFAULT_TRANSACTION_COUNT = 100000
+TESTDATA_FILES = ['simple.moneyguru', 'multi_currency.moneyguru', 'account_in_group.moneyguru']
+TESTDATA_PATH = os.path.join('core', 'tests', 'testdata', 'moneyguru')
+
+def build_document(path, transaction_count):
+    # We use testdata files as templates: their accounts and groups are kept as-is and their
+    # transactions are repeated, a week later each time, until we have enough of them.
+    root = ET.Element('moneyguru-file')
+    seen = set()
+    templates = []
+    for filename in TESTDATA_FILES:
+        source = ET.parse(os.path.join(TESTDATA_PATH, filename)).getroot()
+        for element in source:
+            if element.tag == 'transaction':
+                templates.append((element, datetime.strptime(element.get('date'), '%Y-%m-%d')))
+            elif (element.tag, element.get('name')) not in seen:
+                seen.add((element.tag, element.get('name')))
+                root.append(element)
+    with open(path, 'wb') as fp:
+        fp.write(b'<?xml version="1.0" encoding="utf-8"?>\n<moneyguru-file>\n')
+        for element in root:
+            fp.write(ET.tostring(element))
+        count = 0
+        week = 0
+        while count < transaction_count:
+            for element, original_date in templates:
+                d = original_date + timedelta(weeks=week)
+                element.set('date', d.strftime('%Y-%m-%d'))
+                fp.write(ET.tostring(element))
+                count += 1
+            week += 1
+        fp.write(b'</moneyguru-file>\n')
+
+def load(path):
+    loader = native.Loader('USD')
+    loader.parse(path)
+    loader.load()
+    return loader
+
+def main():
+    transaction_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TRANSACTION_COUNT
+    Currencies.set_rates_db(RatesDB(':memory:', async_=False))
+    Currencies.register('PLN', 'PLN')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'big.moneyguru')
+        build_document(path, transaction_count)
+        size = os.path.getsize(path)
+        started = time.perf_counter()
+        loader = load(path)
+        elapsed = time.perf_counter() - started
+        del loader
+        tracemalloc.start()
+        load(path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print("Loaded {} transactions ({:.1f} MB) in {:.2f}s, peak memory: {:.1f} MB".format(
+        transaction_count, size / 2**20, elapsed, peak / 2**20
+    ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Measures the memory that schedule spawns hold during a long session.
+
+We create daily schedules starting years ago and cook them the way a document does when its date
+range moves: one year further at a time, far in the future, then back to the current year. We
+report, after each step, how many spawns the schedules hold in their cache and how much memory is
+still allocated since the first cook. Run from the root of the source tree with::
+
+    python -m support.benchmarks.spawn_memory [schedule_count] [years_ahead]
+
+To compare two versions of the model, run it on both.
+"""
+
+import gc
+import sys
+import tracemalloc
+from datetime import date
+
+from core.model.account import Account, AccountList, AccountType
+from core.model.amount import Amount
+from core.model.currency import RatesDB, Currencies
+from core.model.date import inc_year
+from core.model.oven import Oven
+from core.model.recurrence import Recurrence, RepeatType
+from core.model.transaction import Transaction
+from core.model.transaction_list import TransactionList
+
+DEFAULT_SCHEDULE_COUNT = 10
+DEFAULT_YEARS_AHEAD = 20
+SCHEDULE_START = date(2005, 1, 1)
+
+def report(step, schedules):
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    cached = sum(len(s.date2instances) for s in schedules)
+    print("{:<28} {:>8} cached spawns {:>8.1f} MB".format(step, cached, size / 2**20))
+
+def main():
+    schedule_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SCHEDULE_COUNT
+    years_ahead = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_YEARS_AHEAD
+    Currencies.set_rates_db(RatesDB(':memory:', async_=False))
+    accounts = AccountList('USD')
+    checking = Account('Checking', 'USD', AccountType.Asset)
+    accounts.add(checking)
+    schedules = []
+    for i in range(schedule_count):
+        ref = Transaction(SCHEDULE_START, 'schedule {}'.format(i), account=checking, amount=Amount(1, 'USD'))
+        schedules.append(Recurrence(ref, RepeatType.Daily, 1))
+    oven = Oven(accounts, TransactionList(), schedules, [])
+    this_year_end = date(date.today().year, 12, 31)
+    tracemalloc.start()
+    oven.cook(date.min, this_year_end)
+    report("Current year", schedules)
+    # Moving forward only cooks what's new, like Document.date_range does.
+    for years in range(1, years_ahead + 1):
+        oven.continue_cooking(inc_year(this_year_end, years))
+    report("{} years ahead".format(years_ahead), schedules)
+    # Going back re-cooks the whole document until the end of the new date range.
+    oven.cook(date.min, this_year_end)
+    report("Back to current year", schedules)
+    tracemalloc.stop()
+
+if __name__ == '__main__':
+    main()
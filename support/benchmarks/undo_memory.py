@@ -0,0 +1,84 @@
+# Copyright 2018 Virgil Dupras
+#
+# This software is licensed under the "GPLv3" License as described in the "LICENSE" file,
+# which should be included with this package. The terms are also available at
+# http://www.gnu.org/licenses/gpl-3.0.html
+
+"""Measures the memory that the undo history holds after mass edits.
+
+We create transactions between two accounts and record, the way a document does, a few actions
+changing the description of all of them and then the deletion of one of the accounts. We report,
+after each action, how much memory is still allocated since the first one. Run from the root of the
+source tree with::
+
+    python -m support.benchmarks.undo_memory [transaction_count] [edit_count]
+
+To compare two versions of the model, run it on both.
+"""
+
+import gc
+import sys
+import tracemalloc
+from datetime import date, timedelta
+
+from core.model.account import Account, AccountList, AccountType
+from core.model.amount import Amount
+from core.model.currency import RatesDB, Currencies
+from core.model.oven import Oven
+from core.model.transaction import Transaction
+from core.model.transaction_list import TransactionList
+from core.model.undo import Action, Undoer
+
+DEFAULT_TRANSACTION_COUNT = 20000
+DEFAULT_EDIT_COUNT = 5
+
+def report(step):
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    print("{:<28} {:>8.1f} MB".format(step, size / 2**20))
+
+def main():
+    transaction_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TRANSACTION_COUNT
+    edit_count = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_EDIT_COUNT
+    Currencies.set_rates_db(RatesDB(':memory:', async_=False))
+    accounts = AccountList('USD')
+    checking = Account('Checking', 'USD', AccountType.Asset)
+    expense = Account('Expense', 'USD', AccountType.Expense)
+    accounts.add(checking)
+    accounts.add(expense)
+    start_date = date(2008, 1, 1)
+    transactions = TransactionList()
+    for i in range(transaction_count):
+        txn_date = start_date + timedelta(days=i // 10)
+        txn = Transaction(txn_date, 'description', account=checking, amount=Amount(1, 'USD'))
+        txn.splits[1].account = expense
+        transactions.add(txn)
+    oven = Oven(accounts, transactions, [], [])
+    oven.cook(date.min, None)
+    undoer = Undoer(accounts, [], transactions, [], [])
+    tracemalloc.start()
+    report("Before edits")
+    for edit in range(edit_count):
+        action = Action('Change transaction')
+        action.change_transactions(transactions)
+        for txn in transactions:
+            txn.description = 'description {}'.format(edit)
+            transactions.reindex(txn)
+        undoer.record(action)
+        report("Edit {}".format(edit + 1))
+    action = Action('Remove account')
+    action.delete_accounts([expense], reassign=True)
+    accounts.remove(expense)
+    transactions.reassign_account(expense)
+    undoer.record(action)
+    report("Account deletion")
+    # Until an action is followed by another one, it holds complete backups.
+    action = Action('Change account')
+    action.change_accounts([checking])
+    checking.notes = 'notes'
+    undoer.record(action)
+    report("Account change")
+    tracemalloc.stop()
+
+if __name__ == '__main__':
+    main()